@@ -0,0 +1,14 @@
+"""Performance benchmarks
+
+Each benchmark is a runnable module, executed against whichever database
+DATABASE_URL points to, e.g.
+
+    python -m benchmarks.movie_list_plan
+
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movies.settings')
+django.setup()
@@ -0,0 +1,59 @@
+import json
+import math
+import time
+from typing import Any, Callable, Iterable
+
+from django.db import connection
+from django.db.models import QuerySet
+
+
+def explain_sql(sql: str, params: Iterable[Any] = (), *, analyze: bool = True) -> dict[str, Any]:
+    """Return the JSON query plan of a SQL statement"""
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+        plan, = cursor.fetchone()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def explain(queryset: QuerySet, **kwargs) -> dict[str, Any]:
+    """Return the JSON query plan of a queryset"""
+    sql, params = queryset.query.sql_with_params()
+    return explain_sql(sql, params, **kwargs)
+
+
+def iter_plan_nodes(node: dict[str, Any]) -> Iterable[dict[str, Any]]:
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_plan_nodes(child)
+
+
+def max_rows_produced(plan: dict[str, Any]) -> int:
+    """Return the most rows produced by any one node of an EXPLAIN ANALYZE plan"""
+    return max(
+        int(node.get('Actual Rows', 0) * node.get('Actual Loops', 1))
+        for node in iter_plan_nodes(plan['Plan'])
+    )
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the nearest-rank percentile of some samples
+
+    >>> percentile([5, 1, 4, 2, 3], 50)
+    3
+    >>> percentile([5, 1, 4, 2, 3], 99)
+    5
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def time_ms(func: Callable[[], Any]) -> float:
+    """Return how long, in milliseconds, it takes to call a function"""
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,86 @@
+"""Compare the speed of reading a ratings CSV from a zip, with progress reported
+
+A synthetic ratings.csv (10M rows, by default) is generated into a zip in a
+temporary directory, then read by:
+
+  - legacy: counting the rows with one parse, then parsing them again as dicts
+  - dicts: one pass as dicts, reporting progress by byte position
+  - tuples: one pass as tuples of selected columns, reporting progress by byte position
+
+    python -m benchmarks.csv_reading --rows 10000000
+
+"""
+import csv
+import io
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, TextIO
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from tqdm import tqdm
+
+from movies.management.commands.load_dataset import read_csv_dicts, read_csv_tuples
+
+RATING_COLUMNS = ('userId', 'movieId', 'rating', 'timestamp')
+
+
+def generate_ratings_zip(path: Path, num_rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with ZipFile(path, 'w', compression=ZIP_DEFLATED) as zipf:
+        with zipf.open('ratings.csv', 'w') as binary, \
+                io.TextIOWrapper(binary, encoding='utf-8', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(RATING_COLUMNS)
+            for _ in range(num_rows):
+                writer.writerow((
+                    rng.randrange(1, 300_000),
+                    rng.randrange(1, 200_000),
+                    rng.randrange(1, 11) / 2,
+                    rng.randrange(800_000_000, 1_600_000_000),
+                ))
+
+
+def legacy_read_csv_dicts(fp: TextIO) -> Iterable[dict]:
+    """The original reader, which counted rows up front to report progress"""
+    num_rows = sum(1 for _ in csv.reader(fp)) - 1  # account for header row
+    fp.seek(0)
+    return tqdm(csv.DictReader(fp), total=num_rows, unit='rating', leave=False)
+
+
+READERS: dict[str, Callable[[TextIO, int], Iterable]] = {
+    'legacy': lambda fp, size: legacy_read_csv_dicts(fp),
+    'dicts': lambda fp, size: read_csv_dicts(fp, total_bytes=size, unit='rating'),
+    'tuples': lambda fp, size: read_csv_tuples(fp, RATING_COLUMNS, total_bytes=size, unit='rating'),
+}
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--reader', action='append', choices=list(READERS), dest='readers',
+                        help='Reader to benchmark (may be passed multiple times). Defaults to all.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'ratings.zip'
+        print(f'Generating {args.rows} ratings ...')
+        generate_ratings_zip(path, args.rows)
+
+        print(f'{"reader":>7} {"seconds":>9} {"rows/sec":>10}')
+        for name in args.readers or READERS:
+            with ZipFile(path) as zipf:
+                info = zipf.getinfo('ratings.csv')
+                with io.TextIOWrapper(zipf.open(info), encoding='utf-8', newline='') as fp:
+                    start = time.perf_counter()
+                    deque(READERS[name](fp, info.file_size), maxlen=0)
+                    elapsed = time.perf_counter() - start
+
+            print(f'{name:>7} {elapsed:>9.2f} {args.rows / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Measure dataset import throughput, and the latency of representative API queries
+
+The dataset is loaded with load_dataset (replacing whatever is loaded now),
+then requests are made to the movies API (in-process, through Django's test
+client, with response caching disabled), for:
+
+  - list: the first page of movies
+  - list_deep: a page from the middle of all movies
+  - list_keyset: the first page of movies, with keyset pagination
+  - ordered: the first page of movies, by average rating
+  - top_rated: the first page of movies since 1990, by weighted rating
+  - search: movies matching a title word
+  - search_relevance: movies matching a title word, most relevant first
+  - search_fuzzy: movies matching a misspelled title word (falling back to fuzzy search)
+  - detail: a single movie
+  - suggest: suggestions for the start of a title word
+
+Queries are derived from a random sample of the loaded movies. This reports
+the import throughput, and the p50/p95/p99 latency of each kind of query, and
+optionally writes them as JSON, for tracking regressions between runs.
+
+Without a dataset, a synthetic one is generated (see benchmarks.synthetic_dataset):
+
+    python -m benchmarks.end_to_end --movies 100000 --ratings 50000000 --json results.json
+    python -m benchmarks.end_to_end path/to/ml-latest.zip --workers 4 --json results.json
+    python -m benchmarks.end_to_end --skip-load --json results.json
+
+"""
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework.settings import api_settings
+
+from benchmarks._util import percentile, time_ms
+from benchmarks.search_latency import make_queries
+from benchmarks.synthetic_dataset import generate_dataset
+from movies.models import Genre, Movie, Rating, Tag, User
+
+# Each kind of query, and how to make its URL from a sampled movie's ID and derived queries
+QUERY_URLS: dict[str, Callable[[int, dict[str, str], int], Optional[str]]] = {
+    'list': lambda movie_id, queries, num_pages: '/api/movies',
+    'list_deep': lambda movie_id, queries, num_pages: f'/api/movies?page={max(1, num_pages // 2)}',
+    'list_keyset': lambda movie_id, queries, num_pages: '/api/movies?cursor=',
+    'ordered': lambda movie_id, queries, num_pages: '/api/movies?ordering=-avg_rating',
+    'top_rated': lambda movie_id, queries, num_pages: '/api/movies?year__gte=1990&ordering=-weighted_rating',
+    'search': lambda movie_id, queries, num_pages: queries and f'/api/movies?q={queries["word"]}',
+    'search_relevance': lambda movie_id, queries, num_pages: (
+        queries and f'/api/movies?q={queries["word"]}&ordering=relevance'),
+    'search_fuzzy': lambda movie_id, queries, num_pages: queries and f'/api/movies?q={queries["typo"]}',
+    'detail': lambda movie_id, queries, num_pages: f'/api/movies/{movie_id}',
+    'suggest': lambda movie_id, queries, num_pages: queries and f'/api/movies/suggest?q={queries["prefix"]}',
+}
+
+
+def count_rows() -> dict[str, int]:
+    return {
+        'movies': Movie.objects.count(),
+        'movie_genres': Movie.genres.through.objects.count(),
+        'genres': Genre.objects.count(),
+        'ratings': Rating.objects.count(),
+        'tags': Tag.objects.count(),
+        'users': User.objects.count(),
+    }
+
+
+def load(source: str, **load_options) -> dict[str, Any]:
+    """Load the whole dataset, returning the time taken, and rows loaded"""
+    start = time.perf_counter()
+    call_command('load_dataset', source, full=True, **load_options, stdout=StringIO())
+    elapsed = time.perf_counter() - start
+
+    row_counts = count_rows()
+    num_rows = sum(row_counts.values())
+    return {
+        'seconds': elapsed,
+        'rows': row_counts,
+        'rows_per_sec': num_rows / elapsed,
+    }
+
+
+def measure_queries(num_samples: int, rng: random.Random) -> dict[str, dict[str, float]]:
+    """Request each kind of query, returning the percentiles of their latencies (in ms)"""
+    movie_ids = list(Movie.objects.values_list('id', flat=True))
+    num_pages = max(1, len(movie_ids) // api_settings.PAGE_SIZE)
+    sample_ids = rng.sample(movie_ids, min(num_samples, len(movie_ids)))
+    titles = dict(Movie.objects.filter(pk__in=sample_ids).values_list('id', 'title'))
+    samples = [(movie_id, make_queries(titles[movie_id], rng)) for movie_id in sample_ids]
+
+    client = Client()
+    results = {}
+    for kind, make_url in QUERY_URLS.items():
+        urls = [url for movie_id, queries in samples if (url := make_url(movie_id, queries, num_pages))]
+
+        # Warm up caches, so the first queries measured aren't penalized
+        for url in urls[:5]:
+            client.get(url)
+
+        timings = []
+        for url in urls:
+            responses = []
+            timings.append(time_ms(lambda: responses.append(client.get(url))))
+            if (response := responses[0]).status_code != 200:
+                raise RuntimeError(f'GET {url} responded {response.status_code}: {response.content[:200]!r}')
+
+        results[kind] = {
+            'n': len(timings),
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+        }
+
+    return results
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('source', nargs='?',
+                        help='Path or URL of a MovieLens dataset zip. Defaults to a synthetic dataset.')
+    parser.add_argument('--skip-load', action='store_true', default=False,
+                        help='Only measure queries, against the dataset already loaded')
+
+    synthetic = parser.add_argument_group('synthetic dataset')
+    synthetic.add_argument('--movies', type=int, default=100_000)
+    synthetic.add_argument('--ratings', type=int, default=1_000_000)
+    synthetic.add_argument('--tags', type=int, default=None,
+                           help='Number of tags. Defaults to 1 for every 15 ratings.')
+    synthetic.add_argument('--seed', type=int, default=0)
+
+    loading = parser.add_argument_group('loading')
+    loading.add_argument('--engine', choices=('copy', 'orm'), default=None)
+    loading.add_argument('--workers', type=int, default=1)
+    loading.add_argument('--defer-indexes', action='store_true', default=False)
+    loading.add_argument('--swap', action='store_true', default=False)
+
+    querying = parser.add_argument_group('querying')
+    querying.add_argument('-n', '--num-samples', type=int, default=200,
+                          help='Number of movies to derive queries of each kind from')
+
+    parser.add_argument('--json', metavar='PATH',
+                        help='Where to write the results as JSON (- for stdout)')
+    args = parser.parse_args()
+
+    report: dict[str, Any] = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'database_version': getattr(connection, 'pg_version', None),
+            'cpus': os.cpu_count(),
+        },
+    }
+
+    if not args.skip_load:
+        load_options = {
+            'engine': args.engine,
+            'workers': args.workers,
+            'defer_indexes': args.defer_indexes,
+            'swap': args.swap,
+        }
+        report['load_options'] = load_options
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = args.source
+            if source is None:
+                source = str(Path(tmpdir) / 'ml-synthetic.zip')
+                scale = {
+                    'movies': args.movies,
+                    'ratings': args.ratings,
+                    'tags': args.ratings // 15 if args.tags is None else args.tags,
+                    'seed': args.seed,
+                }
+                print(f'Generating synthetic dataset: {scale} ...', file=sys.stderr)
+                generate_dataset(Path(source), **scale)
+                report['dataset'] = {'synthetic': scale}
+            else:
+                report['dataset'] = {'source': source}
+
+            print('Loading dataset ...', file=sys.stderr)
+            report['load'] = load(source, **load_options)
+
+        print(f'Loaded {sum(report["load"]["rows"].values())} rows in {report["load"]["seconds"]:.2f}s '
+              f'({report["load"]["rows_per_sec"]:.0f} rows/sec)')
+
+    with override_settings(ALLOWED_HOSTS=['testserver'], MOVIES_RESPONSE_CACHE_TTL=0):
+        report['queries'] = measure_queries(args.num_samples, random.Random(args.seed))
+
+    print(f'{"query":>16} {"n":>5} {"p50":>9} {"p95":>9} {"p99":>9}')
+    for kind, result in report['queries'].items():
+        print(f'{kind:>16} {result["n"]:>5} '
+              f'{result["p50_ms"]:>7.2f}ms {result["p95_ms"]:>7.2f}ms {result["p99_ms"]:>7.2f}ms')
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
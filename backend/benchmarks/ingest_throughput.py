@@ -0,0 +1,69 @@
+"""Compare the throughput of load_dataset's COPY and ORM (bulk_create) engines
+
+Each engine loads the dataset within a transaction, which is rolled back
+afterward, leaving the database as it was. This reports the time taken and
+rows inserted per second, across all tables.
+
+The COPY engine is measured with each number of --workers requested, to
+gauge how parallel loading scales.
+
+    python -m benchmarks.ingest_throughput path/to/ml-latest.zip --workers 1 --workers 2 --workers 4
+
+"""
+import time
+from argparse import ArgumentParser
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from movies.models import Genre, Movie, Rating, Tag, User
+from movies.parallel_load import drop_staging_tables
+
+
+def count_rows() -> int:
+    return sum((
+        Movie.objects.count(),
+        Movie.genres.through.objects.count(),
+        Genre.objects.count(),
+        Rating.objects.count(),
+        Tag.objects.count(),
+        User.objects.count(),
+    ))
+
+
+def load(source: str, engine: str, workers: int = 1) -> tuple[float, int]:
+    """Load the dataset with an engine, returning the seconds taken and rows inserted"""
+    with transaction.atomic():
+        start = time.perf_counter()
+        call_command('load_dataset', source, engine=engine, workers=workers, stdout=StringIO())
+        elapsed = time.perf_counter() - start
+
+        num_rows = count_rows()
+        transaction.set_rollback(True)
+
+    # NOTE: the staging tables' removal was rolled back along with the load
+    drop_staging_tables(connection.get_connection_params())
+
+    return elapsed, num_rows
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('source', help='Path or URL of a MovieLens dataset zip')
+    parser.add_argument('--engine', action='append', choices=('copy', 'orm'), dest='engines',
+                        help='Engine to benchmark (may be passed multiple times). Defaults to both.')
+    parser.add_argument('--workers', action='append', type=int, dest='worker_counts',
+                        help='Number of workers to benchmark the COPY engine with '
+                             '(may be passed multiple times). Defaults to 1.')
+    args = parser.parse_args()
+
+    print(f'{"engine":>6} {"workers":>7} {"rows":>10} {"seconds":>9} {"rows/sec":>10}')
+    for engine in args.engines or ('orm', 'copy'):
+        for workers in (args.worker_counts or [1]) if engine == 'copy' else [1]:
+            elapsed, num_rows = load(args.source, engine, workers)
+            print(f'{engine:>6} {workers:>7} {num_rows:>10} {elapsed:>9.2f} {num_rows / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Compare the speed of setting movies' IMDb and TMDB IDs from links.csv
+
+Synthetic movies and links (100k, by default) are loaded by:
+
+  - bulk_update: inserting movies, then bulk_update'ing their links per 1000 rows
+  - merged: joining links to movies as they're read, inserting both at once
+
+And the links of existing movies are all changed by:
+
+  - bulk_update: bulk_update'ing the changed links per 1000 rows
+  - copy_update: COPYing the links to a temporary table, then one UPDATE ... FROM
+
+Each runs within a transaction, which is rolled back afterward.
+
+    python -m benchmarks.link_update --movies 100000
+
+"""
+import time
+from argparse import ArgumentParser
+from typing import Callable
+
+from django.db import connection, transaction
+
+from movies.bulk_copy import copy_update
+from movies.management.commands.load_dataset import chunked, merge_links
+from movies.models import Movie
+
+
+def generate_links(num_movies: int, generation: int = 0) -> list[tuple[str, str, str]]:
+    return [
+        (str(movie_id), f'{movie_id + generation:07d}', str(movie_id * 3 + generation))
+        for movie_id in range(1, num_movies + 1)
+    ]
+
+
+def generate_movies(num_movies: int) -> list[Movie]:
+    return [Movie(id=movie_id, title=f'Movie {movie_id}') for movie_id in range(1, num_movies + 1)]
+
+
+def load_then_bulk_update(num_movies: int) -> None:
+    for movies in chunked(generate_movies(num_movies), 500):
+        Movie.objects.bulk_create(movies, ignore_conflicts=True)
+
+    for links in chunked(generate_links(num_movies), 1000):
+        Movie.objects.bulk_update([
+            Movie(id=movie_id, imdb_id=imdb_id, tmdb_id=tmdb_id)
+            for movie_id, imdb_id, tmdb_id in links
+        ], ['imdb_id', 'tmdb_id'])
+
+
+def load_merged(num_movies: int) -> None:
+    for movies in chunked(merge_links(generate_movies(num_movies), generate_links(num_movies)), 500):
+        Movie.objects.bulk_create(movies, ignore_conflicts=True)
+
+
+def update_with_bulk_update(num_movies: int) -> None:
+    Movie.objects.bulk_update([
+        Movie(id=movie_id, imdb_id=imdb_id, tmdb_id=tmdb_id)
+        for movie_id, imdb_id, tmdb_id in generate_links(num_movies, generation=1)
+    ], ['imdb_id', 'tmdb_id'], batch_size=1000)
+
+
+def update_with_copy(num_movies: int) -> None:
+    copy_update(Movie, ('imdb_id', 'tmdb_id'), generate_links(num_movies, generation=1))
+
+
+LOADERS: dict[str, Callable[[int], None]] = {
+    'bulk_update': load_then_bulk_update,
+    'merged': load_merged,
+}
+
+UPDATERS: dict[str, Callable[[int], None]] = {
+    'bulk_update': update_with_bulk_update,
+    'copy_update': update_with_copy,
+}
+
+
+def run(func: Callable[[int], None], num_movies: int, *, existing: bool) -> float:
+    """Time a function within a transaction (rolled back afterward), returning the seconds taken"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE TABLE {Movie._meta.db_table} CASCADE')
+        if existing:
+            load_merged(num_movies)
+
+        start = time.perf_counter()
+        func(num_movies)
+        elapsed = time.perf_counter() - start
+
+        transaction.set_rollback(True)
+
+    return elapsed
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--movies', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f'{"phase":>6} {"method":>11} {"seconds":>9} {"movies/sec":>10}')
+    for phase, methods, existing in (('load', LOADERS, False), ('update', UPDATERS, True)):
+        for name, func in methods.items():
+            elapsed = run(func, args.movies, existing=existing)
+            print(f'{phase:>6} {name:>11} {elapsed:>9.2f} {args.movies / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
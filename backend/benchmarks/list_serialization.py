@@ -0,0 +1,90 @@
+"""Compare the latency of producing a page of listed movies, from query to rendered JSON
+
+Random pages of movies (as listed by MovieViewSet) are retrieved and rendered by:
+
+  - serializer: model instances, represented by MovieSerializer, rendered by JSONRenderer
+  - rows: value rows, represented by serialize_movie_rows, rendered by JSONRenderer
+  - rows_fast: value rows, represented by serialize_movie_rows, rendered by FastJSONRenderer
+
+For each path, this reports the p50/p99 latency of querying, representing,
+and rendering each page, and in total.
+
+Best run against a database loaded with a large dataset, e.g.
+
+    python manage.py load_dataset https://files.grouplens.org/datasets/movielens/ml-latest.zip
+    python -m benchmarks.list_serialization --page-size 100
+
+"""
+import random
+from argparse import ArgumentParser
+from typing import Any, Callable
+
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks._util import percentile, time_ms
+from movies.renderers import FastJSONRenderer
+from movies.views.movie import MOVIE_ROW_FIELDS, MovieSerializer, MovieViewSet, serialize_movie_rows
+
+
+def query_instances(offset: int, page_size: int) -> list[Any]:
+    return list(MovieViewSet.queryset[offset:offset + page_size])
+
+
+def query_rows(offset: int, page_size: int) -> list[Any]:
+    return list(MovieViewSet.queryset.values_list(*MOVIE_ROW_FIELDS, named=True)[offset:offset + page_size])
+
+
+def represent_instances(movies: list[Any]) -> list[dict[str, Any]]:
+    return MovieSerializer(movies, many=True).data
+
+
+# Path name -> (query, represent, render)
+LIST_PATHS: dict[str, tuple[Callable[[int, int], list[Any]], Callable[[list[Any]], Any], Callable[[Any], bytes]]] = {
+    'serializer': (query_instances, represent_instances, JSONRenderer().render),
+    'rows': (query_rows, serialize_movie_rows, JSONRenderer().render),
+    'rows_fast': (query_rows, serialize_movie_rows, FastJSONRenderer().render),
+}
+
+
+def measure(path: str, offsets: list[int], page_size: int) -> dict[str, list[float]]:
+    """Produce a page at each offset, returning the timings (in ms) of each stage"""
+    query, represent, render = LIST_PATHS[path]
+    timings = {'query': [], 'represent': [], 'render': [], 'total': []}
+    for offset in offsets:
+        stages = {}
+        stages['query'] = time_ms(lambda: stages.__setitem__('rows', query(offset, page_size)))
+        stages['represent'] = time_ms(lambda: stages.__setitem__('data', represent(stages['rows'])))
+        stages['render'] = time_ms(lambda: render(stages['data']))
+
+        for stage in ('query', 'represent', 'render'):
+            timings[stage].append(stages[stage])
+        timings['total'].append(stages['query'] + stages['represent'] + stages['render'])
+
+    return timings
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-n', '--num-pages', type=int, default=200,
+                        help='Number of random pages to produce with each path')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    num_movies = MovieViewSet.queryset.count()
+    offsets = [rng.randrange(max(1, num_movies - args.page_size)) for _ in range(args.num_pages)]
+
+    # Warm up caches, so the first pages measured aren't penalized
+    for path in LIST_PATHS:
+        measure(path, offsets[:10], args.page_size)
+
+    print(f'{"path":>10} {"stage":>9} {"p50":>9} {"p99":>9}')
+    for path in LIST_PATHS:
+        for stage, timings in measure(path, offsets, args.page_size).items():
+            print(f'{path:>10} {stage:>9} '
+                  f'{percentile(timings, 50):>7.2f}ms {percentile(timings, 99):>7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
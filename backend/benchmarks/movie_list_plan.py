@@ -0,0 +1,68 @@
+"""Compare the query plans of listing movies with and without to-many joins
+
+Before, MovieViewSet joined both ratings and genres in one GROUP BY, producing
+ratings × genres rows per movie before aggregating. This reports, for the
+first page and for the pagination count, the execution time and the most rows
+produced by any single plan node — i.e. the row explosion.
+
+Best run against a database loaded with a large dataset, e.g.
+
+    python manage.py load_dataset https://files.grouplens.org/datasets/movielens/ml-latest.zip
+    python -m benchmarks.movie_list_plan
+
+"""
+from argparse import ArgumentParser
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Avg, Count, Q, QuerySet
+
+from benchmarks._util import explain, explain_sql, max_rows_produced
+from movies.models import Movie
+from movies.search import parse_search_query
+from movies.views import MovieViewSet
+
+
+def get_joined_queryset() -> QuerySet:
+    """The movie list queryset as it was, with ratings and genres joined in one GROUP BY"""
+    return (
+        Movie.objects.all()
+            .annotate(
+                avg_rating=Avg('ratings__rating'),
+                num_ratings=Count('ratings__rating'),
+                genre_names=ArrayAgg('genres__name', filter=Q(genres__name__isnull=False)),
+            )
+            .order_by('id')
+    )
+
+
+def get_current_queryset() -> QuerySet:
+    return MovieViewSet.queryset.all()
+
+
+def report(name: str, queryset: QuerySet, page_size: int) -> None:
+    page_plan = explain(queryset[:page_size])
+
+    sql, params = queryset.query.sql_with_params()
+    count_plan = explain_sql(f'SELECT COUNT(*) FROM ({sql}) subquery', params)
+
+    for label, plan in (('page', page_plan), ('count', count_plan)):
+        print(f'{name:>8} {label:>6}: '
+              f'{plan["Execution Time"]:>10.1f}ms  '
+              f'max rows produced by a node: {max_rows_produced(plan):>12,}')
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-q', '--query', default='',
+                        help='Search query to filter movies by (as with /api/movies?q=)')
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    for name, queryset in (('joined', get_joined_queryset()), ('current', get_current_queryset())):
+        if args.query:
+            queryset = queryset.search(parse_search_query(args.query), search_type='raw')
+        report(name, queryset, args.page_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Compare the latency of full-text (tsquery) and fuzzy (trigram) title search
+
+Queries are derived from a random sample of the loaded movies' titles:
+
+  - prefix: the first few letters of a title word (as typed into the search box)
+  - word: a whole title word
+  - typo: a title word with two of its letters swapped
+
+For each path and kind of query, this reports the p50/p99 latency of
+retrieving the first page of results, and how many queries found the movie
+their query was derived from.
+
+Best run against a database loaded with a large dataset, e.g.
+
+    python manage.py load_dataset https://files.grouplens.org/datasets/movielens/ml-latest.zip
+    python -m benchmarks.search_latency
+
+"""
+import random
+import re
+from argparse import ArgumentParser
+from typing import Callable
+
+from benchmarks._util import percentile, time_ms
+from movies.models import Movie
+from movies.search import parse_search_query
+
+
+def make_queries(title: str, rng: random.Random) -> dict[str, str]:
+    words = [word for word in re.findall(r'\w+', title) if len(word) >= 4]
+    if not words:
+        return {}
+
+    word = rng.choice(words).lower()
+    i = rng.randrange(1, len(word) - 1)
+    return {
+        'prefix': word[:rng.randint(1, 3)],
+        'word': word,
+        'typo': word[:i] + word[i + 1] + word[i] + word[i + 2:],
+    }
+
+
+def search_tsquery(query: str, page_size: int) -> list[int]:
+    return list(
+        Movie.objects.search(parse_search_query(query), search_type='raw')
+            .order_by('id')
+            .values_list('id', flat=True)[:page_size]
+    )
+
+
+def search_trigram(query: str, page_size: int) -> list[int]:
+    return list(
+        Movie.objects.fuzzy_search(query)
+            .order_by('-title_similarity', 'id')
+            .values_list('id', flat=True)[:page_size]
+    )
+
+
+SEARCH_PATHS: dict[str, Callable[[str, int], list[int]]] = {
+    'tsquery': search_tsquery,
+    'trigram': search_trigram,
+}
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-n', '--num-titles', type=int, default=200,
+                        help='Number of movie titles to derive queries from')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    movie_ids = list(Movie.objects.values_list('id', flat=True))
+    sample_ids = rng.sample(movie_ids, min(args.num_titles, len(movie_ids)))
+    titles = dict(Movie.objects.filter(pk__in=sample_ids).values_list('id', 'title'))
+
+    samples = [
+        (movie_id, kind, query)
+        for movie_id, title in titles.items()
+        for kind, query in make_queries(title, rng).items()
+    ]
+
+    # Warm up caches, so the first queries measured aren't penalized
+    for movie_id, kind, query in samples[:20]:
+        for search in SEARCH_PATHS.values():
+            search(query, args.page_size)
+
+    print(f'{"path":>8} {"query":>7} {"p50":>9} {"p99":>9} {"found":>11}')
+    for kind in ('prefix', 'word', 'typo'):
+        kind_samples = [(movie_id, query) for movie_id, sample_kind, query in samples if sample_kind == kind]
+
+        for name, search in SEARCH_PATHS.items():
+            timings = []
+            num_found = 0
+            for movie_id, query in kind_samples:
+                results = []
+                timings.append(time_ms(lambda: results.extend(search(query, args.page_size))))
+                num_found += movie_id in results
+
+            print(f'{name:>8} {kind:>7} '
+                  f'{percentile(timings, 50):>7.2f}ms {percentile(timings, 99):>7.2f}ms '
+                  f'{num_found:>5}/{len(kind_samples):<5}')
+
+
+if __name__ == '__main__':
+    main()
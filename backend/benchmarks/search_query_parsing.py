@@ -0,0 +1,177 @@
+"""Micro-benchmark parsing search queries to tsquery format
+
+Before timing anything, the doctests of movies.search are run, and the
+tsquery produced for each benchmarked query is validated by Postgres. Any
+failure aborts the benchmark.
+
+For each query, this reports the median time taken to parse it by:
+
+  - legacy: the original char-by-char parser
+  - uncached: the current tokenizer, bypassing the parsed query cache
+  - cached: parse_search_query, as called by the API (after a first call)
+
+Run with, e.g.
+
+    python -m benchmarks.search_query_parsing
+
+"""
+import doctest
+import re
+import statistics
+import sys
+import timeit
+from argparse import ArgumentParser
+from typing import Callable
+
+from django.db import connection
+
+from movies import search
+from movies.search import normalize_search_query, parse_search_query
+
+QUERIES: dict[str, str] = {
+    'short': 'godfather',
+    'typical': 'star wars -"phantom menace" or empire',
+    'long': ' '.join(['monkey business'] * 2_000),
+    'many quotes': '"' * 5_000,
+    'many phrases': ' '.join(['"twue wub"'] * 1_000),
+    'many negations': '-' * 5_000 + 'muffin',
+    'operators': '<->&|!:*()\\' * 1_000,
+}
+
+
+def legacy_parse_search_query(q: str) -> str:
+    """The original parser, for comparison"""
+    is_negated = False
+    is_or_join = False
+    parts = []
+
+    def add_part(part: str) -> None:
+        nonlocal is_negated, is_or_join
+
+        if parts:
+            parts.append('|' if is_or_join else '&')
+            is_or_join = False
+
+        if is_negated:
+            part = '!' + part
+            is_negated = False
+        parts.append(part)
+
+    def escape_word(word: str) -> str:
+        return re.sub(r'[()\'"&|]|<->', '', word)
+
+    i = 0
+    while i < len(q):
+        c = q[i]
+        if c == '"':
+            i += 1
+
+            if (quoted_len := q[i + 1:].find('"')) != -1:
+                quoted = q[i:i + quoted_len + 1]
+                i += quoted_len + 1
+
+                words = quoted.split()
+                escaped_words = [f"'{escape_word(word)}'" for word in words]
+                add_part(f'( {" <-> ".join(escaped_words)} )')
+
+        elif c == ' ':
+            i += 1
+            continue
+
+        elif c == '-':
+            i += 1
+            is_negated = True
+
+        else:
+            word = q[i:]
+            if (word_len := word.find(' ')) != -1:
+                word = word[:word_len]
+            i += len(word)
+
+            if word.lower() == 'or':
+                is_or_join = True
+            else:
+                add_part(f"{escape_word(word)}:*")
+
+    return ' '.join(parts)
+
+
+def parse_uncached(q: str) -> str:
+    # NOTE: this is what parse_search_query does on a cache miss
+    return search._parse_normalized_search_query.__wrapped__(normalize_search_query(q))
+
+
+PARSERS: dict[str, Callable[[str], str]] = {
+    'legacy': legacy_parse_search_query,
+    'uncached': parse_uncached,
+    'cached': parse_search_query,
+}
+
+
+def check_doctests() -> bool:
+    results = doctest.testmod(search)
+    return results.failed == 0
+
+
+def is_valid_tsquery(tsquery: str) -> bool:
+    """Return whether Postgres accepts the tsquery"""
+    with connection.cursor() as cursor:
+        cursor.execute('SAVEPOINT validate_tsquery')
+        try:
+            cursor.execute("SELECT to_tsquery('english', %s)", [tsquery])
+        except Exception:
+            cursor.execute('ROLLBACK TO SAVEPOINT validate_tsquery')
+            return False
+        else:
+            cursor.execute('RELEASE SAVEPOINT validate_tsquery')
+            return True
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-n', '--number', type=int, default=100,
+                        help='Number of times to parse each query per timing')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of timings to take the median of')
+    parser.add_argument('--no-validate', action='store_false', dest='validate', default=True,
+                        help='Skip validating the parsed queries with Postgres')
+    args = parser.parse_args()
+
+    if not check_doctests():
+        sys.exit('Doctests of movies.search failed')
+
+    if args.validate:
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('BEGIN')
+        try:
+            invalid = [name for name, query in QUERIES.items()
+                       if not is_valid_tsquery(parse_search_query(query))]
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('ROLLBACK')
+
+        if invalid:
+            sys.exit(f'Postgres rejected the parsed queries: {", ".join(invalid)}')
+
+    print(f'{"query":>15} {"length":>7} ' + ' '.join(f'{name:>11}' for name in PARSERS))
+    for name, query in QUERIES.items():
+        timings = []
+        for parse in PARSERS.values():
+            number = args.number
+            # NOTE: the legacy parser is quadratic in some cases, so it's timed less often
+            if parse is legacy_parse_search_query and len(query) > 1_000:
+                number = max(1, number // 10)
+
+            parse(query)  # warm up (and populate the cache)
+            samples = timeit.repeat(lambda: parse(query), number=number, repeat=args.repeat)
+            timings.append(statistics.median(samples) / number * 1_000_000)
+
+        print(f'{name:>15} {len(query):>7} ' + ' '.join(f'{timing:>9.1f}us' for timing in timings))
+
+    info = parse_search_query.cache_info()
+    print(f'\ncache: {info.hits} hits, {info.misses} misses, {info.currsize}/{info.maxsize} entries')
+
+
+if __name__ == '__main__':
+    main()
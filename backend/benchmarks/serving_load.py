@@ -0,0 +1,198 @@
+"""Compare the throughput and tail latency of running deployments of the movies API under load
+
+Each deployment (e.g. one served over WSGI, one over ASGI) is sent a mix of
+list, search, and detail requests, by a number of concurrent clients, each
+with its own keep-alive connection. Like the frontend aborting searches as
+the user keeps typing, a fraction of searches are abandoned shortly after
+being sent (by closing the connection) — over ASGI, these are cancelled,
+rather than tying up the server until they're done.
+
+Queries are derived from a random sample of the loaded movies (as in
+benchmarks.end_to_end). For each deployment and level of concurrency, this
+reports the requests completed per second, their p50/p95/p99 latency, and
+how many failed.
+
+Responses shouldn't be served from cache, e.g.
+
+    MOVIES_RESPONSE_CACHE_TTL=0 gunicorn -b 127.0.0.1:8000 -w 2 movies.wsgi:application
+    MOVIES_RESPONSE_CACHE_TTL=0 gunicorn -b 127.0.0.1:8001 -w 2 -k uvicorn.workers.UvicornWorker movies.asgi:application
+    python -m benchmarks.serving_load wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001 -c 1 8 32
+
+"""
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from typing import Any
+from urllib.parse import urlsplit
+
+from rest_framework.settings import api_settings
+
+from benchmarks._util import percentile
+from benchmarks.end_to_end import QUERY_URLS
+from benchmarks.search_latency import make_queries
+from movies.models import Movie
+
+DEFAULT_KINDS = ('list', 'search', 'search_relevance', 'search_fuzzy', 'detail')
+
+# Kinds of query which may be abandoned, as the frontend does
+ABANDONABLE_KINDS = ('search', 'search_relevance', 'search_fuzzy')
+
+
+def make_paths(kinds: list[str], num_samples: int, rng: random.Random) -> dict[str, list[str]]:
+    """Derive the paths of each kind of query from a random sample of movies"""
+    movie_ids = list(Movie.objects.values_list('id', flat=True))
+    num_pages = max(1, len(movie_ids) // api_settings.PAGE_SIZE)
+    sample_ids = rng.sample(movie_ids, min(num_samples, len(movie_ids)))
+    titles = dict(Movie.objects.filter(pk__in=sample_ids).values_list('id', 'title'))
+    samples = [(movie_id, make_queries(titles[movie_id], rng)) for movie_id in sample_ids]
+
+    return {
+        kind: [path for movie_id, queries in samples if (path := QUERY_URLS[kind](movie_id, queries, num_pages))]
+        for kind in kinds
+    }
+
+
+class LoadClient(threading.Thread):
+    """Sends requests over a keep-alive connection until told to stop"""
+
+    def __init__(self, base_url: str, paths: dict[str, list[str]], *,
+                 abandon_rate: float, abandon_after: float, seed: int, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.base_url = urlsplit(base_url)
+        self.paths = paths
+        self.abandon_rate = abandon_rate
+        self.abandon_after = abandon_after
+        self.rng = random.Random(seed)
+        self.stop = stop
+
+        self.latencies: list[float] = []
+        self.num_abandoned = 0
+        self.errors: list[str] = []
+
+    def connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.base_url.hostname, self.base_url.port or 80, timeout=60)
+
+    def run(self):
+        connection = self.connect()
+        kinds = list(self.paths)
+        while not self.stop.is_set():
+            kind = self.rng.choice(kinds)
+            path = self.base_url.path.rstrip('/') + self.rng.choice(self.paths[kind])
+
+            try:
+                if kind in ABANDONABLE_KINDS and self.rng.random() < self.abandon_rate:
+                    connection.request('GET', path)
+                    time.sleep(self.abandon_after)
+                    connection.close()
+                    connection = self.connect()
+                    self.num_abandoned += 1
+                    continue
+
+                start = time.perf_counter()
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                elapsed = (time.perf_counter() - start) * 1000
+            except (OSError, http.client.HTTPException) as e:
+                self.errors.append(f'{type(e).__name__}: {e}')
+                connection.close()
+                connection = self.connect()
+                continue
+
+            if response.status != 200:
+                self.errors.append(f'GET {path} responded {response.status}')
+            elif not self.stop.is_set():
+                self.latencies.append(elapsed)
+
+        connection.close()
+
+
+def run_load(base_url: str, paths: dict[str, list[str]], *, concurrency: int, duration: float,
+             abandon_rate: float, abandon_after: float, seed: int) -> dict[str, Any]:
+    stop = threading.Event()
+    clients = [
+        LoadClient(base_url, paths, abandon_rate=abandon_rate, abandon_after=abandon_after,
+                   seed=seed + i, stop=stop)
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    time.sleep(duration)
+    stop.set()
+    for client in clients:
+        client.join()
+
+    latencies = [latency for client in clients for latency in client.latencies]
+    errors = [error for client in clients for error in client.errors]
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'requests_per_sec': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 50) if latencies else None,
+        'p95_ms': percentile(latencies, 95) if latencies else None,
+        'p99_ms': percentile(latencies, 99) if latencies else None,
+        'abandoned': sum(client.num_abandoned for client in clients),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('targets', nargs='+', metavar='NAME=URL',
+                        help='Base URL of each deployment to load, e.g. asgi=http://127.0.0.1:8001')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1, 8, 32],
+                        help='Numbers of concurrent clients to load each deployment with')
+    parser.add_argument('-d', '--duration', type=float, default=10,
+                        help='Seconds to load each deployment, at each concurrency')
+    parser.add_argument('--kinds', nargs='+', choices=QUERY_URLS, default=DEFAULT_KINDS,
+                        help='Kinds of query to request (see benchmarks.end_to_end)')
+    parser.add_argument('--abandon-rate', type=float, default=0.2,
+                        help='Fraction of searches to abandon, rather than await')
+    parser.add_argument('--abandon-after', type=float, default=0.05,
+                        help='Seconds after sending a search to abandon it')
+    parser.add_argument('-n', '--num-samples', type=int, default=200,
+                        help='Number of movies to derive queries of each kind from')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH',
+                        help='Where to write the results as JSON (- for stdout)')
+    args = parser.parse_args()
+
+    targets = dict(target.split('=', 1) for target in args.targets)
+    paths = make_paths(args.kinds, args.num_samples, random.Random(args.seed))
+
+    results = {}
+    print(f'{"target":>8} {"clients":>7} {"req/s":>8} {"p50":>9} {"p95":>9} {"p99":>9} '
+          f'{"abandoned":>9} {"errors":>6}')
+    for name, base_url in targets.items():
+        results[name] = []
+        for concurrency in args.concurrency:
+            print(f'Loading {name} with {concurrency} clients for {args.duration:g}s ...', file=sys.stderr)
+            result = run_load(base_url, paths, concurrency=concurrency, duration=args.duration,
+                              abandon_rate=args.abandon_rate, abandon_after=args.abandon_after,
+                              seed=args.seed)
+            results[name].append(result)
+
+            latencies = ' '.join(
+                f'{result[key]:>7.2f}ms' if result[key] is not None else f'{"-":>9}'
+                for key in ('p50_ms', 'p95_ms', 'p99_ms')
+            )
+            print(f'{name:>8} {concurrency:>7} {result["requests_per_sec"]:>8.1f} {latencies} '
+                  f'{result["abandoned"]:>9} {result["errors"]:>6}')
+            if result['first_error']:
+                print(f'  first error: {result["first_error"]}', file=sys.stderr)
+
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
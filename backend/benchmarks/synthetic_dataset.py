@@ -0,0 +1,297 @@
+"""Generate a synthetic dataset shaped like MovieLens's ml-latest, at any scale
+
+The zip holds movies.csv, links.csv, ratings.csv, and tags.csv, formatted and
+ordered as in ml-latest, so it may be loaded by load_dataset:
+
+  - titles are drawn from a vocabulary of words with Zipfian frequencies, and
+    formatted as MovieLens does (e.g. "Matrix, The (1999)", alternate titles
+    in parentheses, the odd title without a year)
+  - movies' popularity is Zipfian, so a few movies have most of the ratings,
+    while most movies have a handful
+  - users' rating counts are log-normally distributed (heavy-tailed), each
+    user rating distinct movies, over a period of their own
+  - rating values follow ml-latest's distribution of half-stars
+  - tags are added by a fraction of users, drawn from a Zipfian vocabulary
+    (including tags requiring CSV quoting)
+
+Rows are written as they're generated, so any scale fits in memory.
+
+    python -m benchmarks.synthetic_dataset ml-synthetic.zip --movies 100000 --ratings 50000000
+
+"""
+import csv
+import io
+import itertools
+import math
+import random
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Iterator, Sequence
+from zipfile import ZIP_DEFLATED, ZipFile
+
+__all__ = ['generate_dataset']
+
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Children', 'Comedy', 'Crime', 'Documentary', 'Drama',
+    'Fantasy', 'Film-Noir', 'Horror', 'IMAX', 'Musical', 'Mystery', 'Romance', 'Sci-Fi',
+    'Thriller', 'War', 'Western',
+)
+NO_GENRES = '(no genres listed)'
+
+# The most common words of titles, most common first. The vocabulary is
+# extended with made-up words, which make up its long tail.
+TITLE_WORDS = (
+    'love', 'man', 'life', 'night', 'day', 'world', 'story', 'last', 'time', 'house', 'girl',
+    'dead', 'war', 'death', 'black', 'city', 'king', 'blood', 'american', 'christmas', 'dark',
+    'little', 'big', 'home', 'lost', 'red', 'star', 'secret', 'island', 'dream', 'heart', 'white',
+    'return', 'street', 'game', 'family', 'killer', 'women', 'road', 'new', 'river', 'summer',
+    'devil', 'ghost', 'murder', 'angel', 'money', 'blue', 'moon', 'kid', 'boys', 'journey',
+    'music', 'monster', 'fire', 'wild', 'gold', 'hell', 'legend', 'lady', 'shadow',
+    'paradise', 'mystery', 'sea', 'sky', 'zombie', 'wars', 'stone', 'beyond', 'edge',
+    'brother', 'sister', 'father', 'mother', 'daughter', 'son', 'wedding', 'school', 'dragon',
+    'justice', 'revenge', 'rising', 'deep', 'sun', 'winter', 'midnight', 'paris', 'york',
+    'tokyo', 'hotel', 'train', 'alien', 'space', 'machine', 'empire', 'ocean', 'forest',
+)
+TITLE_ARTICLES = ('The', 'A', 'An')
+
+# The most common tags, most common first, followed (in the vocabulary) by title words
+TAGS = (
+    'atmospheric', 'sci-fi', 'funny', 'twist ending', 'based on a book', 'dark comedy',
+    'visually appealing', 'thought-provoking', 'comedy', 'surreal', 'dystopia', 'classic',
+    'social commentary', 'psychology', 'action', 'romance', 'quirky', 'space', 'violence',
+    'stylized', 'cinematography', 'In Netflix queue', 'BD-R', 'nudity (topless)', 'animation',
+    'wire work, "wuxia"', 'Oscar (Best Picture)', 'time travel', 'true story', 'superhero',
+)
+
+# Relative frequencies of ml-latest's rating values
+RATING_WEIGHTS = {
+    0.5: 1.6, 1.0: 3.1, 1.5: 1.7, 2.0: 6.6, 2.5: 5.1,
+    3.0: 19.7, 3.5: 12.9, 4.0: 26.5, 4.5: 8.7, 5.0: 14.1,
+}
+
+# Ratings are timestamped between MovieLens's launch, and about when ml-latest was last published
+FIRST_TIMESTAMP = 789_652_009
+LAST_TIMESTAMP = 1_689_000_000
+
+# Files are written to the zip in this size of chunks
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def zipf_cum_weights(n: int, exponent: float = 1.0) -> list[float]:
+    """Cumulative weights of n ranks with Zipfian frequencies, for random.choices
+
+    >>> zipf_cum_weights(4)
+    [1.0, 1.5, 1.8333333333333333, 2.083333333333333]
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def make_word(rng: random.Random) -> str:
+    """Make up a pronounceable word"""
+    syllables = rng.randint(1, 3)
+    return ''.join(
+        rng.choice('bcdfghjklmnprstvwz') + rng.choice('aeiou') + rng.choice(('', 'n', 'r', 's'))
+        for _ in range(syllables)
+    )
+
+
+class DatasetGenerator:
+    def __init__(self, *,
+                 movies: int,
+                 ratings: int,
+                 tags: int,
+                 ratings_per_user: float = 100,
+                 vocabulary_size: int = 20_000,
+                 seed: int = 0):
+        self.num_movies = movies
+        self.num_ratings = ratings
+        self.num_tags = tags
+        self.ratings_per_user = ratings_per_user
+        self.rng = random.Random(seed)
+
+        self.title_words = list(dict.fromkeys(TITLE_WORDS))
+        while len(self.title_words) < vocabulary_size:
+            self.title_words.append(make_word(self.rng))
+        self.title_word_weights = zipf_cum_weights(len(self.title_words))
+
+        self.tag_names = list(dict.fromkeys(TAGS + tuple(self.title_words[:2000])))
+        self.tag_name_weights = zipf_cum_weights(len(self.tag_names))
+
+        # NOTE: popularity is assigned to movies at random, rather than by ID
+        self.movie_ids_by_popularity = list(range(1, movies + 1))
+        self.rng.shuffle(self.movie_ids_by_popularity)
+        self.movie_popularity_weights = zipf_cum_weights(movies, exponent=0.9)
+
+        self.num_users = 0
+
+    def choose_movies(self, count: int) -> list[int]:
+        """Choose distinct movies, more popular movies more likely"""
+        count = min(count, self.num_movies)
+        if count > self.num_movies // 2:
+            # Rejection sampling would take too long to find the last few unchosen movies
+            return sorted(self.rng.sample(self.movie_ids_by_popularity, count))
+
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(self.movie_ids_by_popularity,
+                                           cum_weights=self.movie_popularity_weights,
+                                           k=count - len(chosen)))
+        return sorted(chosen)
+
+    def make_title(self) -> str:
+        rng = self.rng
+        num_words = rng.choices((1, 2, 3, 4, 5, 6), weights=(20, 30, 25, 13, 8, 4))[0]
+        words = rng.choices(self.title_words, cum_weights=self.title_word_weights, k=num_words)
+        title = ' '.join(word.capitalize() for word in words)
+
+        roll = rng.random()
+        if roll < 0.12:
+            # MovieLens moves leading articles to the end
+            title = f'{title}, {rng.choice(TITLE_ARTICLES)}'
+        elif roll < 0.16:
+            title = f'{title} {rng.randint(2, 4)}'
+        elif roll < 0.17:
+            title = f'"{title}"'
+
+        if rng.random() < 0.05:
+            alternate_title = ' '.join(rng.choices(self.title_words, cum_weights=self.title_word_weights,
+                                                   k=rng.randint(1, 4)))
+            title = f'{title} ({alternate_title.capitalize()})'
+
+        if rng.random() < 0.995:
+            title = f'{title} ({int(rng.triangular(1902, 2023, 2015))})'
+
+        return title
+
+    def iter_movies(self) -> Iterator[Sequence]:
+        for movie_id in range(1, self.num_movies + 1):
+            if self.rng.random() < 0.01:
+                genres = NO_GENRES
+            else:
+                num_genres = self.rng.choices((1, 2, 3, 4), weights=(35, 35, 20, 10))[0]
+                genres = '|'.join(sorted(self.rng.sample(GENRES, num_genres)))
+
+            yield movie_id, self.make_title(), genres
+
+    def iter_links(self) -> Iterator[Sequence]:
+        for movie_id in range(1, self.num_movies + 1):
+            tmdb_id = '' if self.rng.random() < 0.001 else movie_id * 3 + self.rng.randrange(3)
+            yield movie_id, f'{100_000 + movie_id * 7:07d}', tmdb_id
+
+    def iter_ratings(self) -> Iterator[Sequence]:
+        values = list(RATING_WEIGHTS)
+        value_weights = list(itertools.accumulate(RATING_WEIGHTS.values()))
+
+        # Log-normally distributed, with a mean of ratings_per_user
+        sigma = 1.2
+        mu = math.log(self.ratings_per_user) - sigma ** 2 / 2
+
+        remaining = self.num_ratings
+        while remaining:
+            self.num_users += 1
+            user_id = self.num_users
+
+            count = min(remaining, max(1, round(self.rng.lognormvariate(mu, sigma))))
+            movie_ids = self.choose_movies(count)
+            remaining -= len(movie_ids)
+
+            start = self.rng.randint(FIRST_TIMESTAMP, LAST_TIMESTAMP)
+            span = min(LAST_TIMESTAMP - start, int(self.rng.expovariate(1 / (86_400 * 90))))
+            ratings = self.rng.choices(values, cum_weights=value_weights, k=len(movie_ids))
+            for movie_id, rating in zip(movie_ids, ratings):
+                yield user_id, movie_id, rating, start + self.rng.randint(0, span)
+
+    def iter_tags(self) -> Iterator[Sequence]:
+        if not self.num_tags:
+            return
+
+        # Only some users tag, and some tag far more than others
+        num_taggers = min(self.num_users or 1, max(1, self.num_tags // 20))
+        tagger_ids = sorted(self.rng.sample(range(1, (self.num_users or 1) + 1), num_taggers))
+        activity = [self.rng.lognormvariate(0, 1.5) for _ in tagger_ids]
+        total_activity = sum(activity)
+        counts = [int(self.num_tags * weight / total_activity) for weight in activity]
+        for i in self.rng.sample(range(num_taggers), self.num_tags - sum(counts)):
+            counts[i] += 1
+
+        for user_id, count in zip(tagger_ids, counts):
+            start = self.rng.randint(FIRST_TIMESTAMP, LAST_TIMESTAMP)
+            movie_ids = self.choose_movies(max(1, math.ceil(count / 3)))
+            names = self.rng.choices(self.tag_names, cum_weights=self.tag_name_weights, k=count)
+            rows = sorted((self.rng.choice(movie_ids), name) for name in names)
+            end = min(start + 86_400 * 30, LAST_TIMESTAMP)
+            for movie_id, name in rows:
+                yield user_id, movie_id, name, self.rng.randint(start, end)
+
+    def write(self, path: Path, directory: str = 'ml-synthetic') -> dict[str, int]:
+        """Write the dataset's zip, returning the number of rows of each CSV (and of users)"""
+        files = (
+            ('movies', ('movieId', 'title', 'genres'), self.iter_movies()),
+            ('links', ('movieId', 'imdbId', 'tmdbId'), self.iter_links()),
+            ('ratings', ('userId', 'movieId', 'rating', 'timestamp'), self.iter_ratings()),
+            ('tags', ('userId', 'movieId', 'tag', 'timestamp'), self.iter_tags()),
+        )
+
+        row_counts = {}
+        with ZipFile(path, 'w', compression=ZIP_DEFLATED) as zipf:
+            for name, header, rows in files:
+                with zipf.open(f'{directory}/{name}.csv', 'w', force_zip64=True) as binary, \
+                        io.BufferedWriter(binary, WRITE_BUFFER_SIZE) as buffered, \
+                        io.TextIOWrapper(buffered, encoding='utf-8', newline='') as fp:
+                    writer = csv.writer(fp, lineterminator='\n')
+                    writer.writerow(header)
+                    row_counts[name] = 0
+                    for chunk in iter(lambda: list(itertools.islice(rows, 10_000)), []):
+                        writer.writerows(chunk)
+                        row_counts[name] += len(chunk)
+
+        row_counts['users'] = self.num_users
+        return row_counts
+
+
+def generate_dataset(path: Path, *,
+                     movies: int,
+                     ratings: int,
+                     tags: int,
+                     ratings_per_user: float = 100,
+                     seed: int = 0,
+                     ) -> dict[str, int]:
+    """Write a synthetic MovieLens-shaped dataset zip, returning the number of rows of each CSV
+
+    The same arguments always generate the same dataset.
+    """
+    generator = DatasetGenerator(movies=movies, ratings=ratings, tags=tags,
+                                 ratings_per_user=ratings_per_user, seed=seed)
+    return generator.write(path)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('path', type=Path, help='Where to write the dataset zip')
+    parser.add_argument('--movies', type=int, default=100_000)
+    parser.add_argument('--ratings', type=int, default=1_000_000)
+    parser.add_argument('--tags', type=int, default=None,
+                        help='Number of tags. Defaults to 1 for every 15 ratings.')
+    parser.add_argument('--ratings-per-user', type=float, default=100,
+                        help='Mean number of ratings by each user')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    row_counts = generate_dataset(
+        args.path,
+        movies=args.movies,
+        ratings=args.ratings,
+        tags=args.ratings // 15 if args.tags is None else args.tags,
+        ratings_per_user=args.ratings_per_user,
+        seed=args.seed,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(', '.join(f'{count} {name}' for name, count in row_counts.items()))
+    print(f'Wrote {args.path} ({args.path.stat().st_size / 1024 / 1024:.1f} MiB) in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare the query plans of listing top rated movies, with scores computed or stored
+
+Computing each movie's weighted rating from its rating stats in the query
+means every movie passing the filters must be scored and sorted before the
+first page can be returned. Stored (and indexed) weighted ratings allow the
+page to be read off the index, stopping once it's full. This reports, for a
+page of the top rated movies since some year, the execution time, the most
+rows produced by any single plan node, and whether the plan sorts.
+
+Best run against a database loaded with a large dataset, e.g.
+
+    python manage.py load_dataset https://files.grouplens.org/datasets/movielens/ml-latest.zip
+    python -m benchmarks.top_rated_plan --since 1990
+
+"""
+from argparse import ArgumentParser
+from typing import Any, Iterable
+
+from django.db.models import ExpressionWrapper, F, FloatField, QuerySet
+
+from benchmarks._util import explain, max_rows_produced
+from movies.models.movie import WEIGHTED_RATING_PRIOR_COUNT, WEIGHTED_RATING_PRIOR_MEAN
+from movies.views import MovieViewSet
+
+
+def iter_main_plan_nodes(node: dict[str, Any]) -> Iterable[dict[str, Any]]:
+    """Yield the nodes of a plan, except those of subplans (e.g. aggregating each movie's genres)"""
+    yield node
+    for child in node.get('Plans', ()):
+        if child.get('Parent Relationship') != 'SubPlan':
+            yield from iter_main_plan_nodes(child)
+
+
+def get_computed_queryset() -> QuerySet:
+    """The movie list queryset, with weighted ratings computed from the rating stats"""
+    return MovieViewSet.queryset.annotate(
+        computed_weighted_rating=ExpressionWrapper(
+            (F('rating_sum') + WEIGHTED_RATING_PRIOR_COUNT * WEIGHTED_RATING_PRIOR_MEAN)
+            / (F('rating_count') + WEIGHTED_RATING_PRIOR_COUNT),
+            output_field=FloatField(),
+        ),
+    ).order_by('-computed_weighted_rating', 'id')
+
+
+def get_stored_queryset() -> QuerySet:
+    return MovieViewSet.queryset.order_by('-weighted_rating', 'id')
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--since', type=int, default=1990,
+                        help='Only list movies from this year on (as with /api/movies?year__gte=)')
+    parser.add_argument('--min-ratings', type=int, default=0,
+                        help='Only list movies with this many ratings (as with /api/movies?min_ratings=)')
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    for name, queryset in (('computed', get_computed_queryset()), ('stored', get_stored_queryset())):
+        queryset = queryset.filter(year__gte=args.since, rating_count__gte=args.min_ratings)
+        plan = explain(queryset[:args.page_size])
+        sorts = any(node['Node Type'] in ('Sort', 'Incremental Sort')
+                    for node in iter_main_plan_nodes(plan['Plan']))
+
+        print(f'{name:>8}: '
+              f'{plan["Execution Time"]:>10.1f}ms  '
+              f'max rows produced by a node: {max_rows_produced(plan):>12,}  '
+              f'{"sorts" if sorts else "no sort"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+class MoviesConfig(AppConfig):
+    name = 'movies'
+
+    def ready(self):
+        from movies.connections import close_unhealthy_connections
+        request_started.connect(close_unhealthy_connections)
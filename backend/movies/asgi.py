@@ -5,12 +5,87 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+
+Over ASGI, the movies API is served by async views (see movies.urls_async),
+so slow requests (e.g. searches) don't each hold a whole worker. Requests
+whose clients disconnect before they're answered (e.g. searches aborted by
+the frontend as the user keeps typing) are cancelled, along with any of
+their in-flight queries. To serve it, e.g.
+
+    gunicorn -k uvicorn.workers.UvicornWorker movies.asgi:application
+
+or, with the production profile (see movies.gunicorn_conf),
+
+    SERVER_INTERFACE=asgi gunicorn -c python:movies.gunicorn_conf
+
 """
 
+import asyncio
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movies.settings')
 
-application = get_asgi_application()
+
+class MoviesASGIHandler(ASGIHandler):
+    """ASGIHandler which routes requests with the async views' URLconf"""
+
+    urlconf = 'movies.urls_async'
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+class CancelOnDisconnectMiddleware:
+    """ASGI middleware which cancels handling an HTTP request once its client disconnects
+
+    Django (as of 3.2) only notices a disconnect while reading the request
+    body, and otherwise carries on producing a response no one will receive.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        body_received = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] != 'http.request' or not message.get('more_body', False):
+                body_received.set()
+            return message
+
+        async def wait_for_disconnect():
+            # NOTE: until the app has read the whole body, only it may receive
+            await body_received.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        app_task = asyncio.ensure_future(self.app(scope, receive_body, send))
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({app_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not app_task.done():
+                app_task.cancel()
+            disconnect_task.cancel()
+
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            # Only swallow the cancellation caused by the client disconnecting
+            if not disconnect_task.done() or disconnect_task.cancelled():
+                raise
+
+
+# NOTE: this mirrors django.core.asgi.get_asgi_application()
+django.setup(set_prefix=False)
+application = CancelOnDisconnectMiddleware(MoviesASGIHandler())
@@ -0,0 +1,143 @@
+"""Bulk inserts streamed through Postgres's COPY FROM STDIN
+
+Rows are serialized as CSV on demand, as Postgres reads them, so they never
+need to be held in memory (or instantiated as models) all at once.
+"""
+import csv
+import io
+import itertools
+from typing import Any, Iterable, Iterator, Sequence, Type
+
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+__all__ = ['CsvRowStream', 'copy_rows', 'copy_update']
+
+
+class CsvRowStream(io.TextIOBase):
+    """A readable text stream of CSV-formatted rows, serialized as they're read
+
+    >>> CsvRowStream([(1, 'Toy Story', None), (2, 'Crouching Tiger, Hidden Dragon', 2000)]).read()
+    '1,Toy Story,\\n2,"Crouching Tiger, Hidden Dragon",2000\\n'
+    """
+
+    # Number of rows serialized at a time
+    rows_per_chunk = 1000
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows: Iterator[Sequence[Any]] = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> bool:
+        """Serialize the next chunk of rows, returning whether there were any"""
+        self._writer.writerows(itertools.islice(self._rows, self.rows_per_chunk))
+        serialized = self._buffer.getvalue()
+        if not serialized:
+            return False
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending += serialized
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while (size is None or size < 0 or len(self._pending) < size) and self._fill():
+            pass
+
+        if size is None or size < 0:
+            size = len(self._pending)
+
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def copy_rows(model: Type[models.Model],
+              fields: Sequence[str],
+              rows: Iterable[Sequence[Any]],
+              *,
+              using: str = DEFAULT_DB_ALIAS,
+              ) -> int:
+    """Insert rows of values for the given model fields with COPY, returning the number inserted
+
+    None is inserted as NULL. Model instances are never created, so field
+    defaults and save() logic don't apply, though database triggers do.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    model_fields = [model._meta.get_field(name) for name in fields]
+
+    with connection.cursor() as cursor:
+        return _copy(connection, cursor, quote_name(model._meta.db_table), model_fields, rows)
+
+
+def copy_update(model: Type[models.Model],
+                fields: Sequence[str],
+                rows: Iterable[Sequence[Any]],
+                *,
+                using: str = DEFAULT_DB_ALIAS,
+                ) -> int:
+    """Update the given model fields by primary key with COPY, returning the number of rows changed
+
+    Each row holds a primary key, followed by the values of the fields. Rows
+    are streamed into a temporary table, then applied by a single UPDATE, which
+    skips rows whose values are unchanged, and primary keys matching no row.
+    Unlike bulk_update, no CASE expression (of every row's values) is compiled.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    temp_table = quote_name(f'{model._meta.db_table}_update')
+    pk_field = model._meta.pk
+    model_fields = [pk_field] + [model._meta.get_field(name) for name in fields]
+
+    pk_column = quote_name(pk_field.column)
+    columns = [quote_name(field.column) for field in model_fields[1:]]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE {temp_table} ('
+                       + ', '.join(f'{quote_name(field.column)} {field.db_type(connection)}'
+                                   for field in model_fields)
+                       + ') ON COMMIT DROP')
+        _copy(connection, cursor, temp_table, model_fields, rows)
+
+        cursor.execute(
+            f'UPDATE {table} t SET '
+            + ', '.join(f'{column} = u.{column}' for column in columns)
+            + f' FROM {temp_table} u WHERE t.{pk_column} = u.{pk_column}'
+            + f' AND ({", ".join(f"t.{column}" for column in columns)})'
+            + f' IS DISTINCT FROM ({", ".join(f"u.{column}" for column in columns)})'
+        )
+        num_updated = cursor.rowcount
+
+        cursor.execute(f'DROP TABLE {temp_table}')
+
+    return num_updated
+
+
+def _copy(connection, cursor, table: str, model_fields: Sequence[models.Field],
+          rows: Iterable[Sequence[Any]]) -> int:
+    """COPY rows of values for the given fields into an (already quoted) table"""
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in model_fields)
+
+    # NOTE: in CSV format, COPY reads unquoted empty values as NULL, so for
+    #       non-nullable text columns, we have them read as empty strings.
+    not_null_text_columns = [
+        quote_name(field.column)
+        for field in model_fields
+        if isinstance(field, (models.CharField, models.TextField)) and not field.null
+    ]
+    options = 'FORMAT csv'
+    if not_null_text_columns:
+        options += f', FORCE_NOT_NULL ({", ".join(not_null_text_columns)})'
+
+    cursor.copy_expert(
+        f'COPY {table} ({columns}) FROM STDIN WITH ({options})',
+        CsvRowStream(rows),
+        size=64 * 1024,
+    )
+    return cursor.rowcount
@@ -0,0 +1,109 @@
+import hashlib
+from calendar import timegm
+from typing import Collection
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from movies.models import DatasetVersion
+
+__all__ = [
+    'DatasetVersionCacheMixin',
+    'get_dataset_version',
+    'normalize_query_params',
+]
+
+
+def normalize_query_params(query_params: QueryDict, *, ignored: Collection[str] = ()) -> str:
+    """Encode query params, disregarding their order and extraneous whitespace
+
+    >>> normalize_query_params(QueryDict('q=twue++wub&page=2&ordering=-year'), ignored=['page'])
+    'ordering=-year&q=twue+wub'
+    """
+    normalized_params = sorted(
+        (key, ' '.join(value.split()))
+        for key, values in query_params.lists()
+        if key not in ignored
+        for value in values
+    )
+    return urlencode(normalized_params)
+
+
+def get_dataset_version(request) -> DatasetVersion:
+    """Return the current dataset version, retrieved at most once per request"""
+    if not hasattr(request, '_dataset_version'):
+        request._dataset_version = DatasetVersion.objects.get_current()
+    return request._dataset_version
+
+
+class DatasetVersionCacheMixin:
+    """Cache a viewset's list and detail responses by the dataset's version
+
+    Responses carry an ETag and Last-Modified derived from the dataset
+    version, so clients (and proxies) revalidating a response are answered
+    with 304 Not Modified until the dataset changes.
+
+    Rendered responses are also cached server-side, for
+    settings.MOVIES_RESPONSE_CACHE_TTL seconds, keyed by the dataset version
+    and normalized query params. Bumping the version orphans every entry.
+
+    Only JSON responses are cached, as the browsable API varies by user.
+    """
+
+    dataset_version_cached_formats = ('json',)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_dataset_version_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_dataset_version_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_dataset_version_cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format not in self.dataset_version_cached_formats:
+            return handler(request, *args, **kwargs)
+
+        dataset_version = get_dataset_version(request)
+        cache_key = self.get_response_cache_key(request, dataset_version)
+        etag = quote_etag(hashlib.md5(cache_key.encode('utf-8')).hexdigest())
+        last_modified = timegm(dataset_version.modified.utctimetuple())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        if response is None and (cached := cache.get(cache_key)) is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            if timeout := settings.MOVIES_RESPONSE_CACHE_TTL:
+                def cache_response(rendered_response):
+                    cache.set(cache_key, (rendered_response.content, list(rendered_response.items())),
+                              timeout=timeout)
+
+                response.add_post_render_callback(cache_response)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+
+        # NOTE: no-cache permits storing the response, but requires revalidating
+        #       it (cheaply, with our ETag) before reuse.
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def get_response_cache_key(self, request, dataset_version: DatasetVersion) -> str:
+        request_key = '\n'.join((
+            request.path,
+            normalize_query_params(request.query_params),
+            request.accepted_media_type,
+        ))
+        request_hash = hashlib.md5(request_key.encode('utf-8')).hexdigest()
+        return f'movies:response:{dataset_version.version}:{request_hash}'
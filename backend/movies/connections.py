@@ -0,0 +1,25 @@
+from django.db import connections
+
+__all__ = ['close_unhealthy_connections']
+
+
+def close_unhealthy_connections(**kwargs) -> None:
+    """Close persistent database connections (with CONN_HEALTH_CHECKS) that no longer work
+
+    This backports Django 4.1's CONN_HEALTH_CHECKS. Django (as of 3.2) only
+    checks whether a persistent connection still works after an error occurs
+    on it, so a connection broken between requests (e.g. by the database
+    restarting, or a proxy timing out idle connections) fails the next request
+    to use it. Closed connections are reopened on their next use.
+
+    Unlike Django 4.1, which checks a connection on its first use in each
+    request, this checks every open connection when called (at the start of
+    each request, and each job of the database pool).
+    """
+    for conn in connections.all():
+        if (
+            conn.settings_dict.get('CONN_HEALTH_CHECKS')
+            and conn.connection is not None
+            and not conn.is_usable()
+        ):
+            conn.close()
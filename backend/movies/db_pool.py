@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+from movies.connections import close_unhealthy_connections
+
+__all__ = ['DatabaseJobCancelled', 'DatabasePool', 'get_db_pool']
+
+T = TypeVar('T')
+
+
+class DatabaseJobCancelled(Exception):
+    """Raised (within the pool) by queries of a job whose caller stopped waiting for it"""
+
+
+class DatabaseJob:
+    """A function run within a DatabasePool, whose queries may be cancelled from another thread"""
+
+    def __init__(self, func: Callable[..., T], args, kwargs, *, using: str):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.using = using
+        self.cancelled = False
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def __call__(self) -> T:
+        # NOTE: like request_started/request_finished, this closes connections
+        #       past their CONN_MAX_AGE, or broken by an error (or cancellation)
+        close_old_connections()
+        close_unhealthy_connections()
+        try:
+            connection = connections[self.using]
+            with self.lock:
+                self.connection = connection
+            with connection.execute_wrapper(self.execute):
+                return self.func(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.connection = None
+            close_old_connections()
+
+    def execute(self, execute, sql, params, many, context):
+        # Once cancelled, don't start any more of the job's queries
+        if self.cancelled:
+            raise DatabaseJobCancelled('Cancelled before executing query')
+        return execute(sql, params, many, context)
+
+    def cancel(self) -> None:
+        """Cancel the job's in-flight query (if any), and prevent any more from executing"""
+        self.cancelled = True
+
+        with self.lock:
+            connection = self.connection
+            if connection is None or connection.connection is None:
+                return
+
+            # NOTE: both of these are safe to call from any thread, and do nothing
+            #       if no query is in flight
+            if connection.vendor == 'postgresql':
+                connection.connection.cancel()
+            elif connection.vendor == 'sqlite':
+                connection.connection.interrupt()
+
+
+class DatabasePool:
+    """A bounded pool of threads, in which async code may run database (e.g. ORM) work
+
+    Django's ORM can only be used synchronously, so async views can't query
+    the database themselves. Instead, they await functions run in this pool.
+    Each of its threads uses its own database connection (kept open across
+    jobs, subject to CONN_MAX_AGE), so the pool's size bounds both the
+    concurrency of database work and the number of connections used. Any
+    jobs beyond that wait (in the event loop, not a thread) for their turn.
+
+    If the caller stops waiting for a job (i.e. its task is cancelled), the
+    job's in-flight query is cancelled, and any further queries it makes
+    raise DatabaseJobCancelled. Jobs cancelled before starting never run.
+    """
+
+    def __init__(self, max_workers: int, *, using: str = DEFAULT_DB_ALIAS):
+        self.max_workers = max_workers
+        self.using = using
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-pool')
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        job = DatabaseJob(func, args, kwargs, using=self.using)
+        future = self.executor.submit(job)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # NOTE: this only fails if the job has already started
+            if not future.cancel():
+                job.cancel()
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+
+
+_db_pool: Optional[DatabasePool] = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool() -> DatabasePool:
+    """Return this process's database pool, creating it on first use
+
+    NOTE: the pool is only created on first use, so servers which fork
+          workers after loading the app (e.g. gunicorn's --preload)
+          don't share its threads (or connections) between processes.
+    """
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = DatabasePool(settings.MOVIES_DB_POOL_SIZE)
+    return _db_pool
@@ -0,0 +1,185 @@
+"""Deferral of tables' secondary indexes and foreign keys until after a bulk load
+
+Maintaining indexes and checking foreign keys row by row, as rows are
+inserted, is far slower than building each index (and validating each
+foreign key) in one go afterward, once all rows are in place. Index builds
+are also able to use parallel maintenance workers.
+
+Primary keys and unique constraints are kept throughout, as loading relies
+on them (e.g. for ON CONFLICT, and updates by primary key).
+"""
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Type
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+__all__ = ['DeferredIndexes', 'TableDefinition']
+
+
+@dataclass
+class TableDefinition:
+    """The parts of a table's definition which may be dropped and rebuilt"""
+    name: str
+    schema: str
+    # Schema-qualified name, quoted as Postgres quotes it in definitions
+    qualified_name: str
+
+    # (name, definition) of each primary key and unique constraint
+    unique_constraints: list[tuple[str, str]] = field(default_factory=list)
+    # (name, definition) of each foreign key constraint
+    foreign_keys: list[tuple[str, str]] = field(default_factory=list)
+    # (name, CREATE INDEX statement) of each index not backing a constraint
+    indexes: list[tuple[str, str]] = field(default_factory=list)
+    # CREATE TRIGGER statements of each user-defined trigger
+    triggers: list[str] = field(default_factory=list)
+    # (sequence, column) of each sequence owned by a column (i.e. serial columns)
+    sequences: list[tuple[str, str]] = field(default_factory=list)
+    # Names of other tables with foreign keys referencing this one
+    referenced_by: list[str] = field(default_factory=list)
+
+
+class DeferredIndexes:
+    """Drop tables' secondary indexes and foreign keys for a bulk load, then rebuild them
+
+        deferred_indexes = DeferredIndexes([Movie, Rating])
+        with transaction.atomic():
+            deferred_indexes.drop()
+            ...  # bulk load
+            deferred_indexes.build_indexes()
+            deferred_indexes.add_foreign_keys()
+            deferred_indexes.analyze()
+
+    NOTE: all of this must happen within a single transaction, so other
+          sessions never see the tables without their indexes.
+    """
+
+    # Schema of the tables whose indexes are built (None for the tables inspected)
+    schema: Optional[str] = None
+
+    def __init__(self, models: Sequence[Type[models.Model]], *, using: str = DEFAULT_DB_ALIAS):
+        self.tables = [model._meta.db_table for model in models]
+        self.using = using
+        self.definitions: list[TableDefinition] = []
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def quote_name(self, name: str) -> str:
+        return self.connection.ops.quote_name(name)
+
+    def target_table(self, definition: TableDefinition) -> str:
+        """The qualified name of the table whose indexes are built"""
+        if self.schema is None:
+            return definition.qualified_name
+        return f'{self.quote_name(self.schema)}.{self.quote_name(definition.name)}'
+
+    def retarget(self, statement: str, definition: TableDefinition) -> str:
+        """Rewrite a CREATE INDEX/TRIGGER statement on an inspected table to apply to the target"""
+        return statement.replace(f' ON {definition.qualified_name} ', f' ON {self.target_table(definition)} ', 1)
+
+    def inspect(self) -> None:
+        with self.connection.cursor() as cursor:
+            self.definitions = [self.inspect_table(cursor, table) for table in self.tables]
+
+    def inspect_table(self, cursor, table: str) -> TableDefinition:
+        """Introspect a table's definition, resolving its name by the current search_path
+
+        NOTE: foreign keys' definitions name the tables they reference unqualified
+              (as long as they're on the search_path), so when executed, they
+              reference whichever table of that name the search_path resolves to.
+        """
+        cursor.execute(
+            'SELECT c.oid, n.nspname, quote_ident(n.nspname) || %s || quote_ident(c.relname) '
+            'FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE c.oid = %s::regclass',
+            ('.', self.quote_name(table)),
+        )
+        oid, schema, qualified_name = cursor.fetchone()
+        definition = TableDefinition(name=table, schema=schema, qualified_name=qualified_name)
+
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) '
+            'FROM pg_constraint WHERE conrelid = %s AND contype IN (%s, %s, %s) ORDER BY conname',
+            (oid, 'p', 'u', 'f'),
+        )
+        for name, type_, constraint_def in cursor.fetchall():
+            if type_ == 'f':
+                definition.foreign_keys.append((name, constraint_def))
+            else:
+                definition.unique_constraints.append((name, constraint_def))
+
+        cursor.execute(
+            'SELECT ci.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i '
+            'JOIN pg_class ci ON ci.oid = i.indexrelid '
+            'WHERE i.indrelid = %s AND NOT EXISTS ('
+            '  SELECT FROM pg_constraint c WHERE c.conrelid = i.indrelid AND c.conindid = i.indexrelid'
+            ') ORDER BY i.indexrelid',
+            (oid,),
+        )
+        definition.indexes = cursor.fetchall()
+
+        cursor.execute(
+            'SELECT pg_get_triggerdef(oid) FROM pg_trigger '
+            'WHERE tgrelid = %s AND NOT tgisinternal ORDER BY tgname',
+            (oid,),
+        )
+        definition.triggers = [trigger_def for trigger_def, in cursor.fetchall()]
+
+        cursor.execute(
+            'SELECT s.oid::regclass::text, a.attname FROM pg_depend d '
+            'JOIN pg_class s ON s.oid = d.objid AND s.relkind = %s '
+            'JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid '
+            'WHERE d.refobjid = %s AND d.deptype = %s',
+            ('S', oid, 'a'),
+        )
+        definition.sequences = cursor.fetchall()
+
+        cursor.execute(
+            'SELECT DISTINCT conrelid::regclass::text FROM pg_constraint '
+            'WHERE confrelid = %s AND conrelid <> %s AND contype = %s',
+            (oid, oid, 'f'),
+        )
+        definition.referenced_by = [name for name, in cursor.fetchall()]
+
+        return definition
+
+    def drop(self) -> None:
+        """Drop the tables' secondary indexes and foreign keys, remembering their definitions"""
+        self.inspect()
+
+        with self.connection.cursor() as cursor:
+            for definition in self.definitions:
+                for name, _ in definition.foreign_keys:
+                    cursor.execute(f'ALTER TABLE {definition.qualified_name} '
+                                   f'DROP CONSTRAINT {self.quote_name(name)}')
+
+                for name, _ in definition.indexes:
+                    cursor.execute(f'DROP INDEX {self.quote_name(definition.schema)}.{self.quote_name(name)}')
+
+    def build_indexes(self) -> None:
+        """Build all the secondary indexes, with parallel maintenance workers"""
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT set_config(%s, %s, true), set_config(%s, %s, true)', (
+                'max_parallel_maintenance_workers', str(settings.MOVIES_LOAD_MAINTENANCE_WORKERS),
+                'maintenance_work_mem', settings.MOVIES_LOAD_MAINTENANCE_WORK_MEM,
+            ))
+
+            for definition in self.definitions:
+                for _, index_def in definition.indexes:
+                    cursor.execute(self.retarget(index_def, definition))
+
+    def add_foreign_keys(self) -> None:
+        """Add (and so, validate) all the foreign keys"""
+        with self.connection.cursor() as cursor:
+            for definition in self.definitions:
+                for name, constraint_def in definition.foreign_keys:
+                    cursor.execute(f'ALTER TABLE {self.target_table(definition)} '
+                                   f'ADD CONSTRAINT {self.quote_name(name)} {constraint_def}')
+
+    def analyze(self) -> None:
+        """Gather statistics on the freshly loaded tables, for the query planner"""
+        with self.connection.cursor() as cursor:
+            for definition in self.definitions:
+                cursor.execute(f'ANALYZE {self.target_table(definition)}')
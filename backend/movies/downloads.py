@@ -0,0 +1,87 @@
+"""Streamed, cached downloads of datasets
+
+Downloads are streamed to disk in large chunks, rather than buffered in
+memory. When a cache directory is used, each URL's download is kept there,
+alongside its ETag and Last-Modified headers, and revalidated with the
+server before reuse, so an unchanged dataset is never downloaded twice.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import requests
+
+__all__ = ['download']
+
+# Size of the chunks read from the response and written to disk
+CHUNK_SIZE = 1024 * 1024
+
+
+def stream_to_file(res: requests.Response, fp: BinaryIO) -> None:
+    # NOTE: reading the raw stream (rather than iter_content) lets shutil copy
+    #       with large buffers, while decode_content still undoes any gzip
+    #       transfer encoding.
+    res.raw.decode_content = True
+    shutil.copyfileobj(res.raw, fp, CHUNK_SIZE)
+
+
+def download(url: str,
+             *,
+             verify: bool = True,
+             cache_dir: Optional[Union[str, Path]] = None,
+             ) -> Union[Path, BinaryIO]:
+    """Download a URL to disk, returning the path of the cached file, or a temporary file
+
+    Without a cache_dir, the download is written to an anonymous temporary
+    file (deleted once closed), which is returned rewound to its start.
+    """
+    if cache_dir is None:
+        fp = tempfile.TemporaryFile()
+        with requests.get(url, verify=verify, stream=True) as res:
+            res.raise_for_status()
+            stream_to_file(res, fp)
+        fp.seek(0)
+        return fp
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    path = cache_dir / key
+    meta_path = cache_dir / f'{key}.json'
+
+    headers = {}
+    if path.exists() and meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if etag := meta.get('etag'):
+            headers['If-None-Match'] = etag
+        if last_modified := meta.get('last_modified'):
+            headers['If-Modified-Since'] = last_modified
+
+    with requests.get(url, verify=verify, stream=True, headers=headers) as res:
+        if res.status_code == 304:
+            return path
+
+        res.raise_for_status()
+
+        # NOTE: the download is written to a temporary file and moved into place,
+        #       so an interrupted download never masquerades as a complete one.
+        with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=f'.{key}.', delete=False) as fp:
+            try:
+                stream_to_file(res, fp)
+            except BaseException:
+                os.unlink(fp.name)
+                raise
+        os.replace(fp.name, path)
+
+        meta_path.write_text(json.dumps({
+            'url': url,
+            'etag': res.headers.get('ETag'),
+            'last_modified': res.headers.get('Last-Modified'),
+        }))
+
+    return path
@@ -0,0 +1,91 @@
+"""Gunicorn configuration for serving the movies API in production
+
+    gunicorn -c python:movies.gunicorn_conf
+
+Every setting may be overridden with environment variables. By default, the
+sync views are served over WSGI by threaded workers. Each of a worker's
+threads keeps its own persistent database connection, so connections are
+pooled by thread, and there are at most workers * threads of them. (Keep
+this below the database's max_connections.)
+
+With SERVER_INTERFACE=asgi, the async views are served over ASGI by uvicorn
+workers (see movies.asgi), whose connections are pooled by the database pool
+(see movies.db_pool), so there are at most workers * MOVIES_DB_POOL_SIZE.
+
+The app is loaded, and its caches warmed, once in the master process before
+workers are forked, so workers share them copy-on-write, rather than each
+loading their own.
+"""
+import multiprocessing
+import os
+
+from environ import Env
+
+env = Env()
+
+# Production defaults for Django settings (see movies.settings), unless configured otherwise
+DJANGO_SETTINGS_DEFAULTS = {
+    'DATABASE_CONN_MAX_AGE': '600',
+    'DATABASE_CONN_HEALTH_CHECKS': 'true',
+}
+raw_env = [f'{name}={os.environ.get(name, default)}' for name, default in DJANGO_SETTINGS_DEFAULTS.items()]
+
+# Either "wsgi" (sync views, threaded workers) or "asgi" (async views, uvicorn workers)
+server_interface = env.str('SERVER_INTERFACE', default='wsgi')
+if server_interface not in ('wsgi', 'asgi'):
+    raise ValueError(f'SERVER_INTERFACE must be "wsgi" or "asgi", not {server_interface!r}')
+
+bind = env.list('GUNICORN_BIND', default=[f'0.0.0.0:{env.int("PORT", default=80)}'])
+
+if server_interface == 'asgi':
+    wsgi_app = 'movies.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+
+    # Each worker serves any number of requests concurrently (limited, for database
+    # work, by the database pool), so more workers than CPUs gains nothing
+    workers = env.int('GUNICORN_WORKERS', default=multiprocessing.cpu_count())
+else:
+    wsgi_app = 'movies.wsgi:application'
+    worker_class = 'gthread'
+    threads = env.int('GUNICORN_THREADS', default=4)
+    workers = env.int('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1)
+
+preload_app = env.bool('GUNICORN_PRELOAD_APP', default=True)
+
+# NOTE: behind the proxy, which reuses its connections to the backend
+keepalive = env.int('GUNICORN_KEEPALIVE', default=5)
+timeout = env.int('GUNICORN_TIMEOUT', default=30)
+
+# Heartbeat files are kept in memory, not on (possibly slow, e.g. overlay) disk
+worker_tmp_dir = env.str('GUNICORN_WORKER_TMP_DIR', default='/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+# Where to log requests ("-" for stdout). Empty disables logging requests.
+accesslog = env.str('GUNICORN_ACCESSLOG', default='-') or None
+
+
+def when_ready(server):
+    """Warm up the app's caches in the master, before any workers are forked from it"""
+    if not server.cfg.preload_app:
+        return
+
+    import gc
+
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from movies.suggest import get_title_index
+
+    # Import every view (and everything they import), and compile the URL patterns
+    urlconf = 'movies.urls_async' if server_interface == 'asgi' else None
+    get_resolver(urlconf).resolve('/api/movies')
+
+    # Load the title suggestions index
+    get_title_index()
+
+    # Workers mustn't share the master's database connections, or they'd
+    # interleave their queries on the same socket
+    connections.close_all()
+
+    # Move everything loaded so far out of the garbage collector's purview, so
+    # collections in workers don't write to (and so copy) the shared pages
+    gc.freeze()
@@ -1,20 +1,35 @@
 import csv
+import hashlib
+import io
+import itertools
+import json
+import os
 import re
+import time
 from argparse import ArgumentParser
-from dataclasses import dataclass
-from datetime import datetime
-from io import BytesIO
-from typing import Any, Iterable, TextIO, TypeVar
-from zipfile import Path, ZipFile
-
-import pytz
-import requests
-from django.core.management.base import BaseCommand
-from django.db import connection, transaction
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from operator import itemgetter
+from pathlib import PurePosixPath
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence, TextIO, Type, TypeVar
+from zipfile import ZipFile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Max
 from tqdm import tqdm
 
-from movies.models import Genre, Movie, Tag, User
+from movies.bulk_copy import copy_rows, copy_update
+from movies.deferred_indexes import DeferredIndexes
+from movies.downloads import download
+from movies.models import DatasetFingerprint, DatasetVersion, Genre, Movie, Tag, User
 from movies.models.rating import Rating
+from movies.parallel_load import CHUNK_SIZE, STAGING_TABLE_PREFIX, ParallelCsvStager, StagedCsv
+from movies.shadow_tables import ShadowTables
+from movies.suggest import write_title_snapshot
 
 V = TypeVar('V')
 
@@ -31,30 +46,204 @@ def chunked(iterable: Iterable[V], chunk_size: int) -> Iterable[list[V]]:
         yield chunk
 
 
+# Number of rows read between updates of the progress bar
+PROGRESS_UPDATE_ROWS = 10_000
+
+
+def iter_with_progress(rows: Iterator[V], fp: TextIO, *,
+                       total_bytes: Optional[int] = None,
+                       unit: str = 'it',
+                       leave: bool = False,
+                       ) -> Iterator[V]:
+    """Yield rows read from a file, reporting progress by the file's byte position
+
+    Unlike counting rows up front, this doesn't require parsing the file twice.
+    """
+    # NOTE: the text stream itself can't report its position while being
+    #       iterated, but the underlying byte stream (e.g. zip member) can.
+    binary = fp.buffer
+    with tqdm(total=total_bytes, desc=f'{unit}s', unit='B', unit_scale=True, unit_divisor=1024,
+              leave=leave) as progress:
+        position = binary.tell()
+        while chunk := list(itertools.islice(rows, PROGRESS_UPDATE_ROWS)):
+            yield from chunk
+
+            new_position = binary.tell()
+            progress.update(new_position - position)
+            position = new_position
+
+
 def read_csv_dicts(fp: TextIO, *,
+                   total_bytes: Optional[int] = None,
                    show_progress: bool = True,
                    unit: str = 'it',
                    leave: bool = False,
-                   ) -> Iterable[dict[str, Any]]:
+                   ) -> Iterator[dict[str, Any]]:
+    rows = csv.DictReader(fp)
     if show_progress:
-        num_rows = sum(1 for _ in csv.reader(fp)) - 1  # account for header row
-        fp.seek(0)
-        return tqdm(csv.DictReader(fp), total=num_rows, unit=unit, leave=leave)
+        return iter_with_progress(rows, fp, total_bytes=total_bytes, unit=unit, leave=leave)
     else:
-        return csv.DictReader(fp)
+        return rows
+
+
+def read_csv_tuples(fp: TextIO, columns: Sequence[str], *,
+                    total_bytes: Optional[int] = None,
+                    show_progress: bool = True,
+                    unit: str = 'it',
+                    leave: bool = False,
+                    ) -> Iterator[tuple[str, ...]]:
+    """Read tuples of the values of the given columns from each row
+
+    This avoids allocating a dict for every row, as csv.DictReader does.
+
+    >>> list(read_csv_tuples(io.StringIO('a,b,c\\n1,2,3\\n'), ['c', 'a'], show_progress=False))
+    [('3', '1')]
+    """
+    reader = csv.reader(fp)
+    header = next(reader)
+    indices = [header.index(column) for column in columns]
+
+    if len(indices) == 1:
+        index, = indices
+        rows = ((row[index],) for row in reader)
+    else:
+        rows = map(itemgetter(*indices), reader)
+
+    if show_progress:
+        return iter_with_progress(rows, fp, total_bytes=total_bytes, unit=unit, leave=leave)
+    else:
+        return rows
+
+
+@contextmanager
+def disabled_triggers(model: Type[models.Model]) -> Iterator[None]:
+    """Disable all user-defined triggers on a model's table for the duration
+
+    NOTE: this takes an exclusive lock on the table until the end of the transaction
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {table} DISABLE TRIGGER USER;')
+
+    # NOTE: the triggers are only re-enabled if the body succeeds. Otherwise, the
+    #       transaction is aborted (so any further statements would fail, masking
+    #       the body's error), and rolling it back re-enables them anyway.
+    yield
+
+    with connection.cursor() as cursor:
+        # NOTE: Postgres refuses to alter a table with pending trigger events, so
+        #       we first flush any deferred (foreign key) constraint checks.
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE;')
+        cursor.execute(f'ALTER TABLE {table} ENABLE TRIGGER USER;')
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED;')
 
 
 def parse_timestamp(ts_str: str) -> datetime:
-    return datetime.utcfromtimestamp(int(ts_str)).replace(tzinfo=pytz.utc)
+    return datetime.fromtimestamp(int(ts_str), timezone.utc)
+
+
+# Matches a title from movies.csv, capturing the title and its year
+TITLE_RE = re.compile(r'^(.+) \((\d{4})\)$')
+
+
+def parse_movie(raw_movie: dict[str, str]) -> Movie:
+    """Create an (unsaved) movie from a row of movies.csv, with its genre names in _raw_genres"""
+    raw_title = raw_movie['title'].strip()
+    if match := TITLE_RE.match(raw_title):
+        title, year = match.group(1), int(match.group(2))
+    else:
+        title, year = raw_title, None
+
+    movie = Movie(id=int(raw_movie['movieId']), title=title, year=year)
+    movie._raw_genres = set(raw_movie['genres'].split('|'))
+    return movie
+
+
+# Columns of links.csv, in the order merge_links expects them
+LINK_COLUMNS = ('movieId', 'imdbId', 'tmdbId')
+
+
+def merge_links(movies: Iterable[Movie], links: Iterable[tuple[str, str, str]]) -> Iterator[Movie]:
+    """Set movies' IMDb and TMDB IDs from rows of links.csv, joined by movie ID
+
+    MovieLens orders links by movie ID, so links are read just as their movies
+    come along. A movie's link is only looked for until a link of a later movie
+    is read, which is held until its own movie comes along (as are any links
+    read ahead of movies out of order). Blank IDs, and those of movies without
+    links, are set to None.
+
+    >>> movies = merge_links(
+    ...     [Movie(id=1), Movie(id=2), Movie(id=5), Movie(id=3)],
+    ...     [('1', '0114709', '862'), ('3', '0113228', ''), ('4', '0114885', '31357')],
+    ... )
+    >>> [(movie.id, movie.imdb_id, movie.tmdb_id) for movie in movies]
+    [(1, '0114709', '862'), (2, None, None), (5, None, None), (3, '0113228', None)]
+    """
+    links = iter(links)
+    pending: dict[int, tuple[str, str]] = {}
+    last_link_movie_id = None
+
+    for movie in movies:
+        # NOTE: links are ordered by movie ID, so once a later movie's link has
+        #       been read, this movie's link can't follow.
+        while movie.id not in pending and (last_link_movie_id is None or last_link_movie_id < movie.id):
+            if (link := next(links, None)) is None:
+                break
+
+            movie_id, imdb_id, tmdb_id = link
+            last_link_movie_id = int(movie_id)
+            pending[last_link_movie_id] = (imdb_id, tmdb_id)
+
+        imdb_id, tmdb_id = pending.pop(movie.id, (None, None))
+        movie.imdb_id = imdb_id or None
+        movie.tmdb_id = tmdb_id or None
+        yield movie
+
+
+class FullLoadRequired(Exception):
+    """Raised when a dataset's changes can't be applied to what was loaded before"""
 
 
 @dataclass
 class MovieLensDataSet:
+    # URL or (absolute) path the dataset was loaded from
+    source: str = None
+
     links: TextIO = None
     movies: TextIO = None
     ratings: TextIO = None
     tags: TextIO = None
 
+    # Uncompressed size of each CSV, by name
+    sizes: dict[str, int] = field(default_factory=dict)
+    # CRC-32 and uncompressed size of each CSV, by name, as recorded in the zip
+    hashes: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def archive_hash(self) -> str:
+        """A hash of all the CSVs' hashes, which changes whenever any CSV does"""
+        return hashlib.sha256(json.dumps(self.hashes, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def read_dicts(self, name: str, **kwargs) -> Iterator[dict[str, Any]]:
+        return read_csv_dicts(getattr(self, name), total_bytes=self.sizes.get(name), **kwargs)
+
+    def read_tuples(self, name: str, columns: Sequence[str], **kwargs) -> Iterator[tuple[str, ...]]:
+        return read_csv_tuples(getattr(self, name), columns, total_bytes=self.sizes.get(name), **kwargs)
+
+
+# Models loaded from the dataset, by the names their row counts are recorded under
+DATASET_TABLES: dict[str, Type[models.Model]] = {
+    'genres': Genre,
+    'movies': Movie,
+    'users': User,
+    'ratings': Rating,
+    'tags': Tag,
+}
+
+
+# Models whose tables are replaced when loading the whole dataset
+LOADED_MODELS: list[Type[models.Model]] = [Genre, Movie, Movie.genres.through, Rating, Tag, User]
+
 
 class Command(BaseCommand):
     help = 'Load in the MovieLens data set from file or the web'
@@ -68,45 +257,239 @@ class Command(BaseCommand):
             '--no-verify', action='store_false', dest='verify', default=True,
             help='Skip SSL verification when downloading dataset from internet',
         )
+        parser.add_argument(
+            '--no-cache', action='store_false', dest='use_cache', default=True,
+            help='Download the dataset anew, rather than reusing a previous download '
+                 '(after checking it is unchanged)',
+        )
+        parser.add_argument(
+            '--full', action='store_true', default=False,
+            help='Load the whole dataset, even if it was loaded before. By default, only '
+                 'the changes since the last load from the same source are applied (and '
+                 'nothing, if unchanged), unless they can\'t be (e.g. ratings were removed).',
+        )
         parser.add_argument(
             '--no-truncate', action='store_false', dest='truncate', default=True,
-            help='Do not clear all rows from each table before loading dataset',
+            help='Do not clear all rows from each table before loading the whole dataset',
+        )
+        parser.add_argument(
+            '--engine', choices=('copy', 'orm'), default=None,
+            help='How to insert rows: streamed through COPY (Postgres only), or with '
+                 'bulk_create. Defaults to COPY on Postgres, and bulk_create otherwise.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of processes staging ratings and tags in parallel, each on its own '
+                 'connection, while movies are loaded (COPY engine only). Defaults to 1, '
+                 'which loads everything in this process.',
+        )
+        parser.add_argument(
+            '--swap', action='store_true', default=False,
+            help='When loading the whole dataset (with --full, on the first load, or when its '
+                 'changes can\'t be applied), load into shadow tables, which replace the '
+                 'current tables once fully loaded and indexed, so the current dataset is '
+                 'served until then (Postgres only). Changes are applied in place regardless. '
+                 'Incompatible with --no-truncate.',
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true', default=False,
+            help='When loading the whole dataset (see --swap), drop secondary indexes and '
+                 'foreign keys beforehand, then rebuild them (with parallel workers) and '
+                 'revalidate them once all rows are loaded (Postgres only). Always done with '
+                 '--swap.',
         )
 
     @transaction.atomic
-    def handle(self, source: str, verify: bool, truncate: bool, **options):
+    def handle(self, source: str, verify: bool, truncate: bool,
+               use_cache: bool = True, engine: str = None, workers: int = 1, swap: bool = False,
+               full: bool = False, defer_indexes: bool = False, **options):
+        is_postgres = connection.vendor == 'postgresql'
+        if engine is None:
+            engine = 'copy' if is_postgres else 'orm'
+        elif engine == 'copy' and not is_postgres:
+            raise CommandError('The COPY engine is only supported on Postgres')
+        self.engine = engine
+
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+        elif workers > 1 and engine != 'copy':
+            raise CommandError('Parallel loading is only supported by the COPY engine')
+        self.workers = workers
+
+        if swap and not is_postgres:
+            raise CommandError('Swapping in the loaded tables is only supported on Postgres')
+        elif swap and not truncate:
+            raise CommandError('--swap replaces all rows, so it cannot be combined with --no-truncate')
+
+        if defer_indexes and not is_postgres:
+            raise CommandError('Deferring index builds is only supported on Postgres')
+
         if source.startswith('http://') or source.startswith('https://'):
-            res = requests.get(source, verify=verify, stream=True)
-            zip_source = BytesIO()
-            for chunk in res.iter_content(1024):
-                zip_source.write(chunk)
+            cache_dir = settings.MOVIES_DATASET_CACHE_DIR if use_cache else None
+            zip_source = download(source, verify=verify, cache_dir=cache_dir or None)
         else:
-            zip_source = source
+            source = zip_source = os.path.abspath(source)
 
         zipf = ZipFile(zip_source, mode='r')
-        dataset = self.extract_csvs(zipf)
+        dataset = self.extract_csvs(zipf, source)
+
+        previous = None if full else DatasetFingerprint.objects.get_latest()
+        if previous and previous.source != source:
+            self.stdout.write(f'Dataset was last loaded from {previous.source or "an unknown source"}; '
+                              f'loading the whole dataset')
+            previous = None
+
+        if previous and previous.archive_hash == dataset.archive_hash:
+            self.stdout.write('Dataset unchanged since last load; nothing to do',
+                              style_func=self.style.SUCCESS)
+            return
+
+        fingerprint = None
+        if previous:
+            try:
+                # NOTE: if the changes turn out not to be applicable partway
+                #       through, this savepoint discards any already applied.
+                with transaction.atomic():
+                    fingerprint = self.apply_changes(dataset, previous)
+            except FullLoadRequired as e:
+                if not truncate:
+                    raise CommandError(f'{e}, so the whole dataset must be loaded, '
+                                       f'which --no-truncate prevents')
+
+                self.stdout.write(f'{e}; loading the whole dataset', style_func=self.style.WARNING)
+
+                # The CSVs were (partly) read, so they're opened anew
+                dataset = self.extract_csvs(zipf, source)
+
+            else:
+                ignored_options = [option for option, is_set in (('--swap', swap),
+                                                                 ('--defer-indexes', defer_indexes))
+                                   if is_set]
+                if ignored_options:
+                    self.stdout.write(f'Applied changes in place, without {" or ".join(ignored_options)} '
+                                      f'(only used when loading the whole dataset, e.g. with --full)',
+                                      style_func=self.style.WARNING)
+
+        if fingerprint is None:
+            fingerprint = self.load_whole(dataset, swap=swap, truncate=truncate,
+                                          defer_indexes=defer_indexes)
+
+        fingerprint.save()
+
+        # NOTE: the triggers bumping the version were disabled on ratings (and movie genres), too
+        DatasetVersion.objects.bump()
+
+        # Have all processes reload their suggestions, once the new dataset is visible
+        transaction.on_commit(write_title_snapshot)
+
+    def load_whole(self, dataset: MovieLensDataSet, *,
+                   swap: bool, truncate: bool, defer_indexes: bool) -> DatasetFingerprint:
+        """Load the whole dataset, returning its fingerprint"""
+        if swap:
+            # NOTE: truncating would lock out readers until we commit, so instead, we
+            #       load out of their sight, and only lock them out for the swap.
+            shadow_tables = ShadowTables(LOADED_MODELS)
+            with shadow_tables.loading():
+                self.load(dataset, shadow_tables)
+                fingerprint = self.measure(dataset)
+
+            with self.phase('Swapped in shadow tables'):
+                shadow_tables.swap()
 
-        # We only truncate after the dataset has been successfully opened
-        if truncate:
-            with connection.cursor() as cursor:
-                for model in Genre, Movie, Rating, Tag, User:
-                    cursor.execute(f'TRUNCATE TABLE {model._meta.db_table} RESTART IDENTITY CASCADE;')
-
-        self.import_dataset(dataset)
+        else:
+            # We only truncate after the dataset has been successfully opened
+            if truncate:
+                with self.phase('Truncated tables'), connection.cursor() as cursor:
+                    for model in Genre, Movie, Rating, Tag, User:
+                        cursor.execute(f'TRUNCATE TABLE {model._meta.db_table} RESTART IDENTITY CASCADE;')
+
+            deferred_indexes = None
+            if defer_indexes:
+                deferred_indexes = DeferredIndexes(LOADED_MODELS)
+                with self.phase('Dropped indexes and foreign keys'):
+                    deferred_indexes.drop()
+
+            self.load(dataset, deferred_indexes)
+            fingerprint = self.measure(dataset)
+
+        return fingerprint
+
+    def load(self, dataset: MovieLensDataSet, deferred_indexes: Optional[DeferredIndexes] = None):
+        # Rather than have the ratings (and movie genres) triggers update movies'
+        # rating stats (and genre masks) for every chunk inserted, we recalculate
+        # them all in one go.
+        with disabled_triggers(Rating), disabled_triggers(Movie.genres.through):
+            self.import_dataset(dataset)
+
+        # NOTE: the rating stats are recalculated with the help of the indexes
+        if deferred_indexes:
+            with self.phase('Built indexes'):
+                deferred_indexes.build_indexes()
+            with self.phase('Validated foreign keys'):
+                deferred_indexes.add_foreign_keys()
+
+        with self.phase('Refreshed rating stats'):
+            Movie.objects.refresh_rating_stats()
+        with self.phase('Refreshed genre masks'):
+            Movie.objects.refresh_genre_masks()
+
+        # NOTE: refreshing rewrites every movie, leaving the table several times
+        #       its analyzed size, so statistics are only gathered afterwards.
+        if deferred_indexes:
+            with self.phase('Analyzed tables'):
+                deferred_indexes.analyze()
+
+    @contextmanager
+    def phase(self, description: str) -> Iterator[None]:
+        """Report how long the enclosed phase of loading took"""
+        start = time.perf_counter()
+        yield
+        self.stdout.write(f'{description} in {time.perf_counter() - start:.2f}s')
+
+    def measure(self, dataset: MovieLensDataSet) -> DatasetFingerprint:
+        """Fingerprint the dataset, as loaded into the tables"""
+        return DatasetFingerprint(
+            source=dataset.source,
+            archive_hash=dataset.archive_hash,
+            csv_hashes=dataset.hashes,
+            row_counts={
+                name: model.objects.count()
+                for name, model in DATASET_TABLES.items()
+            },
+            ratings_watermark=Rating.objects.aggregate(watermark=Max('timestamp'))['watermark'],
+            tags_watermark=Tag.objects.aggregate(watermark=Max('timestamp'))['watermark'],
+        )
 
-    def extract_csvs(self, zipf: ZipFile) -> MovieLensDataSet:
-        dataset = MovieLensDataSet()
-        valid_stems = set(dataset.__annotations__)
+    def extract_csvs(self, zipf: ZipFile, source: str) -> MovieLensDataSet:
+        dataset = MovieLensDataSet(source=source)
+        valid_stems = {f.name for f in fields(dataset) if f.type is TextIO}
 
         for info in zipf.filelist:
-            path = Path(zipf, at=info.filename)
+            name = PurePosixPath(info.filename).name
 
-            if path.name.endswith('.csv') and (stem := path.name[:-len('.csv')]) in valid_stems:
-                setattr(dataset, stem, path.open('r', encoding='utf-8'))
+            if name.endswith('.csv') and (stem := name[:-len('.csv')]) in valid_stems:
+                # NOTE: the csv module handles newlines itself, so they mustn't be translated
+                setattr(dataset, stem, io.TextIOWrapper(zipf.open(info), encoding='utf-8', newline=''))
+                dataset.sizes[stem] = info.file_size
+
+                # NOTE: the zip already records each member's checksum, so the CSVs
+                #       needn't be read to tell whether they've changed.
+                dataset.hashes[stem] = f'{info.CRC:08x}:{info.file_size}'
 
         return dataset
 
     def import_dataset(self, dataset: MovieLensDataSet):
+        with ExitStack() as stack:
+            staged = None
+            if self.workers > 1:
+                # NOTE: ratings and tags are staged in the background, while movies are loaded
+                stager = stack.enter_context(
+                    ParallelCsvStager(connection.get_connection_params(), workers=self.workers))
+                staged = self.stage_ratings_and_tags(stager, dataset)
+
+            self._import_dataset(dataset, staged)
+
+    def _import_dataset(self, dataset: MovieLensDataSet, staged: Optional[tuple[StagedCsv, StagedCsv]]):
         genres: dict[str, Genre] = {
             genre.name: genre
             for genre in Genre.objects.all()
@@ -118,53 +501,66 @@ class Command(BaseCommand):
         ratings_added = 0
         tags_added = 0
 
-        for raw_movies in chunked(read_csv_dicts(dataset.movies, unit='movie'), 500):
-            movies = []
-            genres_encountered = set()
-            for raw_movie in raw_movies:
-                raw_title = raw_movie['title'].strip()
-                if match := re.match(r'^(.+) \((\d{4})\)$', raw_title):
-                    title, year = match.groups()
-                else:
-                    title, year = raw_title, None
+        # NOTE: rather than updating each movie's links after inserting it, the
+        #       links are joined to the movies, and inserted along with them.
+        linked_movies = merge_links(
+            map(parse_movie, dataset.read_dicts('movies', unit='movie')),
+            dataset.read_tuples('links', LINK_COLUMNS, show_progress=False),
+        )
 
-                movie_id = int(raw_movie['movieId'])
-                movie_genres = set(raw_movie['genres'].split('|'))
-                genres_encountered |= movie_genres
+        with self.phase('Loaded movies and links'):
+            for movies in chunked(linked_movies, 500):
+                genres_encountered = set().union(*(movie._raw_genres for movie in movies))
 
-                movie = Movie(id=movie_id, title=title, year=year)
-                movie._raw_genres = movie_genres
+                movies_added += len(Movie.objects.bulk_create(movies, ignore_conflicts=True))
 
-                movies.append(movie)
+                if missing_genre_names := genres_encountered - set(genres):
+                    missing_genres: list[Genre] = []
 
-            movies_added += len(Movie.objects.bulk_create(movies, ignore_conflicts=True))
+                    # NOTE: genres are numbered (see Genre.bit) in the order inserted
+                    for genre_name in sorted(missing_genre_names):
+                        genre = Genre(name=genre_name)
+                        genres[genre_name] = genre
+                        missing_genres.append(genre)
 
-            if missing_genre_names := genres_encountered - set(genres):
-                missing_genres: list[Genre] = []
+                    genres_added += len(Genre.objects.bulk_create(missing_genres))
 
-                for genre_name in missing_genre_names:
-                    genre = Genre(name=genre_name)
-                    genres[genre_name] = genre
-                    missing_genres.append(genre)
+                if self.engine == 'copy':
+                    copy_rows(Movie.genres.through, ('movie', 'genre'), (
+                        (movie.id, genres[genre_name].id)
+                        for movie in movies
+                        for genre_name in movie._raw_genres
+                    ))
+                else:
+                    movie_genres = [
+                        Movie.genres.through(movie=movie, genre=genres[genre_name])
+                        for movie in movies
+                        for genre_name in movie._raw_genres
+                    ]
+                    Movie.genres.through.objects.bulk_create(movie_genres)
+
+        with self.phase('Loaded ratings and tags'):
+            if staged:
+                users_added, ratings_added, tags_added = self.insert_staged_ratings_and_tags(*staged)
+            elif self.engine == 'copy':
+                users_added, ratings_added, tags_added = self.copy_ratings_and_tags(dataset)
+            else:
+                users_added, ratings_added, tags_added = self.create_ratings_and_tags(dataset)
 
-                genres_added += len(Genre.objects.bulk_create(missing_genres))
+        self.stdout.write(f'Successfully added {movies_added} movies, {genres_added} genres, '
+                          f'{users_added} users, {ratings_added} ratings, and {tags_added} tags',
+                          style_func=self.style.SUCCESS)
 
-            movie_genres = [
-                Movie.genres.through(movie=movie, genre=genres[genre_name])
-                for movie in movies
-                for genre_name in movie._raw_genres
-            ]
-            Movie.genres.through.objects.bulk_create(movie_genres)
+    def create_ratings_and_tags(self, dataset: MovieLensDataSet) -> tuple[int, int, int]:
+        """Insert ratings, tags, and their users as model instances, in chunks
 
-        for raw_links in chunked(read_csv_dicts(dataset.links, unit='link'), 1000):
-            movie_links = [
-                Movie(id=raw_link['movieId'],
-                      imdb_id=raw_link['imdbId'], tmdb_id=raw_link['tmdbId'])
-                for raw_link in raw_links
-            ]
-            Movie.objects.bulk_update(movie_links, ['imdb_id', 'tmdb_id'])
+        Returns the number of users, ratings, and tags added.
+        """
+        users_added = 0
+        ratings_added = 0
+        tags_added = 0
 
-        for raw_ratings in chunked(read_csv_dicts(dataset.ratings, unit='rating'), 1000):
+        for raw_ratings in chunked(dataset.read_dicts('ratings', unit='rating'), 1000):
             user_ids = set()
             ratings = []
             for raw_rating in raw_ratings:
@@ -181,7 +577,7 @@ class Command(BaseCommand):
 
             ratings_added += len(Rating.objects.bulk_create(ratings))
 
-        for raw_tags in chunked(read_csv_dicts(dataset.tags, unit='tag'), 1000):
+        for raw_tags in chunked(dataset.read_dicts('tags', unit='tag'), 1000):
             user_ids = set()
             tags = []
             for raw_tag in raw_tags:
@@ -198,6 +594,351 @@ class Command(BaseCommand):
 
             tags_added += len(Tag.objects.bulk_create(tags))
 
-        self.stdout.write(f'Successfully added {movies_added} movies, {genres_added} genres, '
-                          f'{users_added} users, {ratings_added} ratings, and {tags_added} tags',
-                          style_func=self.style.SUCCESS)
+        return users_added, ratings_added, tags_added
+
+    def copy_ratings_and_tags(self, dataset: MovieLensDataSet) -> tuple[int, int, int]:
+        """Stream ratings and tags straight from the CSVs with COPY, then insert them and their users
+
+        The CSVs are staged verbatim, so no row is parsed in Python: values are
+        cast, and timestamps converted from epochs, by the database.
+
+        Returns the number of users, ratings, and tags added.
+        """
+        staged_ratings = self.stage_csv(dataset, 'ratings', unit='rating')
+        staged_tags = self.stage_csv(dataset, 'tags', unit='tag')
+        return self.insert_staged_ratings_and_tags(staged_ratings, staged_tags)
+
+    def stage_csv(self, dataset: MovieLensDataSet, name: str, *, unit: str = 'it') -> StagedCsv:
+        """COPY a CSV verbatim into a temporary staging table, on this process's connection
+
+        As with ParallelCsvStager, all the staging table's columns are text, and
+        the CSV's header row names them.
+        """
+        binary = getattr(dataset, name).buffer
+        header = binary.readline()
+        columns = header.decode('utf-8-sig').strip().split(',')
+
+        quote_name = connection.ops.quote_name
+        table = f'{STAGING_TABLE_PREFIX}{name}'
+        column_names = ', '.join(map(quote_name, columns))
+
+        with connection.cursor() as cursor, \
+                tqdm.wrapattr(binary, 'read', total=dataset.sizes.get(name), initial=len(header),
+                              desc=f'{unit}s', unit='B', unit_scale=True, unit_divisor=1024,
+                              leave=False) as fp:
+            cursor.execute(f'CREATE TEMPORARY TABLE {quote_name(table)} '
+                           f'({", ".join(f"{column} text" for column in map(quote_name, columns))}) '
+                           f'ON COMMIT DROP')
+
+            # NOTE: in CSV format, COPY reads unquoted empty values as NULL, but
+            #       MovieLens uses them for empty strings (e.g. tag names).
+            cursor.copy_expert(f'COPY {quote_name(table)} ({column_names}) FROM STDIN '
+                               f'WITH (FORMAT csv, FORCE_NOT_NULL ({column_names}))',
+                               fp, size=CHUNK_SIZE)
+            staged = Future()
+            staged.set_result(cursor.rowcount)
+
+        return StagedCsv(name=name, columns=columns, tables=[table], futures=[staged])
+
+    def stage_ratings_and_tags(self, stager: ParallelCsvStager,
+                               dataset: MovieLensDataSet) -> tuple[StagedCsv, StagedCsv]:
+        """Begin staging ratings and tags, sharding ratings across all workers
+
+        NOTE: tags may contain quoted line breaks, which can't be sharded by line,
+              so they're staged by a single worker.
+        """
+        staged_ratings = stager.stage('ratings', dataset.ratings.buffer)
+        staged_tags = stager.stage('tags', dataset.tags.buffer, shards=1)
+        return staged_ratings, staged_tags
+
+    def insert_staged_ratings_and_tags(self, staged_ratings: StagedCsv,
+                                       staged_tags: StagedCsv) -> tuple[int, int, int]:
+        """Move the staged ratings and tags into their tables, adding their users
+
+        Returns the number of users, ratings, and tags added.
+        """
+        ratings_added = self.insert_staged(Rating, staged_ratings, {
+            'user': 'userId',
+            'movie': 'movieId',
+            'rating': 'rating',
+            'timestamp': 'timestamp',
+        })
+        tags_added = self.insert_staged(Tag, staged_tags, {
+            'user': 'userId',
+            'movie': 'movieId',
+            'name': 'tag',
+            'timestamp': 'timestamp',
+        })
+
+        quote_name = connection.ops.quote_name
+        staged_user_ids = ' UNION '.join(
+            f'SELECT {quote_name("userId")}::integer FROM {quote_name(table)}'
+            for table in staged_ratings.tables + staged_tags.tables
+        )
+        with connection.cursor() as cursor:
+            users_added = 0
+            if staged_user_ids:
+                cursor.execute(f'INSERT INTO {quote_name(User._meta.db_table)} (id) {staged_user_ids} '
+                               f'ON CONFLICT DO NOTHING')
+                users_added = cursor.rowcount
+
+            for table in staged_ratings.tables + staged_tags.tables:
+                cursor.execute(f'DROP TABLE {quote_name(table)}')
+
+        return users_added, ratings_added, tags_added
+
+    def insert_staged(self, model: Type[models.Model], staged: StagedCsv,
+                      columns: Mapping[str, str]) -> int:
+        """Insert all rows of a staged CSV into a model's table, returning the number inserted
+
+        columns maps each model field to the CSV column holding its values.
+        Values are cast to their fields' types, and integer timestamps are
+        converted to datetimes.
+        """
+        num_rows = staged.wait()
+        if not num_rows:
+            return 0
+
+        quote_name = connection.ops.quote_name
+
+        model_fields = [model._meta.get_field(name) for name in columns]
+        expressions = []
+        for model_field, column in zip(model_fields, columns.values()):
+            value = quote_name(column)
+            if isinstance(model_field, models.DateTimeField):
+                expressions.append(f'to_timestamp({value}::bigint)')
+            elif isinstance(model_field, (models.CharField, models.TextField)):
+                expressions.append(value)
+            else:
+                expressions.append(f'{value}::{model_field.db_type(connection)}')
+
+        select = ' UNION ALL '.join(
+            f'SELECT {", ".join(expressions)} FROM {quote_name(table)}'
+            for table in staged.tables
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {quote_name(model._meta.db_table)} '
+                           f'({", ".join(quote_name(f.column) for f in model_fields)}) {select}')
+            return cursor.rowcount
+
+    def apply_changes(self, dataset: MovieLensDataSet, previous: DatasetFingerprint) -> DatasetFingerprint:
+        """Apply only what changed in the dataset since it was last loaded
+
+        Only changed CSVs are read. New and changed movies (and their links) are
+        upserted, and ratings and tags are appended, from the timestamp of the
+        latest loaded (the "watermark") onward.
+
+        Raises FullLoadRequired if movies were removed, or ratings or tags were
+        changed other than by appending them (e.g. re-rated, or removed).
+        """
+        changed = {name for name, csv_hash in dataset.hashes.items()
+                   if previous.csv_hashes.get(name) != csv_hash}
+
+        row_counts = dict(previous.row_counts)
+        movies_updated = 0
+        links_updated = 0
+        ratings_watermark = previous.ratings_watermark
+        tags_watermark = previous.tags_watermark
+        user_ids = set()
+
+        if 'movies' in changed:
+            movies_added, movies_updated, genres_added = self.upsert_movies(dataset)
+            row_counts['movies'] += movies_added
+            row_counts['genres'] += genres_added
+
+        if 'links' in changed:
+            links_updated = self.update_links(dataset)
+
+        if 'ratings' in changed:
+            ratings_added, ratings_watermark = self.append_rows(
+                dataset, 'ratings', Rating, 'rating', previous.ratings_watermark,
+                previous.row_counts['ratings'], user_ids)
+            row_counts['ratings'] += ratings_added
+
+        if 'tags' in changed:
+            tags_added, tags_watermark = self.append_rows(
+                dataset, 'tags', Tag, 'name', previous.tags_watermark,
+                previous.row_counts['tags'], user_ids)
+            row_counts['tags'] += tags_added
+
+        new_user_ids = user_ids - set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        User.objects.bulk_create([User(id=user_id) for user_id in new_user_ids], batch_size=1000)
+        row_counts['users'] += len(new_user_ids)
+
+        self.stdout.write(
+            f'Successfully applied changes to {", ".join(sorted(changed))}: '
+            f'{row_counts["movies"] - previous.row_counts["movies"]} movies added '
+            f'({movies_updated} updated, {links_updated} relinked), '
+            f'{row_counts["genres"] - previous.row_counts["genres"]} genres, '
+            f'{len(new_user_ids)} users, '
+            f'{row_counts["ratings"] - previous.row_counts["ratings"]} ratings, and '
+            f'{row_counts["tags"] - previous.row_counts["tags"]} tags',
+            style_func=self.style.SUCCESS,
+        )
+
+        return DatasetFingerprint(
+            source=dataset.source,
+            archive_hash=dataset.archive_hash,
+            csv_hashes=dataset.hashes,
+            row_counts=row_counts,
+            ratings_watermark=ratings_watermark,
+            tags_watermark=tags_watermark,
+        )
+
+    def upsert_movies(self, dataset: MovieLensDataSet) -> tuple[int, int, int]:
+        """Create new movies, and update changed titles, years, and genres
+
+        Returns the number of movies added and updated, and genres added. Raises
+        FullLoadRequired if any movies loaded before are missing.
+        """
+        genres: dict[str, Genre] = {genre.name: genre for genre in Genre.objects.all()}
+        existing = {
+            movie_id: (title, year, set(genre_names))
+            for movie_id, title, year, genre_names in (
+                Movie.objects.annotate_genre_names().values_list('id', 'title', 'year', 'genre_names')
+            )
+        }
+
+        new_movies = []
+        changed_movies = []
+        num_existing_read = 0
+        for raw_movie in dataset.read_dicts('movies', unit='movie'):
+            movie = parse_movie(raw_movie)
+            if movie.id not in existing:
+                new_movies.append(movie)
+                continue
+
+            num_existing_read += 1
+            if existing[movie.id] != (movie.title, movie.year, movie._raw_genres):
+                changed_movies.append(movie)
+
+        if num_existing_read < len(existing):
+            raise FullLoadRequired('Movies were removed from movies.csv')
+
+        missing_genres = [
+            Genre(name=genre_name)
+            for genre_name in sorted(set().union(*(movie._raw_genres for movie in new_movies + changed_movies)))
+            if genre_name not in genres
+        ]
+        for genre in Genre.objects.bulk_create(missing_genres):
+            genres[genre.name] = genre
+
+        Movie.objects.bulk_create(new_movies, batch_size=1000)
+
+        if self.engine == 'copy':
+            copy_update(Movie, ('title', 'year'), (
+                (movie.id, movie.title, movie.year)
+                for movie in changed_movies
+            ))
+        else:
+            # NOTE: the ORM engine is for databases without COPY, so it keeps to
+            #       bulk_update. Only changed movies are updated, which between
+            #       releases of a dataset are few.
+            Movie.objects.bulk_update(changed_movies, ['title', 'year'], batch_size=1000)
+
+        Movie.genres.through.objects.filter(movie__in=[movie.id for movie in changed_movies]).delete()
+        Movie.genres.through.objects.bulk_create([
+            Movie.genres.through(movie_id=movie.id, genre=genres[genre_name])
+            for movie in new_movies + changed_movies
+            for genre_name in movie._raw_genres
+        ], batch_size=1000)
+
+        return len(new_movies), len(changed_movies), len(missing_genres)
+
+    def update_links(self, dataset: MovieLensDataSet) -> int:
+        """Update movies' IMDb and TMDB IDs where changed, returning the number of movies updated"""
+        links = dataset.read_tuples('links', LINK_COLUMNS, unit='link')
+
+        if self.engine == 'copy':
+            return copy_update(Movie, ('imdb_id', 'tmdb_id'), (
+                (movie_id, imdb_id or None, tmdb_id or None)
+                for movie_id, imdb_id, tmdb_id in links
+            ))
+
+        existing = {
+            movie_id: (imdb_id, tmdb_id)
+            for movie_id, imdb_id, tmdb_id in Movie.objects.values_list('id', 'imdb_id', 'tmdb_id')
+        }
+
+        movie_links = [
+            Movie(id=movie_id, imdb_id=imdb_id or None, tmdb_id=tmdb_id or None)
+            for raw_movie_id, imdb_id, tmdb_id in links
+            if (movie_id := int(raw_movie_id)) in existing
+            if existing[movie_id] != (imdb_id or None, tmdb_id or None)
+        ]
+
+        # NOTE: as in upsert_movies, the ORM engine keeps to bulk_update, of only
+        #       the movies whose links changed.
+        Movie.objects.bulk_update(movie_links, ['imdb_id', 'tmdb_id'], batch_size=1000)
+        return len(movie_links)
+
+    def append_rows(self,
+                    dataset: MovieLensDataSet,
+                    name: str,
+                    model: Type[models.Model],
+                    value_field: str,
+                    watermark: Optional[datetime],
+                    num_loaded: int,
+                    user_ids: set[int],
+                    ) -> tuple[int, Optional[datetime]]:
+        """Insert the ratings or tags timestamped from the watermark onward
+
+        Rows timestamped exactly at the watermark are skipped if a row by the
+        same user for the same movie was loaded then. The IDs of all users of
+        the rows inserted are added to user_ids.
+
+        Timestamps alone can't tell whether rows were only appended: rows may
+        also have been removed, replaced (e.g. re-rated, with a new timestamp),
+        or inserted before the watermark. So, the rows skipped (as loaded
+        before) must number exactly num_loaded, or FullLoadRequired is raised.
+
+        Returns the number of rows inserted, and the new watermark.
+        """
+        value_column = {'ratings': 'rating', 'tags': 'tag'}[name]
+        columns = ('userId', 'movieId', value_column, 'timestamp')
+
+        watermark_ts = int(watermark.timestamp()) if watermark else None
+        loaded_at_watermark = set(
+            model.objects.filter(timestamp=watermark).values_list('user_id', 'movie_id')
+        ) if watermark else set()
+        latest_ts = watermark_ts
+        num_skipped = 0
+
+        def iter_new_rows():
+            nonlocal latest_ts, num_skipped
+            for user_id, movie_id, value, timestamp in dataset.read_tuples(name, columns, unit=name[:-1]):
+                ts = int(timestamp)
+                if watermark_ts is not None:
+                    if ts < watermark_ts:
+                        num_skipped += 1
+                        continue
+                    elif ts == watermark_ts and (int(user_id), int(movie_id)) in loaded_at_watermark:
+                        num_skipped += 1
+                        continue
+
+                user_ids.add(int(user_id))
+                if latest_ts is None or ts > latest_ts:
+                    latest_ts = ts
+
+                yield user_id, movie_id, value, timestamp
+
+        fields = ('user', 'movie', value_field, 'timestamp')
+        if self.engine == 'copy':
+            num_added = copy_rows(model, fields, (
+                (user_id, movie_id, value, parse_timestamp(timestamp).isoformat())
+                for user_id, movie_id, value, timestamp in iter_new_rows()
+            ))
+        else:
+            num_added = 0
+            for rows in chunked(iter_new_rows(), 1000):
+                num_added += len(model.objects.bulk_create([
+                    model(user_id=user_id, movie_id=movie_id, timestamp=parse_timestamp(timestamp),
+                          **{value_field: value})
+                    for user_id, movie_id, value, timestamp in rows
+                ]))
+
+        if num_skipped != num_loaded:
+            raise FullLoadRequired(f'{name}.csv was changed other than by appending {name} '
+                                   f'({num_skipped} of {num_loaded} loaded before remain)')
+
+        return num_added, parse_timestamp(latest_ts) if latest_ts is not None else None
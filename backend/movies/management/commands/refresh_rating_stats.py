@@ -0,0 +1,49 @@
+from argparse import ArgumentParser
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) movies' stored rating stats from the raw ratings"
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            '--verify', action='store_true', default=False,
+            help='Only report movies whose stored rating stats are incorrect, without fixing them',
+        )
+
+    def handle(self, verify: bool, **options):
+        if verify:
+            self.verify()
+        else:
+            self.rebuild()
+
+    @transaction.atomic
+    def rebuild(self):
+        num_updated = Movie.objects.refresh_rating_stats()
+        self.stdout.write(f'Successfully refreshed rating stats of {num_updated} movies',
+                          style_func=self.style.SUCCESS)
+
+    def verify(self):
+        stale_movies = (
+            Movie.objects.all()
+                .filter_stale_rating_stats()
+                .order_by('id')
+                .values_list('id', 'rating_count', 'rating_sum',
+                             'actual_rating_count', 'actual_rating_sum')
+        )
+
+        num_stale = 0
+        for movie_id, rating_count, rating_sum, actual_count, actual_sum in stale_movies.iterator():
+            num_stale += 1
+            self.stderr.write(f'Movie {movie_id}: stored {rating_count} ratings summing to {rating_sum}, '
+                              f'but has {actual_count} ratings summing to {actual_sum}')
+
+        if num_stale:
+            raise CommandError(f'{num_stale} movies have incorrect rating stats. '
+                               f'Run without --verify to fix them.')
+
+        self.stdout.write('All movies have correct rating stats', style_func=self.style.SUCCESS)
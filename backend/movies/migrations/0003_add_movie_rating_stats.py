@@ -0,0 +1,127 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_add_imdb_and_tmdb_id_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+
+        # Statement-level triggers aggregate each statement's transition tables
+        # once, so bulk inserts/deletes of ratings cost one UPDATE per statement,
+        # rather than one per rating.
+        migrations.RunSQL(
+            sql='''
+                CREATE FUNCTION movies_rating_stats_apply() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        UPDATE movies_movie
+                           SET rating_count = 0, rating_sum = 0
+                         WHERE rating_count <> 0 OR rating_sum <> 0;
+                        RETURN NULL;
+                    END IF;
+
+                    -- NOTE: each event only provides its own transition tables,
+                    --       so every branch may only reference those.
+                    IF TG_OP = 'INSERT' THEN
+                        UPDATE movies_movie AS movie
+                           SET rating_count = movie.rating_count + delta.count,
+                               rating_sum = movie.rating_sum + delta.sum
+                          FROM (
+                              SELECT movie_id, count(*) AS count, sum(rating) AS sum
+                                FROM new_ratings
+                               GROUP BY movie_id
+                          ) AS delta
+                         WHERE movie.id = delta.movie_id;
+
+                    ELSIF TG_OP = 'DELETE' THEN
+                        UPDATE movies_movie AS movie
+                           SET rating_count = movie.rating_count - delta.count,
+                               rating_sum = movie.rating_sum - delta.sum
+                          FROM (
+                              SELECT movie_id, count(*) AS count, sum(rating) AS sum
+                                FROM old_ratings
+                               GROUP BY movie_id
+                          ) AS delta
+                         WHERE movie.id = delta.movie_id;
+
+                    ELSIF TG_OP = 'UPDATE' THEN
+                        UPDATE movies_movie AS movie
+                           SET rating_count = movie.rating_count + delta.count,
+                               rating_sum = movie.rating_sum + delta.sum
+                          FROM (
+                              SELECT movie_id, sum(count) AS count, sum(sum) AS sum
+                                FROM (
+                                    SELECT movie_id, 1 AS count, rating AS sum FROM new_ratings
+                                    UNION ALL
+                                    SELECT movie_id, -1 AS count, -rating AS sum FROM old_ratings
+                                ) AS changes
+                               GROUP BY movie_id
+                          ) AS delta
+                         WHERE movie.id = delta.movie_id
+                           AND (delta.count <> 0 OR delta.sum <> 0);
+                    END IF;
+
+                    RETURN NULL;
+                END;
+                $$;
+
+                CREATE TRIGGER rating_stats_insert
+                    AFTER INSERT ON movies_rating
+                    REFERENCING NEW TABLE AS new_ratings
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_rating_stats_apply();
+
+                CREATE TRIGGER rating_stats_update
+                    AFTER UPDATE ON movies_rating
+                    REFERENCING OLD TABLE AS old_ratings NEW TABLE AS new_ratings
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_rating_stats_apply();
+
+                CREATE TRIGGER rating_stats_delete
+                    AFTER DELETE ON movies_rating
+                    REFERENCING OLD TABLE AS old_ratings
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_rating_stats_apply();
+
+                CREATE TRIGGER rating_stats_truncate
+                    AFTER TRUNCATE ON movies_rating
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_rating_stats_apply();
+            ''',
+            reverse_sql='''
+                DROP TRIGGER rating_stats_insert ON movies_rating;
+                DROP TRIGGER rating_stats_update ON movies_rating;
+                DROP TRIGGER rating_stats_delete ON movies_rating;
+                DROP TRIGGER rating_stats_truncate ON movies_rating;
+                DROP FUNCTION movies_rating_stats_apply();
+            ''',
+        ),
+
+        # Backfill the stats for any existing ratings
+        migrations.RunSQL(
+            sql='''
+                UPDATE movies_movie AS movie
+                   SET rating_count = stats.count,
+                       rating_sum = stats.sum
+                  FROM (
+                      SELECT movie_id, count(*) AS count, sum(rating) AS sum
+                        FROM movies_rating
+                       GROUP BY movie_id
+                  ) AS stats
+                 WHERE movie.id = stats.movie_id;
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
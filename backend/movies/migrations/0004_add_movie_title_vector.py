@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_add_movie_rating_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='title_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql='''
+                CREATE TRIGGER movie_title_vector_update
+                    BEFORE INSERT OR UPDATE OF title ON movies_movie
+                    FOR EACH ROW
+                    EXECUTE FUNCTION tsvector_update_trigger(title_vector, 'pg_catalog.english', title);
+            ''',
+            reverse_sql='''
+                DROP TRIGGER movie_title_vector_update ON movies_movie;
+            ''',
+        ),
+        migrations.RunSQL(
+            sql='''
+                UPDATE movies_movie
+                   SET title_vector = to_tsvector('pg_catalog.english', coalesce(title, ''));
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # NOTE: the index is built after backfilling, as building it all at once
+        #       is much faster than updating it for every row.
+        migrations.AddIndex(
+            model_name='movie',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title_vector'], name='movie_title_vector'),
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movie_title_search',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:37
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_add_movie_title_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='movie',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='movie_title_trigram', opclasses=['gin_trgm_ops']),
+        ),
+    ]
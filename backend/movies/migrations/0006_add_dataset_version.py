@@ -0,0 +1,70 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_add_movie_title_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('modified', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+
+        migrations.RunSQL(
+            sql="INSERT INTO movies_datasetversion (id, version, modified) VALUES (1, 1, now());",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # Any write to the tables served by the movies API bumps the version, in
+        # the same transaction, so the new version is visible exactly when the
+        # changes are.
+        migrations.RunSQL(
+            sql='''
+                CREATE FUNCTION movies_dataset_version_bump() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    UPDATE movies_datasetversion
+                       SET version = version + 1, modified = clock_timestamp()
+                     WHERE id = 1;
+                    RETURN NULL;
+                END;
+                $$;
+
+                CREATE TRIGGER dataset_version_bump
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON movies_movie
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_dataset_version_bump();
+
+                CREATE TRIGGER dataset_version_bump
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON movies_genre
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_dataset_version_bump();
+
+                CREATE TRIGGER dataset_version_bump
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON movies_movie_genres
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_dataset_version_bump();
+
+                CREATE TRIGGER dataset_version_bump
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON movies_rating
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_dataset_version_bump();
+            ''',
+            reverse_sql='''
+                DROP TRIGGER dataset_version_bump ON movies_movie;
+                DROP TRIGGER dataset_version_bump ON movies_genre;
+                DROP TRIGGER dataset_version_bump ON movies_movie_genres;
+                DROP TRIGGER dataset_version_bump ON movies_rating;
+                DROP FUNCTION movies_dataset_version_bump();
+            ''',
+        ),
+    ]
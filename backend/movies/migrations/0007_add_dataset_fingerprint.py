@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_add_dataset_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archive_hash', models.CharField(help_text="SHA-256 of all the CSVs' hashes", max_length=64)),
+                ('csv_hashes', models.JSONField(default=dict, help_text="Each CSV's CRC-32 and size, by name")),
+                ('row_counts', models.JSONField(default=dict, help_text='Number of rows in each table, once loaded')),
+                ('ratings_watermark', models.DateTimeField(help_text='Timestamp of the latest rating loaded', null=True)),
+                ('tags_watermark', models.DateTimeField(help_text='Timestamp of the latest tag loaded', null=True)),
+                ('loaded', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,182 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_add_dataset_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+
+        # Number any existing genres in order
+        migrations.RunSQL(
+            sql='''
+                UPDATE movies_genre AS genre
+                   SET bit = numbered.bit
+                  FROM (
+                      SELECT id, row_number() OVER (ORDER BY id) - 1 AS bit
+                        FROM movies_genre
+                  ) AS numbered
+                 WHERE genre.id = numbered.id;
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        migrations.AlterField(
+            model_name='genre',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='genre',
+            constraint=models.CheckConstraint(check=models.Q(bit__lt=63), name='genre_bit_range'),
+        ),
+
+        # New genres are given the lowest bit no other genre has.
+        # NOTE: a row-level BEFORE trigger sees the rows its statement inserted
+        #       before the current one, so bulk inserts are numbered correctly.
+        migrations.RunSQL(
+            sql='''
+                CREATE FUNCTION movies_genre_assign_bit() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF NEW.bit IS NULL THEN
+                        -- Keep concurrent inserts from claiming the same bit
+                        LOCK TABLE movies_genre IN SHARE ROW EXCLUSIVE MODE;
+
+                        SELECT min(candidate.bit) INTO NEW.bit
+                          FROM generate_series(0, 62) AS candidate(bit)
+                         WHERE NOT EXISTS (
+                             SELECT FROM movies_genre AS genre WHERE genre.bit = candidate.bit
+                         );
+
+                        IF NEW.bit IS NULL THEN
+                            RAISE EXCEPTION 'Unable to add genre "%": there may be at most 63 genres', NEW.name;
+                        END IF;
+                    END IF;
+
+                    RETURN NEW;
+                END;
+                $$;
+
+                CREATE TRIGGER genre_assign_bit
+                    BEFORE INSERT ON movies_genre
+                    FOR EACH ROW EXECUTE FUNCTION movies_genre_assign_bit();
+            ''',
+            reverse_sql='''
+                DROP TRIGGER genre_assign_bit ON movies_genre;
+                DROP FUNCTION movies_genre_assign_bit();
+            ''',
+        ),
+
+        migrations.AddField(
+            model_name='movie',
+            name='genre_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+
+        # As with rating stats, statement-level triggers recalculate the masks of
+        # all the movies whose genres a statement changed in one UPDATE.
+        migrations.RunSQL(
+            sql='''
+                CREATE FUNCTION movies_movie_genre_mask_refresh(movie_ids bigint[]) RETURNS void
+                LANGUAGE sql AS $$
+                    UPDATE movies_movie AS movie
+                       SET genre_mask = coalesce(masks.mask, 0)
+                      FROM unnest(movie_ids) AS changed(movie_id)
+                      LEFT JOIN (
+                          SELECT movie_genre.movie_id, bit_or(1::bigint << genre.bit) AS mask
+                            FROM movies_movie_genres AS movie_genre
+                            JOIN movies_genre AS genre ON genre.id = movie_genre.genre_id
+                           WHERE movie_genre.movie_id = ANY(movie_ids)
+                           GROUP BY movie_genre.movie_id
+                      ) AS masks ON masks.movie_id = changed.movie_id
+                     WHERE movie.id = changed.movie_id
+                       AND movie.genre_mask <> coalesce(masks.mask, 0);
+                $$;
+
+                CREATE FUNCTION movies_movie_genre_mask_apply() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        UPDATE movies_movie SET genre_mask = 0 WHERE genre_mask <> 0;
+                        RETURN NULL;
+                    END IF;
+
+                    -- NOTE: each event only provides its own transition tables,
+                    --       so every branch may only reference those.
+                    IF TG_OP = 'INSERT' THEN
+                        PERFORM movies_movie_genre_mask_refresh(ARRAY(
+                            SELECT DISTINCT movie_id FROM new_movie_genres
+                        ));
+
+                    ELSIF TG_OP = 'DELETE' THEN
+                        PERFORM movies_movie_genre_mask_refresh(ARRAY(
+                            SELECT DISTINCT movie_id FROM old_movie_genres
+                        ));
+
+                    ELSIF TG_OP = 'UPDATE' THEN
+                        PERFORM movies_movie_genre_mask_refresh(ARRAY(
+                            SELECT movie_id FROM new_movie_genres
+                            UNION
+                            SELECT movie_id FROM old_movie_genres
+                        ));
+                    END IF;
+
+                    RETURN NULL;
+                END;
+                $$;
+
+                CREATE TRIGGER genre_mask_insert
+                    AFTER INSERT ON movies_movie_genres
+                    REFERENCING NEW TABLE AS new_movie_genres
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_movie_genre_mask_apply();
+
+                CREATE TRIGGER genre_mask_update
+                    AFTER UPDATE ON movies_movie_genres
+                    REFERENCING OLD TABLE AS old_movie_genres NEW TABLE AS new_movie_genres
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_movie_genre_mask_apply();
+
+                CREATE TRIGGER genre_mask_delete
+                    AFTER DELETE ON movies_movie_genres
+                    REFERENCING OLD TABLE AS old_movie_genres
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_movie_genre_mask_apply();
+
+                CREATE TRIGGER genre_mask_truncate
+                    AFTER TRUNCATE ON movies_movie_genres
+                    FOR EACH STATEMENT EXECUTE FUNCTION movies_movie_genre_mask_apply();
+            ''',
+            reverse_sql='''
+                DROP TRIGGER genre_mask_insert ON movies_movie_genres;
+                DROP TRIGGER genre_mask_update ON movies_movie_genres;
+                DROP TRIGGER genre_mask_delete ON movies_movie_genres;
+                DROP TRIGGER genre_mask_truncate ON movies_movie_genres;
+                DROP FUNCTION movies_movie_genre_mask_apply();
+                DROP FUNCTION movies_movie_genre_mask_refresh(bigint[]);
+            ''',
+        ),
+
+        # Backfill the masks of any existing movies
+        migrations.RunSQL(
+            sql='''
+                UPDATE movies_movie AS movie
+                   SET genre_mask = masks.mask
+                  FROM (
+                      SELECT movie_genre.movie_id, bit_or(1::bigint << genre.bit) AS mask
+                        FROM movies_movie_genres AS movie_genre
+                        JOIN movies_genre AS genre ON genre.id = movie_genre.genre_id
+                       GROUP BY movie_genre.movie_id
+                  ) AS masks
+                 WHERE movie.id = masks.movie_id;
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_add_movie_genre_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='avg_rating',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='weighted_rating',
+            field=models.FloatField(default=3.5, editable=False),
+        ),
+
+        # NOTE: the prior (10 ratings of 3.5) must match the model's
+        #       WEIGHTED_RATING_PRIOR_COUNT and WEIGHTED_RATING_PRIOR_MEAN
+        migrations.RunSQL(
+            sql='''
+                CREATE FUNCTION movies_movie_rating_scores_update() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    NEW.avg_rating := NEW.rating_sum / nullif(NEW.rating_count, 0);
+                    NEW.weighted_rating := (NEW.rating_sum + 10 * 3.5) / (NEW.rating_count + 10);
+                    RETURN NEW;
+                END;
+                $$;
+
+                CREATE TRIGGER movie_rating_scores_update
+                    BEFORE INSERT OR UPDATE OF rating_count, rating_sum ON movies_movie
+                    FOR EACH ROW EXECUTE FUNCTION movies_movie_rating_scores_update();
+            ''',
+            reverse_sql='''
+                DROP TRIGGER movie_rating_scores_update ON movies_movie;
+                DROP FUNCTION movies_movie_rating_scores_update();
+            ''',
+        ),
+
+        # Backfill the scores of existing movies, through the trigger
+        migrations.RunSQL(
+            sql='''
+                UPDATE movies_movie SET rating_count = rating_count;
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # NOTE: the indexes are built after backfilling, as building them all at
+        #       once is much faster than updating them for every row.
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['year', 'id'], name='movie_year'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-rating_count', 'id'], name='movie_rating_count'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-avg_rating', 'id'], name='movie_avg_rating'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-weighted_rating', 'id'], name='movie_weighted_rating'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_add_movie_rating_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetfingerprint',
+            name='source',
+            field=models.TextField(default='', help_text='URL or path the dataset was loaded from'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from .dataset_fingerprint import DatasetFingerprint
+from .dataset_version import DatasetVersion
 from .genre import Genre
 from .movie import Movie
 from .rating import Rating
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from django.db import models
+from django.utils import timezone
+
+from ._base import BaseModel
+
+
+class DatasetFingerprintQuerySet(models.QuerySet):
+    def get_latest(self) -> Optional['DatasetFingerprint']:
+        return self.order_by('-id').first()
+
+
+class DatasetFingerprint(BaseModel):
+    """The contents of a loaded dataset, by which later loads may tell what changed
+
+    Each load of the dataset records a row. Unchanged datasets are recognized
+    by their archive_hash, and changed CSVs by their csv_hashes. Changes are
+    only applied to a dataset loaded from the same source.
+    """
+
+    source = models.TextField(default='', help_text='URL or path the dataset was loaded from')
+    archive_hash = models.CharField(max_length=64, help_text="SHA-256 of all the CSVs' hashes")
+    csv_hashes = models.JSONField(default=dict, help_text="Each CSV's CRC-32 and size, by name")
+    row_counts = models.JSONField(default=dict, help_text="Number of rows in each table, once loaded")
+
+    ratings_watermark = models.DateTimeField(null=True, help_text='Timestamp of the latest rating loaded')
+    tags_watermark = models.DateTimeField(null=True, help_text='Timestamp of the latest tag loaded')
+
+    loaded = models.DateTimeField(default=timezone.now)
+
+    objects = DatasetFingerprintQuerySet.as_manager()
+
+    def __str__(self):
+        return self.archive_hash[:12]
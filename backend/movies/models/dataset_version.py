@@ -0,0 +1,37 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from ._base import BaseModel
+
+
+class DatasetVersionQuerySet(models.QuerySet):
+    def get_current(self) -> 'DatasetVersion':
+        version, created = self.get_or_create(pk=DatasetVersion.SINGLETON_ID)
+        return version
+
+    def bump(self) -> None:
+        """Mark the dataset as changed, invalidating anything cached by its version"""
+        self.filter(pk=DatasetVersion.SINGLETON_ID).update(
+            version=F('version') + 1,
+            modified=timezone.now(),
+        )
+
+
+class DatasetVersion(BaseModel):
+    """The version of the movies dataset, which changes whenever the dataset does
+
+    Only a single row is kept. Database triggers bump it on any write to the
+    tables served by the movies API, and load_dataset bumps it explicitly (as
+    it disables those triggers on ratings).
+    """
+
+    SINGLETON_ID = 1
+
+    version = models.PositiveBigIntegerField(default=1)
+    modified = models.DateTimeField(default=timezone.now)
+
+    objects = DatasetVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f'v{self.version}'
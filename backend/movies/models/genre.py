@@ -1,12 +1,26 @@
 from django.db import models
+from django.db.models import Q
 
 from ._base import BaseModel
 
+# Genres are numbered with bits of a (signed, 64-bit) bigint, so there may be at most this many
+MAX_GENRES = 63
+
 
 class Genre(BaseModel):
     # NOTE: on Postgres, all string fields are handled the same, and "max length"
     #       is simply a constraint.
     name = models.CharField(max_length=256)
 
+    # This genre's bit in its movies' genre_mask. Assigned by a trigger, when the
+    # genre is inserted, as the lowest bit unused by any other genre.
+    # (see migration 0008_add_movie_genre_mask)
+    bit = models.PositiveSmallIntegerField(unique=True, editable=False)
+
+    class Meta:
+        constraints = (
+            models.CheckConstraint(check=Q(bit__lt=MAX_GENRES), name='genre_bit_range'),
+        )
+
     def __str__(self):
         return self.name
@@ -1,31 +1,203 @@
-from typing import Literal, Optional
+from typing import Collection, Literal, Optional
 
-from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.aggregates import ArrayAgg, BitOr
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
-from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
 from django.db import models
-from django.db.models import Avg, Count, Q
+from django.db.models import (
+    BigIntegerField,
+    BooleanField,
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Func,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Ln
 
 from ._base import BaseModel
 
 
-MOVIE_TITLE_SEARCH_VECTOR = SearchVector('title', config='english')
+# NOTE: if changed, the movie_title_vector_update trigger must be updated to match
+#       (see migration 0004_add_movie_title_vector)
+MOVIE_TITLE_SEARCH_CONFIG = 'english'
+
+# NOTE: these fields are maintained by triggers on the ratings table
+#       (see migration 0003_add_movie_rating_stats)
+RATING_STATS_FIELDS = ('rating_count', 'rating_sum')
+
+# NOTE: these fields are calculated from the rating stats by a trigger, whenever
+#       the stats are inserted or updated (see migration 0009_add_movie_rating_scores)
+RATING_SCORE_FIELDS = ('avg_rating', 'weighted_rating')
+
+# A movie's weighted rating is the mean of its ratings, along with this many
+# more ratings of the prior mean. Movies with few ratings are thus ranked near
+# the prior mean, rather than (by chance) at the top or bottom.
+# NOTE: if changed, the movie_rating_scores_update trigger must be updated to match
+WEIGHTED_RATING_PRIOR_COUNT = 10
+WEIGHTED_RATING_PRIOR_MEAN = 3.5
+
+# Fields whose values are maintained by the database, never by Django
+# NOTE: genre_mask is maintained by triggers on the movie genres table
+#       (see migration 0008_add_movie_genre_mask)
+DATABASE_MAINTAINED_FIELDS = (*RATING_STATS_FIELDS, *RATING_SCORE_FIELDS, 'title_vector', 'genre_mask')
+
+
+class TrigramWordSimilarity(Func):
+    """How similar a string is to the most similar part of another string
+
+    NOTE: this is a backport of Django 4.0's TrigramWordSimilarity
+    """
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+class TrigramWordSimilar(Func):
+    """Whether a string is similar to some part of another string
+
+    Similarity is judged by the pg_trgm.word_similarity_threshold setting.
+    Unlike filtering on TrigramWordSimilarity, this can make use of trigram indexes.
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
 
 
 class MovieQuerySet(models.QuerySet):
     def annotate_ratings(self) -> 'MovieQuerySet':
+        # NOTE: avg_rating and weighted_rating are stored, so only the rating
+        #       count's name needs annotating.
         return self.annotate(
-            avg_rating=Avg('ratings__rating'),
-            num_ratings=Count('ratings__rating'),
+            num_ratings=F('rating_count'),
+        )
+
+    def refresh_rating_stats(self) -> int:
+        """Recalculate the stored rating stats from the raw ratings
+
+        Returns the number of movies updated.
+        """
+        from .rating import Rating
+
+        movie_ratings = Rating.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+        return self.update(
+            rating_count=Coalesce(
+                Subquery(movie_ratings.annotate(count=Count('*')).values('count')),
+                0,
+            ),
+            rating_sum=Coalesce(
+                Subquery(movie_ratings.annotate(sum=Sum('rating')).values('sum')),
+                0.0,
+            ),
+        )
+
+    def filter_stale_rating_stats(self) -> 'MovieQuerySet':
+        """Only include movies whose stored rating stats disagree with the raw ratings"""
+        return (
+            self
+                .annotate(
+                    actual_rating_count=Count('ratings'),
+                    actual_rating_sum=Coalesce(Sum('ratings__rating'), 0.0),
+                )
+                .exclude(
+                    rating_count=F('actual_rating_count'),
+                    rating_sum=F('actual_rating_sum'),
+                )
         )
 
+    def refresh_genre_masks(self) -> int:
+        """Recalculate the stored genre masks from the movies' genres
+
+        Returns the number of movies updated.
+        """
+        # NOTE: genres' bits may exceed an integer's, so they're shifted as bigints
+        genre_bit_mask = ExpressionWrapper(
+            Cast(Value(1), output_field=BigIntegerField()).bitleftshift(F('genre__bit')),
+            output_field=BigIntegerField(),
+        )
+        movie_genre_masks = (
+            Movie.genres.through.objects
+                .filter(movie=OuterRef('pk'))
+                .values('movie')
+                .annotate(mask=BitOr(genre_bit_mask))
+                .values('mask')
+        )
+        return self.update(genre_mask=Coalesce(Subquery(movie_genre_masks), 0))
+
+    def filter_genres(self, names: Collection[str], *, match: Literal['any', 'all'] = 'any') -> 'MovieQuerySet':
+        """Filter by movies with any (or all) of the named genres
+
+        This tests each movie's genre_mask, rather than joining its genres.
+        Unknown genre names match no movies.
+        """
+        from .genre import Genre
+
+        bits = list(Genre.objects.filter(name__in=names).values_list('bit', flat=True))
+        mask = sum(1 << bit for bit in bits)
+
+        if match == 'all':
+            if len(bits) < len(set(names)):
+                # NOTE: rather than none(), whose queries can't be compiled (e.g. to
+                #       estimate their counts), this filters on a mask no movie has,
+                #       as genres are never given the sign bit.
+                return self.filter(genre_mask__lt=0)
+            return self.alias(genre_mask_match=F('genre_mask').bitand(mask)).filter(genre_mask_match=mask)
+        else:
+            return self.alias(genre_mask_match=F('genre_mask').bitand(mask)).exclude(genre_mask_match=0)
+
+    def count_genres(self) -> dict[str, int]:
+        """Count the movies of each genre, in a single pass over the queryset
+
+        Each genre is counted by testing its bit of the movies' genre_mask, so
+        no genres are joined, and no rows grouped. Every genre is included,
+        even if none of the movies are of that genre.
+        """
+        from .genre import Genre
+
+        genres = list(Genre.objects.order_by('name').values_list('name', 'bit'))
+        if not genres:
+            return {}
+
+        counts = self.order_by().aggregate(**{
+            f'genre_{bit}': Coalesce(Sum(F('genre_mask').bitrightshift(bit).bitand(1)), 0)
+            for name, bit in genres
+        })
+        # NOTE: aggregating an empty queryset (e.g. from none()) results in None
+        return {name: counts[f'genre_{bit}'] or 0 for name, bit in genres}
+
     def annotate_genre_names(self) -> 'MovieQuerySet':
+        # NOTE: the genres are aggregated in a correlated subquery, rather than
+        #       joined and grouped in the main query, so that the movie rows aren't
+        #       multiplied by their genres (which would also inflate any other
+        #       aggregates performed over to-many relations).
+        movie_genre_names = (
+            Movie.genres.through.objects
+                .filter(movie=OuterRef('pk'))
+                .values('movie')
+                .annotate(names=ArrayAgg('genre__name', ordering='genre__name'))
+                .values('names')
+        )
         return self.annotate(
-            genre_names=ArrayAgg(
-                'genres__name',
-                # NOTE: if we don't filter out nulls, movies with no associated genres
-                #       will report [None] for this agg
-                filter=Q(genres__name__isnull=False),
+            genre_names=Coalesce(
+                Subquery(movie_genre_names),
+                Value([]),
+                output_field=ArrayField(models.CharField()),
             ),
         )
 
@@ -33,17 +205,77 @@ class MovieQuerySet(models.QuerySet):
                query: str,
                search_type: Literal['plain', 'phrase', 'raw', 'websearch'] = 'phrase',
                ) -> 'MovieQuerySet':
-        qs = self
-        qs = qs.annotate(title_vector=MOVIE_TITLE_SEARCH_VECTOR)
-        qs = qs.filter(
+        return self.filter(
             title_vector=SearchQuery(
                 query,
-                config=MOVIE_TITLE_SEARCH_VECTOR.config,
+                config=MOVIE_TITLE_SEARCH_CONFIG,
                 search_type=search_type,
             ),
         )
+
+    def fuzzy_search(self, query: str, threshold: Optional[float] = None) -> 'MovieQuerySet':
+        """Filter by titles containing words similar to the query, tolerating typos
+
+        Each movie's similarity is annotated as `title_similarity`, from 0 to 1.
+
+        Movies are first filtered using the movie_title_trigram index, whose
+        similarity threshold is the pg_trgm.word_similarity_threshold setting
+        (see settings.MOVIES_FUZZY_SEARCH_THRESHOLD). As such, passing a
+        threshold can only make the filter stricter.
+        """
+        qs = self.filter(TrigramWordSimilar(query, F('title')))
+        qs = qs.annotate(title_similarity=TrigramWordSimilarity(query, F('title')))
+        if threshold is not None:
+            qs = qs.filter(title_similarity__gte=threshold)
         return qs
 
+    def annotate_relevance(self,
+                           query: str,
+                           search_type: Literal['plain', 'phrase', 'raw', 'websearch'] = 'phrase',
+                           *,
+                           name: str = 'relevance',
+                           weighted: bool = False,
+                           max_candidates: Optional[int] = None,
+                           ) -> 'MovieQuerySet':
+        """Annotate how relevant each movie's title is to a search query
+
+        :param weighted:
+            If True, relevance is boosted by the (log of the) movie's number of
+            ratings, so well-known movies come before obscure ones.
+
+        :param max_candidates:
+            If passed, only the most-rated N movies of the queryset are actually
+            ranked, with all others given a relevance of 0. Ranking requires reading
+            and scoring every matching movie's title vector, which can be thousands
+            of movies for broad queries (e.g. the single-letter prefix "t:*"). This
+            bounds that cost, keeping latency flat no matter how broad the query.
+
+            Ordering by relevance, then rating count, keeps unranked movies after
+            the ranked candidates.
+        """
+        # NOTE: ts_rank returns a single-precision float, whose textual form doesn't
+        #       round-trip through Python floats exactly. Casting it to double
+        #       precision allows paginating by its exact values.
+        relevance = Cast(
+            SearchRank(
+                F('title_vector'),
+                SearchQuery(query, config=MOVIE_TITLE_SEARCH_CONFIG, search_type=search_type),
+            ),
+            output_field=FloatField(),
+        )
+        if weighted:
+            relevance = relevance * Ln(F('rating_count') + 2)
+
+        if max_candidates is not None:
+            candidates = self.order_by('-rating_count', 'id').values('pk')[:max_candidates]
+            relevance = Case(
+                When(pk__in=candidates, then=relevance),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+
+        return self.annotate(**{name: relevance})
+
 
 class Movie(BaseModel):
     # NOTE: on Postgres, all string fields are handled the same, and "max length"
@@ -56,12 +288,48 @@ class Movie(BaseModel):
     imdb_id = models.CharField(max_length=1024, null=True, blank=True)
     tmdb_id = models.CharField(max_length=1024, null=True, blank=True)
 
+    # Denormalized aggregates of this movie's ratings, so listing movies doesn't
+    # require aggregating the (very large) ratings table on every request.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.FloatField(default=0, editable=False)
+
+    # Scores calculated from the rating stats, stored so they may be indexed
+    # (see WEIGHTED_RATING_PRIOR_COUNT and WEIGHTED_RATING_PRIOR_MEAN)
+    avg_rating = models.FloatField(null=True, editable=False)
+    weighted_rating = models.FloatField(default=WEIGHTED_RATING_PRIOR_MEAN, editable=False)
+
+    # Maintained by a trigger whenever the title is inserted or updated
+    title_vector = SearchVectorField(null=True, editable=False)
+
+    # The bits (see Genre.bit) of this movie's genres, ORed together, so movies
+    # may be filtered and counted by genre without joining their genres.
+    genre_mask = models.BigIntegerField(default=0, editable=False)
+
     objects = MovieQuerySet.as_manager()
 
+    # Formatted with imdb_id/tmdb_id to produce imdb_url/tmdb_url
+    IMDB_URL_FORMAT = 'https://www.imdb.com/title/tt{}/'
+    TMDB_URL_FORMAT = 'https://www.themoviedb.org/movie/{}'
+
     class Meta:
         indexes = (
-            GinIndex(MOVIE_TITLE_SEARCH_VECTOR,
-                     name='movie_title_search'),
+            GinIndex(fields=['title_vector'],
+                     name='movie_title_vector'),
+            GinIndex(fields=['title'],
+                     opclasses=['gin_trgm_ops'],
+                     name='movie_title_trigram'),
+
+            # Range filters, and orderings (tie-broken by ID, as keyset pagination
+            # does). Pages ordered in an index's direction (e.g. top rated first)
+            # are read straight off it; in the other, only ties need sorting.
+            models.Index(fields=['year', 'id'],
+                         name='movie_year'),
+            models.Index(fields=['-rating_count', 'id'],
+                         name='movie_rating_count'),
+            models.Index(fields=['-avg_rating', 'id'],
+                         name='movie_avg_rating'),
+            models.Index(fields=['-weighted_rating', 'id'],
+                         name='movie_weighted_rating'),
         )
 
     def __str__(self):
@@ -70,12 +338,23 @@ class Movie(BaseModel):
         else:
             return f'{self.title} ({self.year})'
 
+    def save(self, *args, **kwargs):
+        # Some fields are maintained by the database. Avoid clobbering them with
+        # whatever stale values happen to be loaded on this instance.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in DATABASE_MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def imdb_url(self) -> Optional[str]:
         if self.imdb_id:
-            return f'https://www.imdb.com/title/tt{self.imdb_id}/'
+            return self.IMDB_URL_FORMAT.format(self.imdb_id)
 
     @property
     def tmdb_url(self) -> Optional[str]:
         if self.tmdb_id:
-            return f'https://www.themoviedb.org/movie/{self.tmdb_id}'
+            return self.TMDB_URL_FORMAT.format(self.tmdb_id)
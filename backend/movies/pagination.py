@@ -0,0 +1,386 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from movies.caching import get_dataset_version, normalize_query_params
+
+__all__ = ['EstimatedCountPageNumberPagination', 'KeysetPagination', 'get_keyset_ordering']
+
+# (field name, is descending)
+KeysetOrdering = Sequence[tuple[str, bool]]
+
+
+def get_keyset_ordering(queryset: models.QuerySet) -> KeysetOrdering:
+    """Return the ordering of a queryset, made unique by tie-breaking on the primary key
+
+    >>> from movies.models import Movie
+    >>> get_keyset_ordering(Movie.objects.order_by('-year'))
+    [('year', True), ('pk', False)]
+    >>> get_keyset_ordering(Movie.objects.order_by('title', '-id'))
+    [('title', False), ('id', True)]
+    """
+    ordering = []
+    for field in queryset.query.order_by:
+        if not isinstance(field, str) or field == '?' or '__' in field:
+            raise ValueError(f'Keyset pagination only supports ordering by plain field names, '
+                             f'not {field!r}')
+
+        is_descending = field.startswith('-')
+        ordering.append((field.lstrip('-'), is_descending))
+
+    pk_name = queryset.model._meta.pk.name
+    if not any(field in ('pk', pk_name) for field, is_descending in ordering):
+        ordering.append(('pk', False))
+
+    return ordering
+
+
+def is_nullable(model: type[models.Model], field_name: str) -> bool:
+    if field_name == 'pk':
+        return False
+
+    try:
+        return model._meta.get_field(field_name).null
+    except FieldDoesNotExist:
+        # Annotations may always be null, for all we know
+        return True
+
+
+def build_keyset_filter(model: type[models.Model],
+                        ordering: KeysetOrdering,
+                        position: Sequence[Any],
+                        ) -> Q:
+    """Build a filter selecting the rows ordered strictly after a position
+
+    This follows Postgres's default ordering of NULLs: last when ascending,
+    first when descending.
+    """
+    (field, is_descending), *rest_ordering = ordering
+    value, *rest_position = position
+
+    if rest_ordering:
+        after_tie = build_keyset_filter(model, rest_ordering, rest_position)
+    else:
+        after_tie = None
+
+    def tied(tie_condition: Q) -> Optional[Q]:
+        return tie_condition & after_tie if after_tie is not None else None
+
+    def any_of(*conditions: Optional[Q]) -> Q:
+        conditions = [condition for condition in conditions if condition is not None]
+        if not conditions:
+            # Matches nothing
+            return Q(pk__in=[])
+
+        result, *rest = conditions
+        for condition in rest:
+            result |= condition
+        return result
+
+    if value is None:
+        if is_descending:
+            # NULLs come first, so every non-null value comes after
+            return any_of(Q(**{f'{field}__isnull': False}),
+                          tied(Q(**{f'{field}__isnull': True})))
+        else:
+            # NULLs come last, so only other NULLs can come after
+            return any_of(tied(Q(**{f'{field}__isnull': True})))
+
+    if is_descending:
+        condition = any_of(Q(**{f'{field}__lt': value}),
+                           tied(Q(**{field: value})))
+        # NOTE: this redundant bound allows an index to seek straight to the position,
+        #       rather than scanning (and filtering out) every preceding row
+        return Q(**{f'{field}__lte': value}) & condition
+
+    elif is_nullable(model, field):
+        return any_of(Q(**{f'{field}__gt': value}),
+                      Q(**{f'{field}__isnull': True}),
+                      tied(Q(**{field: value})))
+
+    else:
+        condition = any_of(Q(**{f'{field}__gt': value}),
+                           tied(Q(**{field: value})))
+        return Q(**{f'{field}__gte': value}) & condition
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by the position of the last row seen, rather than an offset
+
+    The position is made up of the values of the queryset's ordering fields
+    (e.g. from OrderingFilter), always tie-broken by primary key. This keeps
+    the cost of retrieving any page constant, no matter how deep, as opposed
+    to OFFSET, which must produce and discard every preceding row.
+
+    Only forward pagination is supported, and no total count is returned. The
+    first page is requested with an empty cursor (e.g. `?cursor=`).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = get_keyset_ordering(queryset)
+
+        queryset = queryset.order_by(*(
+            f'-{field}' if is_descending else field
+            for field, is_descending in self.ordering
+        ))
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(build_keyset_filter(queryset.model, self.ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                # The position's values aren't of their fields' types
+                raise NotFound(self.invalid_cursor_message)
+
+        # Retrieve one extra row to determine whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request) -> Optional[int]:
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        position = [getattr(last, field) for field, is_descending in self.ordering]
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(position))
+
+    def get_ordering_key(self) -> list[str]:
+        return [f'-{field}' if is_descending else field for field, is_descending in self.ordering]
+
+    def encode_cursor(self, position: list[Any]) -> str:
+        payload = json.dumps({'o': self.get_ordering_key(), 'p': position}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request) -> Optional[list[Any]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(payload, dict):
+                raise ValueError('Cursor payload must be an object')
+            ordering = payload['o']
+            position = payload['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor is only meaningful for the ordering it was created with
+        if (ordering != self.get_ordering_key()
+                or not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+
+def estimate_count(queryset: models.QuerySet) -> int:
+    """Return the query planner's estimate of the number of rows in a queryset"""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan, = cursor.fetchone()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPage(Page):
+    def __init__(self, object_list, number, paginator, *, has_next: bool):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator whose count is supplied, and may only be an estimate
+
+    When the count is an estimate, it can't be trusted to bound the pages, so
+    pages are sliced without regard to it, and the existence of a next page
+    is determined by retrieving one extra row.
+    """
+
+    def __init__(self, object_list, per_page, *, count: int, count_is_exact: bool, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+        self.count_is_exact = count_is_exact
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+
+        # An estimated count can't bound the page numbers, so only validate
+        # that the number is a positive integer
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.count_is_exact:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        object_list = list(self.object_list[bottom:top + 1])
+        if not object_list and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+
+        return EstimatedCountPage(object_list[:self.per_page], number, self,
+                                  has_next=len(object_list) > self.per_page)
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    """Page number pagination which avoids counting large result sets exactly
+
+    Counting is performed without any of the queryset's annotations. When the
+    query planner estimates at least settings.MOVIES_COUNT_ESTIMATE_THRESHOLD
+    rows, and there are in fact at least that many (counting no further), its
+    estimate is used instead of an exact count. Either way, counts are cached
+    for settings.MOVIES_COUNT_CACHE_TTL seconds per dataset version and
+    normalized set of query params.
+
+    Whether the count is exact is reported in the X-Count-Estimated header.
+
+    Views filtering by conditions the planner can't estimate may always have
+    them counted exactly, by defining has_unestimable_filters(queryset).
+    """
+
+    count_estimated_header = 'X-Count-Estimated'
+
+    # Query params which have no effect on the count
+    count_ignored_query_params = ('cursor', 'ordering')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # NOTE: the request is needed to determine the count's cache key, and the
+        #       view to determine whether the count may be estimated
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    # NOTE: DRF instantiates the paginator through this attribute, so defining it
+    #       as a method allows us to supply the count.
+    def django_paginator_class(self, object_list, per_page) -> EstimatedCountPaginator:
+        count, self.count_is_exact = self.get_count(object_list)
+        return EstimatedCountPaginator(object_list, per_page,
+                                       count=count, count_is_exact=self.count_is_exact)
+
+    def get_count(self, queryset: models.QuerySet) -> tuple[int, bool]:
+        """Return the number of rows in the queryset, and whether it's exact"""
+        cache_key = self.get_count_cache_key()
+        if (cached := cache.get(cache_key)) is not None:
+            return cached
+
+        # Annotations (e.g. genre names) are irrelevant to the number of rows
+        count_queryset = queryset.order_by().values('pk')
+
+        threshold = settings.MOVIES_COUNT_ESTIMATE_THRESHOLD
+        if (threshold
+                and not self.has_unestimable_filters(queryset)
+                and (estimate := estimate_count(count_queryset)) >= threshold):
+            # NOTE: the planner may overestimate (e.g. with stale statistics), so
+            #       rows are counted up to the threshold, to be sure there are
+            #       enough to warrant an estimate.
+            bounded_count = count_queryset[:threshold].count()
+            if bounded_count >= threshold:
+                result = estimate, False
+            else:
+                result = bounded_count, True
+        else:
+            result = count_queryset.count(), True
+
+        cache.set(cache_key, result, timeout=settings.MOVIES_COUNT_CACHE_TTL)
+        return result
+
+    def has_unestimable_filters(self, queryset: models.QuerySet) -> bool:
+        has_unestimable_filters = getattr(self.view, 'has_unestimable_filters', None)
+        return has_unestimable_filters is not None and has_unestimable_filters(queryset)
+
+    def get_count_cache_key(self) -> str:
+        ignored_params = {
+            self.page_query_param,
+            self.page_size_query_param,
+            *self.count_ignored_query_params,
+        }
+        normalized_params = normalize_query_params(self.request.query_params, ignored=ignored_params)
+        query_hash = hashlib.md5(normalized_params.encode('utf-8')).hexdigest()
+        dataset_version = get_dataset_version(self.request)
+        return f'movies:count:{dataset_version.version}:{self.request.path}:{query_hash}'
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response[self.count_estimated_header] = 'false' if self.count_is_exact else 'true'
+        return response
@@ -0,0 +1,262 @@
+"""Staging of large CSVs into Postgres by a pool of worker processes
+
+Each CSV is extracted to disk and split into shards by byte range, at line
+boundaries. Each shard is then streamed verbatim, by a worker process on its
+own connection, into its own UNLOGGED staging table, and committed there.
+
+Staging tables are invisible to the API; moving their rows into the real
+tables is left to the caller's transaction, so the whole dataset becomes
+visible atomically, when that transaction commits.
+
+Throughout a load, a session-level advisory lock is held on the load's
+token, so its staging tables (committed, and so otherwise unlocked) aren't
+mistaken for leftovers of an abandoned load, and dropped mid-load.
+
+NOTE: worker processes are spawned, rather than forked, so they share no
+      connections with the caller. This module doesn't import Django, so
+      workers may import it without configuring Django first.
+"""
+import io
+import os
+import re
+import secrets
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import Any, BinaryIO, Optional, Sequence
+
+import psycopg2
+from psycopg2 import errors, sql
+
+__all__ = ['ParallelCsvStager', 'StagedCsv', 'drop_staging_tables', 'split_lines']
+
+# Prefix of all staging tables' names, which must not be used by any real table
+STAGING_TABLE_PREFIX = 'movies_loadstage_'
+
+# Size of the chunks read from shards and sent to Postgres
+CHUNK_SIZE = 1024 * 1024
+
+# First key of the advisory locks held by loads, on their tokens (the second key)
+STAGING_LOCK_NAMESPACE = 0x6d6f7673  # "movs"
+
+
+def connect(connection_params: dict[str, Any]):
+    return psycopg2.connect(**connection_params, client_encoding='UTF8')
+
+
+def split_lines(fp: BinaryIO, start: int, end: int, num_shards: int) -> list[tuple[int, int]]:
+    """Split the byte range of a file into roughly equal shards of whole lines
+
+    >>> split_lines(io.BytesIO(b'a\\nbb\\nccc\\ndddd\\n'), 0, 14, 3)
+    [(0, 5), (5, 9), (9, 14)]
+
+    NOTE: this assumes no quoted value contains a line break.
+    """
+    boundaries = [start]
+    for i in range(1, num_shards):
+        fp.seek(max(start + (end - start) * i // num_shards - 1, boundaries[-1]))
+        fp.readline()
+        boundary = min(fp.tell(), end)
+        if boundary > boundaries[-1]:
+            boundaries.append(boundary)
+
+    if end > boundaries[-1]:
+        boundaries.append(end)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+
+class ByteRangeReader(io.RawIOBase):
+    """A readable stream of only the bytes of a file between two positions"""
+
+    def __init__(self, fp: BinaryIO, start: int, end: int):
+        self._fp = fp
+        self._fp.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._fp.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+def copy_shard(connection_params: dict[str, Any],
+               path: str,
+               start: int,
+               end: int,
+               table: str,
+               columns: Sequence[str],
+               ) -> int:
+    """Create a staging table and COPY a shard of CSV lines into it, returning the rows copied
+
+    All the staging table's columns are text, so the CSV's values are staged
+    verbatim, and cast on their way into the real table.
+    """
+    table_name = sql.Identifier(table)
+    column_names = sql.SQL(', ').join(map(sql.Identifier, columns))
+
+    conn = connect(connection_params)
+    try:
+        with conn, conn.cursor() as cursor, open(path, 'rb') as fp:
+            cursor.execute(sql.SQL('CREATE UNLOGGED TABLE {} ({})').format(
+                table_name,
+                sql.SQL(', ').join(sql.SQL('{} text').format(sql.Identifier(column)) for column in columns),
+            ))
+
+            # NOTE: in CSV format, COPY reads unquoted empty values as NULL, but
+            #       MovieLens uses them for empty strings (e.g. tag names).
+            copy = sql.SQL('COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({}))').format(
+                table_name, column_names, column_names)
+            cursor.copy_expert(copy.as_string(conn), ByteRangeReader(fp, start, end), size=CHUNK_SIZE)
+            return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def get_staging_lock_key(token: str) -> int:
+    """Return the second key of the advisory lock held by the load with a token
+
+    >>> get_staging_lock_key('7fffffff')
+    2147483647
+    >>> get_staging_lock_key('80000000')
+    -2147483648
+    """
+    return int.from_bytes(bytes.fromhex(token), 'big', signed=True)
+
+
+def get_staging_table_token(table: str) -> Optional[str]:
+    """Return the token of the load which created a staging table, if it has one
+
+    >>> get_staging_table_token('movies_loadstage_0badf00d_ratings_3')
+    '0badf00d'
+    >>> get_staging_table_token('movies_loadstage_ratings') is None
+    True
+    """
+    if match := re.match(rf'{STAGING_TABLE_PREFIX}([0-9a-f]{{8}})_', table):
+        return match[1]
+
+
+def drop_staging_tables(connection_params: dict[str, Any]) -> list[str]:
+    """Drop the staging tables left behind by loads which were rolled back (or crashed)
+
+    Tables of ongoing loads, i.e. those whose loads still hold their advisory
+    locks (or, failing that, locks on the tables themselves), are skipped.
+    Returns the names of the tables dropped.
+    """
+    dropped = []
+    conn = connect(connection_params)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET lock_timeout = '1s'")
+            cursor.execute(
+                'SELECT tablename FROM pg_tables '
+                'WHERE schemaname = current_schema() AND starts_with(tablename, %s)',
+                (STAGING_TABLE_PREFIX,),
+            )
+            for table, in cursor.fetchall():
+                lock_key = None
+                if token := get_staging_table_token(table):
+                    lock_key = get_staging_lock_key(token)
+                    cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', (STAGING_LOCK_NAMESPACE, lock_key))
+                    is_abandoned, = cursor.fetchone()
+                    if not is_abandoned:
+                        continue
+
+                try:
+                    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table)))
+                except errors.LockNotAvailable:
+                    continue
+                else:
+                    dropped.append(table)
+                finally:
+                    if lock_key is not None:
+                        cursor.execute('SELECT pg_advisory_unlock(%s, %s)', (STAGING_LOCK_NAMESPACE, lock_key))
+    finally:
+        conn.close()
+
+    return dropped
+
+
+@dataclass
+class StagedCsv:
+    name: str
+    columns: list[str]
+    tables: list[str]
+    futures: list[Future]
+
+    def wait(self) -> int:
+        """Wait for all shards to be staged, returning the total number of rows"""
+        return sum(future.result() for future in self.futures)
+
+
+class ParallelCsvStager:
+    """Stage CSVs into Postgres with a pool of worker processes
+
+        with ParallelCsvStager(connection_params, workers=4) as stager:
+            staged_ratings = stager.stage('ratings', ratings_fp)
+            ...  # meanwhile, do other work
+            staged_ratings.wait()
+            cursor.execute(f'INSERT INTO ... SELECT ... FROM {staged_ratings.tables[0]}')
+
+    """
+
+    def __init__(self, connection_params: dict[str, Any], *, workers: int):
+        self.connection_params = connection_params
+        self.workers = workers
+        self.token = secrets.token_hex(4)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+        self._lock_conn = None
+
+    def __enter__(self) -> 'ParallelCsvStager':
+        # NOTE: the lock is held by its own session, which is only closed once
+        #       the load is over (releasing the lock, even if this process dies)
+        self._lock_conn = connect(self.connection_params)
+        self._lock_conn.autocommit = True
+        with self._lock_conn.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s, %s)',
+                           (STAGING_LOCK_NAMESPACE, get_staging_lock_key(self.token)))
+
+        drop_staging_tables(self.connection_params)
+
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='movies-load-')
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown(cancel_futures=exc_type is not None)
+        self._tmpdir.cleanup()
+        self._lock_conn.close()
+
+    def stage(self, name: str, fp: BinaryIO, *, shards: Optional[int] = None) -> StagedCsv:
+        """Extract a CSV to disk and begin staging it, in shards (by default, one per worker)
+
+        Staging tables are named after the CSV, and only hold the shard's rows.
+        The CSV's header row names the staging tables' columns.
+        """
+        path = os.path.join(self._tmpdir.name, f'{name}.csv')
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(fp, out, CHUNK_SIZE)
+
+        with open(path, 'rb') as csv_fp:
+            header = csv_fp.readline()
+            ranges = split_lines(csv_fp, len(header), os.fstat(csv_fp.fileno()).st_size,
+                                 shards or self.workers)
+
+        columns = header.decode('utf-8-sig').strip().split(',')
+        tables = [f'{STAGING_TABLE_PREFIX}{self.token}_{name}_{i}' for i in range(len(ranges))]
+        futures = [
+            self._executor.submit(copy_shard, self.connection_params, path, start, end, table, columns)
+            for table, (start, end) in zip(tables, ranges)
+        ]
+        return StagedCsv(name=name, columns=columns, tables=tables, futures=futures)
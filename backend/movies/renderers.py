@@ -0,0 +1,37 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ['FastJSONRenderer']
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer which encodes with orjson (if installed), when rendering compactly
+
+    The output is the same as JSONRenderer's, byte for byte, for anything but
+    floats requiring an exponent (e.g. 1e-05 is rendered as 1e-5), and
+    non-finite floats (rendered as null, rather than raising an error).
+    Indented JSON (e.g. for the browsable API), and ASCII-only JSON
+    (if UNICODE_JSON is disabled), are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            # NOTE: datetimes are passed through to the encoder class, as orjson
+            #       formats them differently (e.g. it keeps their microseconds)
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+        # Like JSONRenderer, escape these, so the output is a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,7 +1,24 @@
+import functools
 import re
 
 __all__ = ['parse_search_query']
 
+# Parsed queries are cached per normalized query, up to this many queries
+PARSED_QUERY_CACHE_SIZE = 1024
+
+# Longer queries are unlikely to be repeated, so they're parsed without caching
+MAX_CACHED_QUERY_LENGTH = 256
+
+TOKEN_RE = re.compile(r'''
+    (?P<negation>-+)
+  | "(?P<phrase>[^"]*)"
+  | (?P<unmatched_quote>")
+  | (?P<word>[^\s"-]\S*)
+''', re.VERBOSE)
+
+# Characters with special meaning in the tsquery syntax, which separate the parts of words
+TSQUERY_OPERATORS_RE = re.compile(r'<->|[()\'"&|!:*<>\\]+')
+
 
 def parse_search_query(q: str) -> str:
     """Parse a query to raw tsquery format, with some desirable properties.
@@ -35,7 +52,48 @@ def parse_search_query(q: str) -> str:
     "!( 'twue' <-> 'wub' )"
     >>> parse_search_query('you or me')
     'you:* | me:*'
+
+    Characters with special meaning in tsquery separate words into parts (as
+    they do when titles are indexed), which must all match. Terms left empty
+    are ignored.
+
+    >>> parse_search_query('Star Trek: Nemesis')
+    'star:* & trek:* & nemesis:*'
+    >>> parse_search_query('"twue wub" & "wuv"')
+    "( 'twue' <-> 'wub' ) & ( 'wuv' )"
+    >>> parse_search_query('12:01 or -at&t')
+    '( 12:* & 01:* ) | !( at:* & t:* )'
+    >>> parse_search_query('"12:01 pm"')
+    "( '12' <-> '01' <-> 'pm' )"
+
+    Parsed queries are cached (see parse_search_query.cache_info()).
     """
+    q = normalize_search_query(q)
+    if len(q) > MAX_CACHED_QUERY_LENGTH:
+        return _parse_normalized_search_query.__wrapped__(q)
+    return _parse_normalized_search_query(q)
+
+
+def normalize_search_query(q: str) -> str:
+    """Normalize a query's case and whitespace, which don't affect its meaning
+
+    >>> normalize_search_query('  Twue\tWUB  ')
+    'twue wub'
+    """
+    return ' '.join(q.lower().split())
+
+
+def split_word(word: str) -> list[str]:
+    """Split a word into the parts separated by tsquery operators
+
+    >>> split_word("(o'brien<->)")
+    ['o', 'brien']
+    """
+    return [part for part in TSQUERY_OPERATORS_RE.split(word) if part]
+
+
+@functools.lru_cache(maxsize=PARSED_QUERY_CACHE_SIZE)
+def _parse_normalized_search_query(q: str) -> str:
     is_negated = False
     is_or_join = False
     parts = []
@@ -45,48 +103,36 @@ def parse_search_query(q: str) -> str:
 
         if parts:
             parts.append('|' if is_or_join else '&')
-            is_or_join = False
+        is_or_join = False
 
         if is_negated:
             part = '!' + part
             is_negated = False
         parts.append(part)
 
-    def escape_word(word: str) -> str:
-        """Remove tsquery operators from a word"""
-        return re.sub(r'[()\'"&|]|<->', '', word)
-
-    i = 0
-    while i < len(q):
-        c = q[i]
-        if c == '"':
-            i += 1
-
-            if (quoted_len := q[i + 1:].find('"')) != -1:
-                quoted = q[i:i + quoted_len + 1]
-                i += quoted_len + 1
+    for match in TOKEN_RE.finditer(q):
+        kind = match.lastgroup
 
-                words = quoted.split()
-                escaped_words = [f"'{escape_word(word)}'" for word in words]
-                add_part(f'( {" <-> ".join(escaped_words)} )')
-
-        elif c == ' ':
-            i += 1
-            continue
-
-        elif c == '-':
-            i += 1
+        if kind == 'negation':
             is_negated = True
 
-        else:
-            word = q[i:]
-            if (word_len := word.find(' ')) != -1:
-                word = word[:word_len]
-            i += len(word)
+        elif kind == 'phrase':
+            escaped_words = [f"'{part}'" for word in match['phrase'].split() for part in split_word(word)]
+            if escaped_words:
+                add_part(f'( {" <-> ".join(escaped_words)} )')
 
-            if word.lower() == 'or':
+        elif kind == 'word':
+            word = match['word']
+            if word == 'or':
                 is_or_join = True
-            else:
-                add_part(f"{escape_word(word)}:*")
+            elif len(word_parts := split_word(word)) == 1:
+                add_part(f'{word_parts[0]}:*')
+            elif word_parts:
+                add_part(f'( {" & ".join(f"{part}:*" for part in word_parts)} )')
 
     return ' '.join(parts)
+
+
+# Expose the cache's hit/miss counters, and a means of clearing it
+parse_search_query.cache_info = _parse_normalized_search_query.cache_info
+parse_search_query.cache_clear = _parse_normalized_search_query.cache_clear
@@ -83,10 +83,30 @@ DATABASES = {
     'default': env.db_url('DATABASE_URL', default='sqlite://' + str(BASE_DIR / 'db.sqlite3')),
 }
 
+# How long (in seconds) to keep each database connection open, for reuse by later
+# requests (on the same thread). 0 closes connections at the end of each request.
+# NOTE: the development server uses a new thread for each request, so this is
+#       only worth enabling in production (see movies.gunicorn_conf).
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DATABASE_CONN_MAX_AGE', default=0)
+
+# Whether to check that persistent connections still work before reusing them,
+# so connections broken between requests (e.g. by the database restarting) are
+# replaced, rather than failing the request. (This is Django 4.1's setting,
+# backported by movies.connections.)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DATABASE_CONN_HEALTH_CHECKS', default=False)
+
 # NOTE: explicitly configuring this value removes a warning from Django
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -130,5 +150,68 @@ REST_FRAMEWORK = {
         'rest_framework_filters.backends.RestFrameworkFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'movies.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'PAGE_SIZE': 100,
 }
+
+
+# Movies API
+
+# How long (in seconds) to cache rendered movies API responses. Cached responses
+# are keyed by the dataset version, so they're never served once it changes.
+# 0 disables caching responses (though conditional requests are still honoured).
+MOVIES_RESPONSE_CACHE_TTL = env.int('MOVIES_RESPONSE_CACHE_TTL', default=3600)
+
+# How long (in seconds) to cache the total counts of paginated movie results, and
+# whether searches match any movies exactly (see MovieFilters.filter_search)
+MOVIES_COUNT_CACHE_TTL = env.int('MOVIES_COUNT_CACHE_TTL', default=300)
+
+# Above this many rows (as estimated by the query planner), the total count of
+# paginated movie results is estimated, rather than exact. 0 disables estimates.
+MOVIES_COUNT_ESTIMATE_THRESHOLD = env.int('MOVIES_COUNT_ESTIMATE_THRESHOLD', default=10_000)
+
+# When ordering movies by relevance to a search query, only rank this many of
+# the most-rated matches (the rest follow, ordered by rating count).
+# 0 ranks all matches.
+MOVIES_RELEVANCE_MAX_CANDIDATES = env.int('MOVIES_RELEVANCE_MAX_CANDIDATES', default=1000)
+
+# The minimum similarity (from 0 to 1) of a title to a query for it to be matched
+# by fuzzy search, which is used when searching finds no exact matches.
+MOVIES_FUZZY_SEARCH_THRESHOLD = env.float('MOVIES_FUZZY_SEARCH_THRESHOLD', default=0.5)
+
+# Where the snapshot of movie titles, from which suggestions (autocomplete) are
+# served, is stored. Each process reloads its suggestions when this changes.
+MOVIES_SUGGEST_SNAPSHOT_PATH = env.str('MOVIES_SUGGEST_SNAPSHOT_PATH',
+                                       default=str(BASE_DIR / 'suggest-snapshot.json'))
+
+# Where load_dataset keeps downloaded datasets, to be revalidated (with their
+# ETag/Last-Modified) rather than downloaded again. Empty disables the cache.
+MOVIES_DATASET_CACHE_DIR = env.str('MOVIES_DATASET_CACHE_DIR', default=str(BASE_DIR / 'dataset-cache'))
+
+# How many parallel workers Postgres may use to build each index, when load_dataset
+# builds indexes after loading (with --swap or --defer-indexes). This is further
+# limited by the server's max_worker_processes and max_parallel_workers.
+MOVIES_LOAD_MAINTENANCE_WORKERS = env.int('MOVIES_LOAD_MAINTENANCE_WORKERS', default=4)
+
+# How much memory Postgres may use to build each index, when load_dataset builds
+# indexes after loading. This is shared among the index's parallel workers.
+MOVIES_LOAD_MAINTENANCE_WORK_MEM = env.str('MOVIES_LOAD_MAINTENANCE_WORK_MEM', default='256MB')
+
+# How many threads (each with its own database connection) may run database work
+# for async views, per process, when served over ASGI (see movies.db_pool).
+# Requests beyond this wait their turn, without holding a thread.
+MOVIES_DB_POOL_SIZE = env.int('MOVIES_DB_POOL_SIZE', default=8)
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # NOTE: this is passed when connecting, rather than SET by every query using
+    #       it, as that would cost an extra round trip.
+    #       Any options given in DATABASE_URL (e.g. ?options=-c statement_timeout=5s)
+    #       are kept.
+    db_options = DATABASES['default'].setdefault('OPTIONS', {})
+    db_options['options'] = ' '.join(filter(None, (
+        db_options.get('options'),
+        f'-c pg_trgm.word_similarity_threshold={MOVIES_FUZZY_SEARCH_THRESHOLD}',
+    )))
@@ -0,0 +1,163 @@
+"""Loading of replacements for tables out of sight, swapped in all at once
+
+Shadow tables are created in their own schema, copying the real tables'
+columns, defaults, check constraints, primary keys, and triggers. While the
+shadow schema leads the search_path, every unqualified query -- Django's, or
+a trigger's -- reads and writes the shadow tables instead, so loading code
+needs no changes. Other sessions keep reading the real tables, undisturbed.
+
+The remaining indexes and foreign keys are built once the shadow tables are
+filled, which is far quicker than maintaining them row by row.
+
+Swapping moves the real tables out of the way, and the shadow tables into
+their place (with the same index and constraint names), in a few catalog
+updates. The exclusive locks this requires are only held from the swap until
+the end of the transaction.
+"""
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import OperationalError, transaction
+
+from movies.deferred_indexes import DeferredIndexes
+
+__all__ = ['ShadowTables']
+
+
+class ShadowTables(DeferredIndexes):
+    """Load replacements for a set of tables in a shadow schema, then swap them in
+
+        shadow_tables = ShadowTables([Movie, Rating])
+        with transaction.atomic():
+            with shadow_tables.loading():
+                ...  # queries here write to the shadow tables
+                shadow_tables.build()
+                ...  # queries here may use the shadow tables' indexes
+            shadow_tables.swap()
+
+    NOTE: all of this must happen within a single transaction.
+    """
+
+    schema = 'movies_shadow'
+    retired_schema = 'movies_retired'
+
+    # How long to wait for other sessions to release the tables, before retrying
+    lock_timeout = '2s'
+    lock_attempts = 10
+
+    def qualified_name(self, schema: str, table: str) -> str:
+        return f'{self.quote_name(schema)}.{self.quote_name(table)}'
+
+    @contextmanager
+    def loading(self) -> Iterator[None]:
+        """Create the shadow tables, and have queries use them for the duration"""
+        self.create()
+
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT current_setting(%s)', ('search_path',))
+            search_path, = cursor.fetchone()
+            cursor.execute('SELECT set_config(%s, %s, true)',
+                           ('search_path', f'{self.quote_name(self.schema)}, {search_path}'))
+
+        yield
+
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT set_config(%s, %s, true)', ('search_path', search_path))
+
+    def inspect(self) -> None:
+        super().inspect()
+
+        # NOTE: retiring a table drops any foreign keys referencing it, so we refuse
+        #       to swap a table referenced by another which isn't being swapped.
+        for definition in self.definitions:
+            if referencing := [name for name in definition.referenced_by if name not in self.tables]:
+                raise ValueError(f'Unable to swap {definition.name}, as it is referenced by '
+                                 f'{", ".join(referencing)}, which is not being swapped')
+
+    def create(self) -> None:
+        """Create empty shadow tables, with their primary keys and triggers"""
+        self.inspect()
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {self.quote_name(self.schema)}')
+
+            for definition in self.definitions:
+                table = self.qualified_name(definition.schema, definition.name)
+                shadow_table = self.qualified_name(self.schema, definition.name)
+
+                cursor.execute(f'CREATE TABLE {shadow_table} (LIKE {table} INCLUDING ALL EXCLUDING INDEXES)')
+
+                # NOTE: primary keys are needed during the load, for ON CONFLICT and bulk updates
+                for name, constraint_def in definition.unique_constraints:
+                    cursor.execute(f'ALTER TABLE {shadow_table} '
+                                   f'ADD CONSTRAINT {self.quote_name(name)} {constraint_def}')
+
+                for trigger_def in definition.triggers:
+                    cursor.execute(self.retarget(trigger_def, definition))
+
+    def build(self) -> None:
+        """Build the shadow tables' indexes and foreign keys, and gather their statistics
+
+        NOTE: this must be called while the shadow schema leads the search_path,
+              so foreign keys reference the other shadow tables.
+        """
+        self.build_indexes()
+        self.add_foreign_keys()
+        self.analyze()
+
+    def swap(self) -> None:
+        """Replace the real tables with their shadows, dropping the real tables"""
+        self.lock()
+
+        retired_schema = self.quote_name(self.retired_schema)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {retired_schema}')
+
+            # NOTE: sequences must live in the same schema as the table owning them,
+            #       so they're disowned while tables move, then owned by the shadows.
+            for definition in self.definitions:
+                for sequence, _ in definition.sequences:
+                    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+
+            for definition in self.definitions:
+                table = self.qualified_name(definition.schema, definition.name)
+                cursor.execute(f'ALTER TABLE {table} SET SCHEMA {retired_schema}')
+
+            for definition in self.definitions:
+                shadow_table = self.qualified_name(self.schema, definition.name)
+                cursor.execute(f'ALTER TABLE {shadow_table} SET SCHEMA {self.quote_name(definition.schema)}')
+
+            for definition in self.definitions:
+                table = self.qualified_name(definition.schema, definition.name)
+                for sequence, column in definition.sequences:
+                    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.{self.quote_name(column)}')
+
+            cursor.execute(f'DROP SCHEMA {retired_schema} CASCADE')
+            cursor.execute(f'DROP SCHEMA {self.quote_name(self.schema)}')
+
+    def lock(self) -> None:
+        """Lock the real tables exclusively, waiting for any queries reading them
+
+        While we wait for the lock, other queries on the tables queue up behind
+        us, so rather than wait indefinitely, we give up and retry periodically.
+        """
+        tables = ', '.join(
+            self.qualified_name(definition.schema, definition.name)
+            for definition in self.definitions
+        )
+
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT current_setting(%s)', ('lock_timeout',))
+            lock_timeout, = cursor.fetchone()
+
+        for attempt in range(1, self.lock_attempts + 1):
+            try:
+                with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+                    cursor.execute('SELECT set_config(%s, %s, true)', ('lock_timeout', self.lock_timeout))
+                    cursor.execute(f'LOCK TABLE {tables} IN ACCESS EXCLUSIVE MODE')
+                    cursor.execute('SELECT set_config(%s, %s, true)', ('lock_timeout', lock_timeout))
+            except OperationalError:
+                if attempt == self.lock_attempts:
+                    raise
+            else:
+                break
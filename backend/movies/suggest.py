@@ -0,0 +1,230 @@
+"""In-memory title prefix index, for suggesting movies as the user types
+
+Searching the database for every keystroke is costly, so suggestions are
+served from an index of all titles' words, held in each process's memory.
+
+The index is built from a snapshot of all movies' titles, written to disk
+(by load_dataset, or whichever process first needs the index). Processes
+reload the index whenever the snapshot file changes.
+"""
+import bisect
+import itertools
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from django.conf import settings
+
+__all__ = [
+    'Suggestion',
+    'TitlePrefixIndex',
+    'get_title_index',
+    'normalize_words',
+    'write_title_snapshot',
+]
+
+
+class Suggestion(NamedTuple):
+    id: int
+    title: str
+    year: Optional[int]
+
+
+# (id, title, year, number of ratings)
+SnapshotRow = tuple[int, str, Optional[int], int]
+
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_words(text: str) -> list[str]:
+    """Split text into case-insensitive words
+
+    >>> normalize_words("Alfred Hitchcock's The Byrds: A Biopic")
+    ['alfred', 'hitchcock', 's', 'the', 'byrds', 'a', 'biopic']
+    """
+    return WORD_RE.findall(text.casefold())
+
+
+class TitlePrefixIndex:
+    """Find the most-rated movies with title words starting with some prefixes
+
+    Every (word, movie) pair is kept in one sorted array, so all the words
+    starting with a prefix form a contiguous range, found by binary search.
+
+    Because short prefixes (e.g. "t") span a large portion of the array, every
+    movie matching each prefix up to `precomputed_prefix_length` letters long
+    is listed up front, most-rated first.
+
+    >>> index = TitlePrefixIndex([
+    ...     (1, 'Toy Story', 1995, 50),
+    ...     (2, 'Star Wars', 1977, 100),
+    ...     (3, 'Toy Soldiers', 1991, 10),
+    ... ])
+    >>> index.suggest('to')
+    [Suggestion(id=1, title='Toy Story', year=1995), Suggestion(id=3, title='Toy Soldiers', year=1991)]
+    >>> index.suggest('s')
+    [Suggestion(id=2, title='Star Wars', year=1977), Suggestion(id=1, title='Toy Story', year=1995), Suggestion(id=3, title='Toy Soldiers', year=1991)]
+    >>> index.suggest('toy s', limit=1)
+    [Suggestion(id=1, title='Toy Story', year=1995)]
+    >>> index.suggest('wars star')
+    [Suggestion(id=2, title='Star Wars', year=1977)]
+    >>> index.suggest('toy soldiers')
+    [Suggestion(id=3, title='Toy Soldiers', year=1991)]
+    >>> index.suggest('muffin')
+    []
+    """
+
+    def __init__(self,
+                 movies: Iterable[SnapshotRow],
+                 *,
+                 max_limit: int = 50,
+                 precomputed_prefix_length: int = 3,
+                 ):
+        self.max_limit = max_limit
+        self.precomputed_prefix_length = precomputed_prefix_length
+
+        self.suggestions: dict[int, Suggestion] = {}
+        self.title_words: dict[int, list[str]] = {}
+
+        # Movies are ranked by most ratings first, with ties broken by id
+        ranks: dict[int, tuple[int, int]] = {}
+
+        for movie_id, title, year, num_ratings in movies:
+            self.suggestions[movie_id] = Suggestion(movie_id, title, year)
+            self.title_words[movie_id] = normalize_words(title)
+            ranks[movie_id] = (-num_ratings, movie_id)
+
+        ranked_movie_ids = sorted(ranks, key=ranks.__getitem__)
+        self.rank_positions = {movie_id: i for i, movie_id in enumerate(ranked_movie_ids)}
+
+        # (word, rank position), sorted by word, then rank
+        entries = sorted({
+            (word, self.rank_positions[movie_id])
+            for movie_id, words in self.title_words.items()
+            for word in words
+        })
+        self.words = [word for word, position in entries]
+        self.positions = [position for word, position in entries]
+        self.ranked_movie_ids = ranked_movie_ids
+
+        # Because movies are visited most-rated first, each list is ranked
+        self.precomputed: dict[str, list[int]] = {}
+        for movie_id in ranked_movie_ids:
+            prefixes = {
+                word[:length]
+                for word in self.title_words[movie_id]
+                for length in range(1, min(len(word), precomputed_prefix_length) + 1)
+            }
+            for prefix in prefixes:
+                self.precomputed.setdefault(prefix, []).append(movie_id)
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def _prefix_range(self, prefix: str) -> range:
+        start = bisect.bisect_left(self.words, prefix)
+        # The first string sorting after every word starting with the prefix
+        successor = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        end = bisect.bisect_left(self.words, successor, lo=start)
+        return range(start, end)
+
+    def _num_candidates(self, prefix: str) -> int:
+        if (movie_ids := self.precomputed.get(prefix)) is not None:
+            return len(movie_ids)
+        return len(self._prefix_range(prefix))
+
+    def _iter_ranked_movie_ids(self, prefix: str) -> Iterator[int]:
+        """Yield the movies with a title word starting with the prefix, most-rated first"""
+        if (movie_ids := self.precomputed.get(prefix)) is not None:
+            yield from movie_ids
+        else:
+            # Words longer than the precomputed prefixes are rare enough to sort on demand
+            positions = sorted({self.positions[i] for i in self._prefix_range(prefix)})
+            yield from (self.ranked_movie_ids[position] for position in positions)
+
+    def suggest(self, query: str, limit: int = 10) -> list[Suggestion]:
+        """Return the most-rated movies with title words starting with each query word"""
+        prefixes = normalize_words(query)
+        if not prefixes:
+            return []
+
+        limit = min(limit, self.max_limit)
+
+        # We walk the movies matching the rarest prefix, checking whether they
+        # match the others, until enough are found.
+        rarest, *others = sorted(prefixes, key=self._num_candidates)
+
+        def matches_others(movie_id: int) -> bool:
+            words = self.title_words[movie_id]
+            return all(any(word.startswith(other) for word in words) for other in others)
+
+        matches = filter(matches_others, self._iter_ranked_movie_ids(rarest))
+        return [self.suggestions[movie_id] for movie_id in itertools.islice(matches, limit)]
+
+
+def get_snapshot_path() -> Path:
+    return Path(settings.MOVIES_SUGGEST_SNAPSHOT_PATH)
+
+
+def read_title_rows() -> list[SnapshotRow]:
+    from movies.models import Movie
+    return list(Movie.objects.values_list('id', 'title', 'year', 'rating_count'))
+
+
+def write_title_snapshot(rows: Optional[list[SnapshotRow]] = None) -> Path:
+    """Snapshot all movies' titles to disk, causing processes to reload their title index"""
+    if rows is None:
+        rows = read_title_rows()
+
+    path = get_snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # NOTE: the snapshot is written to a temporary file and moved into place, so
+    #       other processes never read a partially-written snapshot.
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
+        json.dump(rows, fp, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+_index: Optional[TitlePrefixIndex] = None
+_index_key: Optional[tuple] = None
+_index_lock = threading.Lock()
+
+
+def get_title_index() -> TitlePrefixIndex:
+    """Return this process's title index, loading it if the snapshot has changed"""
+    global _index, _index_key
+
+    path = get_snapshot_path()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        stat = None
+
+    key = (str(path), stat.st_mtime_ns, stat.st_size) if stat else None
+    if _index is not None and key == _index_key:
+        return _index
+
+    with _index_lock:
+        # Another thread may have loaded the index while we waited for the lock
+        if _index is not None and key == _index_key:
+            return _index
+
+        if stat is None:
+            rows = read_title_rows()
+            write_title_snapshot(rows)
+            stat = path.stat()
+            key = (str(path), stat.st_mtime_ns, stat.st_size)
+        else:
+            with open(path, encoding='utf-8') as fp:
+                rows = json.load(fp)
+
+        _index = TitlePrefixIndex(rows)
+        _index_key = key
+        return _index
@@ -0,0 +1,18 @@
+"""The URLs served over ASGI (see movies.asgi)
+
+These are the same as movies.urls, except that the movies API's views are
+async, running their database work in the database pool (see movies.db_pool).
+"""
+from django.contrib import admin
+from django.urls import include, path, re_path
+
+from movies.urls import router
+from movies.views.pooled import pooled_view
+
+urlpatterns = [
+    path('api/', include([
+        re_path(str(url.pattern), pooled_view(url.callback), url.default_args, url.name)
+        for url in router.urls
+    ])),
+    path('admin/', admin.site.urls),
+]
@@ -1,8 +1,25 @@
+import hashlib
+from typing import Any, Iterable
+
 import rest_framework_filters as filters
-from rest_framework import pagination, serializers, viewsets
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework_filters.backends import RestFrameworkFilterBackend
 
+from movies.caching import DatasetVersionCacheMixin, get_dataset_version
 from movies.models import Movie
+from movies.pagination import (
+    EstimatedCountPageNumberPagination,
+    KeysetPagination,
+    get_keyset_ordering,
+)
 from movies.search import parse_search_query
+from movies.suggest import get_title_index
 
 
 class MovieSerializer(serializers.ModelSerializer):
@@ -24,21 +41,158 @@ class MovieSerializer(serializers.ModelSerializer):
     genres = serializers.ReadOnlyField(source='genre_names')
 
 
+# Fields (and annotations) of MovieViewSet's queryset needed to represent movies
+# as MovieSerializer does, with serialize_movie_rows
+MOVIE_ROW_FIELDS = (
+    'id',
+    'title',
+    'year',
+    'genre_names',
+    'avg_rating',
+    'num_ratings',
+    'imdb_id',
+    'tmdb_id',
+)
+
+
+def serialize_movie_rows(rows: Iterable[Any]) -> list[dict[str, Any]]:
+    """Represent rows of MOVIE_ROW_FIELDS (e.g. from values_list(named=True)) as MovieSerializer would
+
+    This skips instantiating models, and MovieSerializer's per-field machinery,
+    which dominate the cost of listing movies.
+    """
+    imdb_url_format = Movie.IMDB_URL_FORMAT.format
+    tmdb_url_format = Movie.TMDB_URL_FORMAT.format
+    return [
+        {
+            'id': row.id,
+            'title': row.title,
+            'year': row.year,
+            'genres': row.genre_names,
+            'avg_rating': row.avg_rating,
+            'num_ratings': row.num_ratings,
+            'imdb_url': imdb_url_format(row.imdb_id) if row.imdb_id else None,
+            'tmdb_url': tmdb_url_format(row.tmdb_id) if row.tmdb_id else None,
+        }
+        for row in rows
+    ]
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """Filter by a comma-separated list of strings"""
+
+
 class MovieFilters(filters.FilterSet):
     class Meta:
         model = Movie
-        fields = {}
+        fields = {
+            'year': ['exact', 'gte', 'lte'],
+            'avg_rating': ['gte', 'lte'],
+        }
 
     q = filters.CharFilter(method='filter_search')
 
+    # Movies with at least this many ratings
+    min_ratings = filters.NumberFilter(field_name='rating_count', lookup_expr='gte')
+
+    # Comma-separated genre names, of which movies must have any (or all)
+    genre = CharInFilter(method='filter_genres')
+    genre__all = CharInFilter(method='filter_genres')
+
+    def filter_genres(self, qs, name, value):
+        if not value:
+            return qs
+        return qs.filter_genres(value, match='all' if name.endswith('__all') else 'any')
+
     def filter_search(self, qs, name, value):
         if not value:
             return qs
 
-        return qs.search(parse_search_query(value), search_type='raw')
+        matches = qs.search(parse_search_query(value), search_type='raw')
+        if self.has_matches(matches):
+            return matches
+
+        # If nothing matches exactly, the user may have made a typo
+        return qs.fuzzy_search(value).order_by('-title_similarity', 'id')
+
+    def has_matches(self, qs) -> bool:
+        """Return whether any movies match, caching the answer per dataset version
+
+        Paging through a search, and counting its facets, filter by the same
+        query, so this spares them all but the first check.
+        """
+        if self.request is None:
+            return qs.exists()
+
+        # NOTE: annotations (e.g. genre names) are left out, so that listing
+        #       and counting facets share the same key.
+        sql, params = qs.order_by().values('pk').query.sql_with_params()
+        query_hash = hashlib.md5(repr((sql, params)).encode('utf-8')).hexdigest()
+        dataset_version = get_dataset_version(self.request)
+        cache_key = f'movies:has-matches:{dataset_version.version}:{query_hash}'
+
+        if (cached := cache.get(cache_key)) is not None:
+            return cached
+
+        result = qs.exists()
+        cache.set(cache_key, result, timeout=settings.MOVIES_COUNT_CACHE_TTL)
+        return result
+
+
+class MovieOrderingFilter(OrderingFilter):
+    """OrderingFilter which may also order by relevance to the search query
+
+    Relevance orderings always place the most relevant movies first, and are
+    ignored if there is no search query.
+    """
+
+    search_param = 'q'
+
+    # Relevance ordering name -> whether relevance is weighted by rating count
+    relevance_orderings = {
+        'relevance': False,
+        'weighted_relevance': True,
+    }
+
+    def get_valid_fields(self, queryset, view, context={}):
+        valid_fields = super().get_valid_fields(queryset, view, context)
+        return [*valid_fields, *((name, name) for name in self.relevance_orderings)]
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
 
+        query = request.query_params.get(self.search_param)
 
-class MovieViewSet(viewsets.ReadOnlyModelViewSet):
+        resolved_ordering = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if name not in self.relevance_orderings:
+                resolved_ordering.append(field)
+                continue
+
+            if not query:
+                continue
+
+            queryset = queryset.annotate_relevance(
+                parse_search_query(query),
+                search_type='raw',
+                name=name,
+                weighted=self.relevance_orderings[name],
+                max_candidates=settings.MOVIES_RELEVANCE_MAX_CANDIDATES or None,
+            )
+            # NOTE: ordering by rating count keeps any unranked candidates
+            #       (see MovieQuerySet.annotate_relevance) after ranked ones.
+            resolved_ordering += [f'-{name}', '-rating_count']
+
+        if resolved_ordering:
+            return queryset.order_by(*resolved_ordering)
+        else:
+            return queryset
+
+
+class MovieViewSet(DatasetVersionCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = (
         Movie.objects.all()
             .annotate_ratings()
@@ -46,5 +200,99 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
             .order_by('id')
     )
     serializer_class = MovieSerializer
+    filter_backends = (RestFrameworkFilterBackend, MovieOrderingFilter)
     filterset_class = MovieFilters
-    pagination_class = pagination.PageNumberPagination
+    # NOTE: all but title are backed by B-tree indexes (see Movie.Meta.indexes)
+    ordering_fields = ('id', 'title', 'year', 'avg_rating', 'num_ratings', 'weighted_rating')
+    pagination_class = EstimatedCountPageNumberPagination
+
+    # Query params filtering by conditions the planner can't estimate (e.g. tests
+    # of genre masks, see MovieQuerySet.filter_genres), whose counts are always exact
+    exact_count_query_params = ('genre', 'genre__all')
+
+    # Opt-in alternative to pagination_class, used when a cursor is passed (even an empty one)
+    keyset_pagination_class = KeysetPagination
+
+    suggest_default_limit = 10
+    suggest_max_limit = 50
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            cursor_query_param = self.keyset_pagination_class.cursor_query_param
+            if self.request is not None and cursor_query_param in self.request.query_params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def has_unestimable_filters(self, queryset) -> bool:
+        """Return whether the planner can't estimate the filtered queryset's count
+
+        See EstimatedCountPageNumberPagination.
+        """
+        if any(self.request.query_params.get(param) for param in self.exact_count_query_params):
+            return True
+
+        # Searches falling back to fuzzy search (see MovieFilters.filter_search)
+        # test trigram similarity, whose selectivity the planner can only guess
+        return 'title_similarity' in queryset.query.annotations
+
+    def list(self, request, *args, **kwargs):
+        # NOTE: this replaces ListModelMixin.list, not DatasetVersionCacheMixin.list
+        return self.get_dataset_version_cached_response(self.list_rows, request, *args, **kwargs)
+
+    def list_rows(self, request, *args, **kwargs):
+        """List movies from value rows, rather than model instances and MovieSerializer
+
+        The response is identical to ListModelMixin.list's.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values_list(*self.get_row_fields(queryset), named=True)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_movie_rows(page))
+
+        return Response(serialize_movie_rows(rows))
+
+    def get_row_fields(self, queryset) -> tuple[str, ...]:
+        fields = MOVIE_ROW_FIELDS
+
+        # Keyset pagination reads the position of the last row from its ordering fields
+        if isinstance(self.paginator, KeysetPagination):
+            fields += tuple(
+                field
+                for field, is_descending in get_keyset_ordering(queryset)
+                if field not in fields
+            )
+
+        return fields
+
+    @action(detail=False, filter_backends=(RestFrameworkFilterBackend,), pagination_class=None)
+    def facets(self, request, *args, **kwargs):
+        """Count the movies of each genre, among those the same filters would list"""
+        return self.get_dataset_version_cached_response(self.count_facets, request, *args, **kwargs)
+
+    def count_facets(self, request, *args, **kwargs):
+        # NOTE: the listing's annotations would only slow down counting
+        queryset = self.filter_queryset(Movie.objects.all())
+        return Response({
+            'genres': queryset.count_genres(),
+        })
+
+    @action(detail=False, filter_backends=(), pagination_class=None)
+    def suggest(self, request):
+        """Suggest the most-rated movies with title words starting with each word typed
+
+        Suggestions are served from an in-memory index, not the database.
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = _positive_int(request.query_params['limit'], strict=True,
+                                  cutoff=self.suggest_max_limit)
+        except (KeyError, ValueError):
+            limit = self.suggest_default_limit
+
+        suggestions = get_title_index().suggest(query, limit=limit)
+        return Response([suggestion._asdict() for suggestion in suggestions])
@@ -0,0 +1,28 @@
+from functools import wraps
+
+from movies.db_pool import get_db_pool
+
+__all__ = ['pooled_view']
+
+
+def pooled_view(view):
+    """Wrap a sync view as an async view, which runs it in the database pool
+
+    The view's response is rendered within the pool, too, as rendering (and
+    any post-render callbacks, e.g. caching it) may also query the database.
+    If the async view is cancelled (e.g. as its client disconnected), so is
+    whatever query the view has in flight.
+    """
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await get_db_pool().run(render_view, view, request, *args, **kwargs)
+
+    return async_view
+
+
+def render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
@@ -1,6 +1,6 @@
 #!/bin/bash
 
 python manage.py migrate
-python manage.py load_dataset --no-verify
+python manage.py load_dataset --no-verify --swap
 
-exec gunicorn -b 0.0.0.0:$PORT movies.wsgi:application
+exec gunicorn -c python:movies.gunicorn_conf
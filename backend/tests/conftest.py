@@ -0,0 +1,79 @@
+import threading
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Ensure nothing cached by one test (e.g. result counts) leaks into another"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def suggest_snapshot_path(settings, tmp_path):
+    """Ensure each test's suggestions are built from its own movies"""
+    settings.MOVIES_SUGGEST_SNAPSHOT_PATH = str(tmp_path / 'suggest-snapshot.json')
+
+
+class StandInRequestHandler(SimpleHTTPRequestHandler):
+    """Serves files, with ETags, recording the status of each response"""
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        if path.is_file():
+            stat = path.stat()
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                return None
+            self._etag = etag
+
+        return super().send_head()
+
+    def end_headers(self):
+        if etag := getattr(self, '_etag', None):
+            self.send_header('ETag', etag)
+        super().end_headers()
+
+    def send_response(self, code, message=None):
+        self.server.statuses.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server_root(tmp_path) -> Path:
+    root = tmp_path / 'www'
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def http_server(http_server_root):
+    """A local HTTP server, standing in for a remote one, serving http_server_root
+
+    Its URL is available as `http_server.url`, and the status of every response
+    sent as `http_server.statuses`.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                 partial(StandInRequestHandler, directory=str(http_server_root)))
+    server.statuses = []
+    server.url = f'http://127.0.0.1:{server.server_port}'
+
+    thread = threading.Thread(target=partial(server.serve_forever, poll_interval=0.01), daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,412 @@
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import ProgrammingError, connection, transaction
+from pytest_lambda import lambda_fixture
+
+from movies.management.commands.load_dataset import disabled_triggers, merge_links
+from movies.models import DatasetFingerprint, DatasetVersion, Movie, Rating, Tag, User
+
+DATASET_CSVS = {
+    'movies.csv': (
+        'movieId,title,genres\n'
+        '1,Toy Story (1995),Adventure|Animation\n'
+        '2,"Crouching Tiger, Hidden Dragon (2000)",Action|Drama\n'
+    ),
+    'links.csv': (
+        'movieId,imdbId,tmdbId\n'
+        '1,0114709,862\n'
+        '2,0190332,146\n'
+    ),
+    'ratings.csv': (
+        'userId,movieId,rating,timestamp\n'
+        '1,1,4.0,964982703\n'
+        '1,2,3.5,964981247\n'
+        '2,1,5.0,964982224\n'
+    ),
+    'tags.csv': (
+        'userId,movieId,tag,timestamp\n'
+        '3,2,"wire work, ""wuxia""",1445714994\n'
+        '3,1,,1445714996\n'
+    ),
+}
+
+# The dataset, with a movie and link changed, and a movie, ratings, and a tag added
+CHANGED_DATASET_CSVS = {
+    'movies.csv': (
+        'movieId,title,genres\n'
+        '1,Toy Story (1995),Adventure|Animation\n'
+        '2,"Crouching Tiger, Hidden Dragon (2001)",Action|Drama|Romance\n'
+        '3,Hero (2002),Action\n'
+    ),
+    'links.csv': (
+        'movieId,imdbId,tmdbId\n'
+        '1,0114709,862\n'
+        '2,0190332,147\n'
+        '3,0299977,79\n'
+    ),
+    'ratings.csv': (
+        'userId,movieId,rating,timestamp\n'
+        '1,1,4.0,964982703\n'
+        '1,2,3.5,964981247\n'
+        '2,1,5.0,964982224\n'
+        '3,3,4.5,964982703\n'
+        '2,2,2.0,1000000000\n'
+    ),
+    'tags.csv': (
+        'userId,movieId,tag,timestamp\n'
+        '3,2,"wire work, ""wuxia""",1445714994\n'
+        '3,1,,1445714996\n'
+        '4,3,martial arts,1445714999\n'
+    ),
+}
+
+
+def get_loaded_rows() -> tuple[list[tuple], list[tuple], list[tuple]]:
+    """Return the rating stats of each movie, and all ratings and tags"""
+    return (
+        list(Movie.objects.order_by('id').values_list('id', 'rating_count', 'rating_sum')),
+        list(Rating.objects.order_by('user', 'movie').values_list('user', 'movie', 'rating')),
+        list(Tag.objects.order_by('user', 'movie').values_list('user', 'movie', 'name')),
+    )
+
+
+def get_genre_masks() -> list[tuple[int, int, int]]:
+    """Return each movie's ID, stored genre mask, and the mask expected of its genres"""
+    return [
+        (movie.id, movie.genre_mask, sum(1 << genre.bit for genre in movie.genres.all()))
+        for movie in Movie.objects.prefetch_related('genres').order_by('id')
+    ]
+
+
+def write_dataset(path: Path, csvs: dict[str, str]) -> None:
+    with ZipFile(path, 'w') as zipf:
+        for name, content in csvs.items():
+            zipf.writestr(f'ml-test/{name}', content)
+
+
+@pytest.mark.django_db
+class DescribeDisabledTriggers:
+    def it_raises_errors_from_its_body(self):
+        with pytest.raises(ProgrammingError):
+            with transaction.atomic(), disabled_triggers(Rating):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT * FROM movies_nonexistent')
+
+
+class DescribeMergeLinks:
+    def it_does_not_read_ahead_past_movies_without_links(self):
+        links_read = []
+
+        def iter_links():
+            for movie_id in range(2, 1_000):
+                links_read.append(movie_id)
+                yield str(movie_id), f'{movie_id:07}', str(movie_id)
+
+        movies = merge_links([Movie(id=1), Movie(id=2)], iter_links())
+
+        expected = ([(1, None), (2, '0000002')], [2])
+        actual = ([(movie.id, movie.imdb_id) for movie in movies], links_read)
+        assert expected == actual
+
+
+@pytest.mark.django_db
+class DescribeLoadDataset:
+    dataset_path = lambda_fixture(lambda tmp_path: tmp_path / 'ml-test.zip')
+
+    @pytest.fixture(autouse=True)
+    def dataset(self, dataset_path: Path):
+        write_dataset(dataset_path, DATASET_CSVS)
+
+    @pytest.fixture(params=[
+        pytest.param({'engine': 'orm'}, id='orm'),
+        pytest.param({'engine': 'copy'}, id='copy'),
+        # NOTE: workers stage rows on their own connections, so they must be committed
+        pytest.param({'engine': 'copy', 'workers': 2}, id='copy-parallel',
+                     marks=pytest.mark.django_db(transaction=True)),
+        pytest.param({'engine': 'copy', 'swap': True}, id='copy-swap'),
+        pytest.param({'engine': 'copy', 'defer_indexes': True}, id='copy-deferred'),
+        pytest.param({'engine': 'orm', 'defer_indexes': True}, id='orm-deferred'),
+    ])
+    def load_options(self, request):
+        return request.param
+
+    source = lambda_fixture(lambda dataset_path: str(dataset_path))
+
+    @pytest.fixture
+    def load(self, source, load_options):
+        call_command('load_dataset', source, **load_options, stdout=None)
+
+    def it_loads_movies(self, load):
+        expected = [
+            (1, 'Toy Story', 1995, '0114709', 2, 9.0, ['Adventure', 'Animation']),
+            (2, 'Crouching Tiger, Hidden Dragon', 2000, '0190332', 1, 3.5, ['Action', 'Drama']),
+        ]
+        actual = [
+            (movie.id, movie.title, movie.year, movie.imdb_id, movie.rating_count, movie.rating_sum,
+             movie.genre_names)
+            for movie in Movie.objects.annotate_genre_names().order_by('id')
+        ]
+        assert expected == actual
+
+    def it_refreshes_genre_masks(self, load):
+        masks = get_genre_masks()
+
+        expected = [(movie_id, expected_mask) for movie_id, _, expected_mask in masks]
+        actual = [(movie_id, genre_mask) for movie_id, genre_mask, _ in masks]
+        assert expected == actual
+        assert all(genre_mask for _, genre_mask, _ in masks)
+
+    def it_loads_ratings(self, load):
+        expected = [(1, 1, 4.0), (1, 2, 3.5), (2, 1, 5.0)]
+        actual = list(Rating.objects.order_by('user', 'movie').values_list('user', 'movie', 'rating'))
+        assert expected == actual
+
+    def it_loads_rating_timestamps(self, load):
+        expected = [
+            datetime(2000, 7, 30, 18, 45, 3, tzinfo=timezone.utc),
+            datetime(2000, 7, 30, 18, 20, 47, tzinfo=timezone.utc),
+            datetime(2000, 7, 30, 18, 37, 4, tzinfo=timezone.utc),
+        ]
+        actual = list(Rating.objects.order_by('user', 'movie').values_list('timestamp', flat=True))
+        assert expected == actual
+
+    def it_loads_tags(self, load):
+        expected = [(3, 1, ''), (3, 2, 'wire work, "wuxia"')]
+        actual = list(Tag.objects.order_by('movie').values_list('user', 'movie', 'name'))
+        assert expected == actual
+
+    def it_loads_users(self, load):
+        expected = [1, 2, 3]
+        actual = list(User.objects.order_by('id').values_list('id', flat=True))
+        assert expected == actual
+
+
+    class CaseUnchanged:
+        def it_does_nothing(self, load, source, load_options):
+            version = DatasetVersion.objects.get_current().version
+            stdout = StringIO()
+            call_command('load_dataset', source, **load_options, stdout=stdout)
+
+            expected = (version, 'Dataset unchanged since last load; nothing to do\n')
+            actual = (DatasetVersion.objects.get_current().version, stdout.getvalue())
+            assert expected == actual
+
+
+    class CaseChanged:
+        @pytest.fixture
+        def reload(self, load, dataset_path, source, load_options):
+            write_dataset(dataset_path, CHANGED_DATASET_CSVS)
+            call_command('load_dataset', source, **load_options, stdout=None)
+
+        def it_upserts_movies(self, reload):
+            expected = [
+                (1, 'Toy Story', 1995, '0114709', '862', 2, 9.0, ['Adventure', 'Animation']),
+                (2, 'Crouching Tiger, Hidden Dragon', 2001, '0190332', '147', 2, 5.5,
+                 ['Action', 'Drama', 'Romance']),
+                (3, 'Hero', 2002, '0299977', '79', 1, 4.5, ['Action']),
+            ]
+            actual = [
+                (movie.id, movie.title, movie.year, movie.imdb_id, movie.tmdb_id, movie.rating_count,
+                 movie.rating_sum, movie.genre_names)
+                for movie in Movie.objects.annotate_genre_names().order_by('id')
+            ]
+            assert expected == actual
+
+        def it_updates_genre_masks(self, reload):
+            masks = get_genre_masks()
+
+            expected = [(movie_id, expected_mask) for movie_id, _, expected_mask in masks]
+            actual = [(movie_id, genre_mask) for movie_id, genre_mask, _ in masks]
+            assert expected == actual
+
+        def it_appends_ratings_from_watermark(self, reload):
+            expected = [(1, 1, 4.0), (1, 2, 3.5), (2, 1, 5.0), (2, 2, 2.0), (3, 3, 4.5)]
+            actual = list(Rating.objects.order_by('user', 'movie').values_list('user', 'movie', 'rating'))
+            assert expected == actual
+
+        def it_appends_tags_from_watermark(self, reload):
+            expected = [(3, 1, ''), (3, 2, 'wire work, "wuxia"'), (4, 3, 'martial arts')]
+            actual = list(Tag.objects.order_by('movie').values_list('user', 'movie', 'name'))
+            assert expected == actual
+
+        def it_adds_users(self, reload):
+            expected = [1, 2, 3, 4]
+            actual = list(User.objects.order_by('id').values_list('id', flat=True))
+            assert expected == actual
+
+        def it_updates_movies_with_case_per_row_only_without_copy(self, load, dataset_path, source,
+                                                                  load_options):
+            write_dataset(dataset_path, CHANGED_DATASET_CSVS)
+
+            # NOTE: CaptureQueriesContext's cursor wrapper doesn't pass through COPY's arguments
+            queries = []
+
+            def record_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record_query):
+                call_command('load_dataset', source, **load_options, stdout=None)
+
+            expected = load_options['engine'] == 'orm'
+            actual = any('CASE WHEN' in sql for sql in queries)
+            assert expected == actual
+
+        def it_warns_of_options_only_used_when_loading_whole_dataset(self, load, dataset_path, source,
+                                                                      load_options):
+            write_dataset(dataset_path, CHANGED_DATASET_CSVS)
+            stdout = StringIO()
+            call_command('load_dataset', source, **load_options, stdout=stdout)
+
+            expected = bool(load_options.get('swap') or load_options.get('defer_indexes'))
+            actual = 'only used when loading the whole dataset' in stdout.getvalue()
+            assert expected == actual
+
+        def it_records_fingerprint(self, reload, source):
+            expected = (
+                source,
+                {'genres': 5, 'movies': 3, 'users': 4, 'ratings': 5, 'tags': 3},
+                datetime(2001, 9, 9, 1, 46, 40, tzinfo=timezone.utc),
+            )
+            fingerprint = DatasetFingerprint.objects.get_latest()
+            actual = (fingerprint.source, fingerprint.row_counts, fingerprint.ratings_watermark)
+            assert expected == actual
+
+
+    class CaseChangedOtherThanByAppending:
+        @pytest.fixture(params=[
+            pytest.param((
+                {
+                    'ratings.csv': (
+                        'userId,movieId,rating,timestamp\n'
+                        '1,1,4.0,964982703\n'
+                        '2,1,5.0,964982224\n'
+                        '1,2,1.0,1000000000\n'
+                    ),
+                },
+                (
+                    [(1, 2, 9.0), (2, 1, 1.0)],
+                    [(1, 1, 4.0), (1, 2, 1.0), (2, 1, 5.0)],
+                    [(3, 1, ''), (3, 2, 'wire work, "wuxia"')],
+                ),
+            ), id='rerated'),
+            pytest.param((
+                {
+                    'ratings.csv': DATASET_CSVS['ratings.csv'] + '3,1,3.0,900000000\n',
+                },
+                (
+                    [(1, 3, 12.0), (2, 1, 3.5)],
+                    [(1, 1, 4.0), (1, 2, 3.5), (2, 1, 5.0), (3, 1, 3.0)],
+                    [(3, 1, ''), (3, 2, 'wire work, "wuxia"')],
+                ),
+            ), id='rated-before-watermark'),
+            pytest.param((
+                {
+                    'tags.csv': (
+                        'userId,movieId,tag,timestamp\n'
+                        '3,2,"wire work, ""wuxia""",1445714994\n'
+                    ),
+                },
+                (
+                    [(1, 2, 9.0), (2, 1, 3.5)],
+                    [(1, 1, 4.0), (1, 2, 3.5), (2, 1, 5.0)],
+                    [(3, 2, 'wire work, "wuxia"')],
+                ),
+            ), id='tag-removed'),
+            pytest.param((
+                {
+                    'movies.csv': (
+                        'movieId,title,genres\n'
+                        '1,Toy Story (1995),Adventure|Animation\n'
+                    ),
+                    'links.csv': (
+                        'movieId,imdbId,tmdbId\n'
+                        '1,0114709,862\n'
+                    ),
+                    'ratings.csv': (
+                        'userId,movieId,rating,timestamp\n'
+                        '1,1,4.0,964982703\n'
+                        '2,1,5.0,964982224\n'
+                    ),
+                    'tags.csv': (
+                        'userId,movieId,tag,timestamp\n'
+                        '3,1,,1445714996\n'
+                    ),
+                },
+                (
+                    [(1, 2, 9.0)],
+                    [(1, 1, 4.0), (2, 1, 5.0)],
+                    [(3, 1, '')],
+                ),
+            ), id='movie-removed'),
+        ])
+        def change(self, request):
+            changed_csvs, expected_rows = request.param
+            return {**DATASET_CSVS, **changed_csvs}, expected_rows
+
+        changed_csvs = lambda_fixture(lambda change: change[0])
+        expected_rows = lambda_fixture(lambda change: change[1])
+
+        @pytest.fixture
+        def reload(self, load, dataset_path, source, load_options, changed_csvs):
+            write_dataset(dataset_path, changed_csvs)
+            stdout = StringIO()
+            call_command('load_dataset', source, **load_options, stdout=stdout)
+            return stdout.getvalue()
+
+        def it_loads_whole_dataset(self, reload, expected_rows):
+            expected = (True, expected_rows)
+            actual = ('loading the whole dataset' in reload, get_loaded_rows())
+            assert expected == actual
+
+        def it_refuses_to_load_whole_dataset_without_truncating(self, load, dataset_path, source,
+                                                                load_options, changed_csvs):
+            write_dataset(dataset_path, changed_csvs)
+
+            with pytest.raises(CommandError, match='--no-truncate'):
+                call_command('load_dataset', source, **load_options, truncate=False, stdout=None)
+
+
+    class CaseSourceChanged:
+        other_source = lambda_fixture(lambda tmp_path: str(tmp_path / 'ml-test-other.zip'))
+
+        @pytest.fixture
+        def reload(self, load, other_source, load_options):
+            write_dataset(Path(other_source), CHANGED_DATASET_CSVS)
+            stdout = StringIO()
+            call_command('load_dataset', other_source, **load_options, stdout=stdout)
+            return stdout.getvalue()
+
+        def it_loads_whole_dataset(self, reload, source):
+            assert f'Dataset was last loaded from {source}; loading the whole dataset' in reload
+
+        def it_records_source(self, reload, other_source):
+            expected = other_source
+            actual = DatasetFingerprint.objects.get_latest().source
+            assert expected == actual
+
+
+    class CaseDownloaded:
+        dataset_path = lambda_fixture(lambda http_server_root: http_server_root / 'ml-test.zip')
+        source = lambda_fixture(lambda http_server: f'{http_server.url}/ml-test.zip')
+
+        @pytest.fixture(autouse=True)
+        def cache_dir(self, settings, tmp_path):
+            settings.MOVIES_DATASET_CACHE_DIR = str(tmp_path / 'cache')
+
+        def it_loads_movies(self, load):
+            expected = [1, 2]
+            actual = list(Movie.objects.order_by('id').values_list('id', flat=True))
+            assert expected == actual
+
+        def it_reuses_unchanged_download(self, load, source, load_options, http_server):
+            call_command('load_dataset', source, **load_options, stdout=None)
+
+            expected = [200, 304]
+            actual = http_server.statuses
+            assert expected == actual
@@ -0,0 +1,28 @@
+import pytest
+from pytest_lambda import lambda_fixture
+
+from movies.models import DatasetVersion, Genre, Movie
+
+
+def get_version() -> int:
+    return DatasetVersion.objects.get_current().version
+
+
+@pytest.mark.django_db
+class DescribeDatasetVersion:
+    movie = lambda_fixture(lambda: Movie.objects.create(title='The Muffin Man', year=2038))
+
+    def it_is_bumped_by_creating_movies(self):
+        version = get_version()
+        Movie.objects.create(title='The Muffin Man', year=2038)
+        assert get_version() > version
+
+    def it_is_bumped_by_changing_genres(self, movie):
+        version = get_version()
+        movie.genres.add(Genre.objects.create(name='Documentary'))
+        assert get_version() > version
+
+    def it_is_bumped_explicitly(self):
+        version = get_version()
+        DatasetVersion.objects.bump()
+        assert get_version() > version
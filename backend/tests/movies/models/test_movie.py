@@ -0,0 +1,340 @@
+from datetime import datetime
+from typing import Optional
+
+import pytest
+import pytz
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from pytest_lambda import lambda_fixture
+
+from movies.models import Genre, Movie, Rating, User
+from movies.search import parse_search_query
+
+
+def make_rating(movie: Movie, user: User, rating: float) -> Rating:
+    return Rating(movie=movie, user=user, rating=rating,
+                  timestamp=datetime(2021, 3, 28, tzinfo=pytz.utc))
+
+
+def explain_without_seqscan(queryset: QuerySet) -> str:
+    sql, params = queryset.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        # NOTE: with so few rows, a sequential scan would otherwise be preferred
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return '\n'.join(line for line, in cursor.fetchall())
+
+
+def get_rating_stats(movie: Movie) -> tuple[int, float]:
+    movie.refresh_from_db(fields=['rating_count', 'rating_sum'])
+    return movie.rating_count, movie.rating_sum
+
+
+@pytest.mark.django_db
+class DescribeRatingStats:
+    movie = lambda_fixture(lambda: Movie.objects.create(title='The Muffin Man', year=2038))
+    other_movie = lambda_fixture(lambda: Movie.objects.create(title='The Muffin Man II', year=2039))
+    users = lambda_fixture(lambda: User.objects.bulk_create([User(id=i) for i in range(1, 4)]))
+
+    def it_counts_created_ratings(self, movie, users):
+        make_rating(movie, users[0], 4.5).save()
+
+        expected = (1, 4.5)
+        actual = get_rating_stats(movie)
+        assert expected == actual
+
+    def it_counts_bulk_created_ratings(self, movie, other_movie, users):
+        Rating.objects.bulk_create([
+            make_rating(movie, users[0], 4.5),
+            make_rating(movie, users[1], 2),
+            make_rating(other_movie, users[2], 1),
+        ])
+
+        expected = [(2, 6.5), (1, 1.0)]
+        actual = [get_rating_stats(movie), get_rating_stats(other_movie)]
+        assert expected == actual
+
+    def it_accounts_for_updated_ratings(self, movie, other_movie, users):
+        rating = make_rating(movie, users[0], 4.5)
+        rating.save()
+
+        rating.rating = 3
+        rating.save()
+        Rating.objects.filter(pk=rating.pk).update(movie=other_movie)
+
+        expected = [(0, 0.0), (1, 3.0)]
+        actual = [get_rating_stats(movie), get_rating_stats(other_movie)]
+        assert expected == actual
+
+    def it_accounts_for_deleted_ratings(self, movie, users):
+        Rating.objects.bulk_create([
+            make_rating(movie, users[0], 4.5),
+            make_rating(movie, users[1], 2),
+        ])
+        Rating.objects.filter(rating=2).delete()
+
+        expected = (1, 4.5)
+        actual = get_rating_stats(movie)
+        assert expected == actual
+
+    def it_does_not_clobber_stats_when_saving_movie(self, movie, users):
+        make_rating(movie, users[0], 4.5).save()
+
+        movie.title = 'The Muffin Man: Director\'s Cut'
+        movie.save()
+
+        expected = (1, 4.5)
+        actual = get_rating_stats(movie)
+        assert expected == actual
+
+
+    class DescribeRefreshRatingStats:
+        def it_recalculates_stats_from_ratings(self, movie, users):
+            make_rating(movie, users[0], 4.5).save()
+            Movie.objects.filter(pk=movie.pk).update(rating_count=12, rating_sum=1)
+            assert Movie.objects.filter_stale_rating_stats().exists()
+
+            Movie.objects.refresh_rating_stats()
+
+            expected = (1, 4.5)
+            actual = get_rating_stats(movie)
+            assert expected == actual
+            assert not Movie.objects.filter_stale_rating_stats().exists()
+
+
+def get_rating_scores(movie: Movie) -> tuple[Optional[float], float]:
+    movie.refresh_from_db(fields=['avg_rating', 'weighted_rating'])
+    return movie.avg_rating, movie.weighted_rating
+
+
+@pytest.mark.django_db
+class DescribeRatingScores:
+    movie = lambda_fixture(lambda: Movie.objects.create(title='The Muffin Man', year=2038))
+    users = lambda_fixture(lambda: User.objects.bulk_create([User(id=i) for i in range(1, 3)]))
+
+    def it_scores_unrated_movies_at_prior_mean(self, movie):
+        expected = (None, 3.5)
+        actual = get_rating_scores(movie)
+        assert expected == actual
+
+    def it_scores_ratings(self, movie, users):
+        Rating.objects.bulk_create([
+            make_rating(movie, users[0], 4.5),
+            make_rating(movie, users[1], 2),
+        ])
+
+        # NOTE: the weighted rating includes 10 ratings of the prior mean, 3.5
+        expected = (3.25, pytest.approx((6.5 + 10 * 3.5) / 12))
+        actual = get_rating_scores(movie)
+        assert expected == actual
+
+    def it_rescores_refreshed_stats(self, movie, users):
+        make_rating(movie, users[0], 4.5).save()
+        Movie.objects.filter(pk=movie.pk).update(rating_count=12, rating_sum=1)
+
+        Movie.objects.refresh_rating_stats()
+
+        expected = (4.5, pytest.approx((4.5 + 10 * 3.5) / 11))
+        actual = get_rating_scores(movie)
+        assert expected == actual
+
+    def it_uses_weighted_rating_index(self):
+        queryset = Movie.objects.order_by('-weighted_rating', 'id')[:100]
+        assert 'movie_weighted_rating' in explain_without_seqscan(queryset)
+
+
+def get_genre_mask(movie: Movie) -> int:
+    movie.refresh_from_db(fields=['genre_mask'])
+    return movie.genre_mask
+
+
+@pytest.mark.django_db
+class DescribeGenreMask:
+    genres = lambda_fixture(lambda: Genre.objects.bulk_create([
+        Genre(name='Comedy'),
+        Genre(name='Drama'),
+        Genre(name='Action'),
+    ]))
+    movie = lambda_fixture(lambda: Movie.objects.create(title='The Muffin Man', year=2038))
+
+    def it_assigns_genres_lowest_free_bits(self, genres):
+        Genre.objects.filter(name='Drama').delete()
+        Genre.objects.bulk_create([Genre(name='Romance'), Genre(name='Horror')])
+
+        expected = [('Action', 2), ('Comedy', 0), ('Horror', 3), ('Romance', 1)]
+        actual = list(Genre.objects.order_by('name').values_list('name', 'bit'))
+        assert expected == actual
+
+    def it_sets_bits_of_added_genres(self, movie, genres):
+        movie.genres.set(genres[::2])
+
+        expected = 0b101
+        actual = get_genre_mask(movie)
+        assert expected == actual
+
+    def it_clears_bits_of_removed_genres(self, movie, genres):
+        movie.genres.set(genres)
+        movie.genres.remove(genres[0])
+
+        expected = 0b110
+        actual = get_genre_mask(movie)
+        assert expected == actual
+
+    def it_clears_bits_of_deleted_genres(self, movie, genres):
+        movie.genres.set(genres)
+        genres[1].delete()
+
+        expected = 0b101
+        actual = get_genre_mask(movie)
+        assert expected == actual
+
+    def it_does_not_clobber_mask_when_saving_movie(self, movie, genres):
+        movie.genres.set(genres)
+
+        movie.title = 'The Muffin Man: Director\'s Cut'
+        movie.save()
+
+        expected = 0b111
+        actual = get_genre_mask(movie)
+        assert expected == actual
+
+
+    class DescribeRefreshGenreMasks:
+        def it_recalculates_masks_from_genres(self, movie, genres):
+            movie.genres.set(genres[:2])
+            Movie.objects.filter(pk=movie.pk).update(genre_mask=0b100)
+
+            Movie.objects.refresh_genre_masks()
+
+            expected = 0b011
+            actual = get_genre_mask(movie)
+            assert expected == actual
+
+
+@pytest.mark.django_db
+class DescribeGenres:
+    genres = lambda_fixture(lambda: Genre.objects.bulk_create([
+        Genre(name='Comedy'),
+        Genre(name='Drama'),
+        Genre(name='Action'),
+    ]))
+
+    @pytest.fixture(autouse=True)
+    def movies(self, genres):
+        movies = Movie.objects.bulk_create([
+            Movie(title='Forty-Two Monkeys', year=1997),
+            Movie(title='The Muffin Man', year=2038),
+            Movie(title='The Muffin Man II', year=2039),
+        ])
+        movies[0].genres.set(genres)
+        movies[1].genres.set(genres[:1])
+        movies[2].genres.set(genres[1:2])
+        return movies
+
+
+    class DescribeFilterGenres:
+        def it_filters_by_any_genre(self, movies):
+            expected = movies[:2]
+            actual = list(Movie.objects.filter_genres(['Comedy', 'Action']).order_by('id'))
+            assert expected == actual
+
+        def it_filters_by_all_genres(self, movies):
+            expected = movies[:1]
+            actual = list(Movie.objects.filter_genres(['Comedy', 'Drama'], match='all').order_by('id'))
+            assert expected == actual
+
+        def it_ignores_unknown_genres_when_matching_any(self, movies):
+            expected = movies[::2]
+            actual = list(Movie.objects.filter_genres(['Drama', 'Muffins']).order_by('id'))
+            assert expected == actual
+
+        def it_matches_nothing_with_unknown_genres_when_matching_all(self):
+            assert not Movie.objects.filter_genres(['Drama', 'Muffins'], match='all').exists()
+
+        def it_compiles_query_with_unknown_genres_when_matching_all(self):
+            # e.g. so its count may be estimated from its plan
+            queryset = Movie.objects.filter_genres(['Drama', 'Muffins'], match='all')
+            queryset.query.sql_with_params()
+
+
+    class DescribeCountGenres:
+        def it_counts_movies_of_each_genre(self):
+            expected = {'Action': 1, 'Comedy': 2, 'Drama': 2}
+            actual = Movie.objects.count_genres()
+            assert expected == actual
+
+        def it_counts_only_movies_in_queryset(self, movies):
+            expected = {'Action': 1, 'Comedy': 1, 'Drama': 2}
+            actual = Movie.objects.exclude(pk=movies[1].pk).count_genres()
+            assert expected == actual
+
+        def it_does_not_join_genres(self):
+            with CaptureQueriesContext(connection) as ctx:
+                Movie.objects.count_genres()
+
+            assert not any('movies_movie_genres' in query['sql'] for query in ctx.captured_queries)
+
+        def it_counts_zero_of_each_genre_for_no_movies(self):
+            expected = {'Action': 0, 'Comedy': 0, 'Drama': 0}
+            actual = Movie.objects.none().count_genres()
+            assert expected == actual
+
+
+@pytest.mark.django_db
+class DescribeSearch:
+    movies = lambda_fixture(
+        lambda: Movie.objects.bulk_create([
+            Movie(title='Forty-Two Monkeys', year=1997),
+            Movie(title="Alfred Hitchcock's The Byrds: A Biopic", year=1975),
+        ]),
+        autouse=True,
+    )
+
+    def search(self, query: str) -> list[Movie]:
+        return list(Movie.objects.search(parse_search_query(query), search_type='raw').order_by('id'))
+
+    def it_matches_inserted_titles(self, movies):
+        expected = movies[:1]
+        actual = self.search('monkey')
+        assert expected == actual
+
+    def it_matches_updated_titles(self, movies):
+        movie = movies[1]
+        movie.title = 'Forty-Three Monkeys'
+        movie.save()
+
+        expected = movies
+        actual = self.search('monkey')
+        assert expected == actual
+
+    def it_uses_title_vector_index(self):
+        queryset = Movie.objects.search(parse_search_query('monkey'), search_type='raw')
+        assert 'movie_title_vector' in explain_without_seqscan(queryset)
+
+
+@pytest.mark.django_db
+class DescribeFuzzySearch:
+    movies = lambda_fixture(
+        lambda: Movie.objects.bulk_create([
+            Movie(title='The Godfather', year=1972),
+            Movie(title='The Godfather: Part II', year=1974),
+            Movie(title='Forty-Two Monkeys', year=1997),
+        ]),
+        autouse=True,
+    )
+
+    def it_tolerates_typos(self, movies):
+        expected = movies[:2]
+        actual = list(Movie.objects.fuzzy_search('godfater').order_by('id'))
+        assert expected == actual
+
+    def it_applies_stricter_threshold(self, movies):
+        expected = movies[1:2]
+        actual = list(Movie.objects.fuzzy_search('godfather part', threshold=0.9).order_by('id'))
+        assert expected == actual
+
+    def it_uses_title_trigram_index(self):
+        queryset = Movie.objects.fuzzy_search('godfater')
+        assert 'movie_title_trigram' in explain_without_seqscan(queryset)
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from asgiref.testing import ApplicationCommunicator
+from django.test import Client
+from pytest_lambda import lambda_fixture
+
+from movies.asgi import CancelOnDisconnectMiddleware, application
+from movies.models import Movie
+
+
+def http_scope(path: str, query_string: bytes = b'') -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 12345),
+        'server': ('testserver', 80),
+    }
+
+
+async def get(app, path: str, query_string: bytes = b'') -> tuple[int, bytes]:
+    communicator = ApplicationCommunicator(app, http_scope(path, query_string))
+    await communicator.send_input({'type': 'http.request', 'body': b''})
+
+    start = await communicator.receive_output(timeout=10)
+    body = b''
+    while True:
+        message = await communicator.receive_output(timeout=10)
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            break
+
+    await communicator.wait(timeout=10)
+    return start['status'], body
+
+
+class DescribeCancelOnDisconnectMiddleware:
+    def it_cancels_app_once_client_disconnects(self):
+        events = []
+
+        async def app(scope, receive, send):
+            await receive()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                events.append('cancelled')
+                raise
+
+        async def disconnect_while_handled():
+            communicator = ApplicationCommunicator(CancelOnDisconnectMiddleware(app), http_scope('/'))
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            await asyncio.sleep(0.1)
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait(timeout=5)
+
+        asyncio.run(disconnect_while_handled())
+
+        expected = ['cancelled']
+        actual = events
+        assert expected == actual
+
+    def it_passes_through_responses(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'Forty-Two Monkeys'})
+
+        expected = (200, b'Forty-Two Monkeys')
+        actual = asyncio.run(get(CancelOnDisconnectMiddleware(app), '/'))
+        assert expected == actual
+
+
+@pytest.mark.django_db(transaction=True)
+class DescribeApplication:
+    movies = lambda_fixture(
+        lambda: Movie.objects.bulk_create([
+            Movie(title="Alfred Hitchcock's The Byrds: A Biopic", year=1975, imdb_id='0000042'),
+            Movie(title='Forty-Two Monkeys', year=1997),
+        ]),
+        autouse=True,
+    )
+
+    @pytest.fixture(autouse=True)
+    def disable_response_cache(self, settings):
+        settings.MOVIES_RESPONSE_CACHE_TTL = 0
+
+    @pytest.mark.parametrize('path, query_string', [
+        ('/api/movies', b''),
+        ('/api/movies', b'q=monkey'),
+        ('/api/movies', b'cursor=&page_size=1'),
+    ])
+    def it_lists_movies_as_wsgi_does(self, path, query_string):
+        response = Client().get(f'{path}?{query_string.decode()}')
+
+        expected = (response.status_code, response.content)
+        actual = asyncio.run(get(application, path, query_string))
+        assert expected == actual
+
+    def it_retrieves_movie_as_wsgi_does(self, movies):
+        path = f'/api/movies/{movies[0].pk}'
+        response = Client().get(path)
+
+        expected = (response.status_code, response.content)
+        actual = asyncio.run(get(application, path))
+        assert expected == actual
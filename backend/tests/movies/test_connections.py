@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import Error, connection, connections
+
+from movies.connections import close_unhealthy_connections
+
+
+def select_one() -> int:
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        return cursor.fetchone()[0]
+
+
+def get_backend_pid() -> int:
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT pg_backend_pid()')
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+class DescribeCloseUnhealthyConnections:
+    @pytest.fixture
+    def thread(self):
+        """A thread with its own (persistent) connection, which is broken by the test"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            yield executor
+            executor.submit(connections.close_all).result()
+
+    @pytest.fixture
+    def broken_connection(self, thread):
+        pid = thread.submit(get_backend_pid).result()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+    @pytest.fixture
+    def health_checks(self, monkeypatch):
+        monkeypatch.setitem(connection.settings_dict, 'CONN_HEALTH_CHECKS', True)
+
+    def it_replaces_broken_connection(self, health_checks, broken_connection, thread):
+        thread.submit(close_unhealthy_connections).result()
+
+        expected = 1
+        actual = thread.submit(select_one).result()
+        assert expected == actual
+
+    def it_leaves_connections_alone_without_health_checks(self, broken_connection, thread):
+        thread.submit(close_unhealthy_connections).result()
+
+        with pytest.raises(Error):
+            thread.submit(select_one).result()
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from django.db import OperationalError, connection
+from pytest_lambda import lambda_fixture
+
+from movies.db_pool import DatabasePool
+
+
+def sleep_in_database(seconds: float) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_sleep(%s)', [seconds])
+
+
+@pytest.mark.django_db
+class DescribeDatabasePool:
+    @pytest.fixture
+    def pool(self):
+        pool = DatabasePool(max_workers=1)
+        yield pool
+        pool.shutdown()
+
+    def it_runs_functions_in_its_threads(self, pool):
+        expected = 'db-pool'
+        actual = asyncio.run(pool.run(lambda: threading.current_thread().name))
+        assert actual.startswith(expected)
+
+    def it_returns_query_results(self, pool):
+        def select_one():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                return cursor.fetchone()[0]
+
+        expected = 1
+        actual = asyncio.run(pool.run(select_one))
+        assert expected == actual
+
+
+    class CaseCancelled:
+        errors = lambda_fixture(lambda: [])
+
+        def it_cancels_in_flight_query(self, pool, errors):
+            def sleep_and_record_errors():
+                try:
+                    sleep_in_database(30)
+                except OperationalError as e:
+                    errors.append(type(e).__name__)
+
+            async def cancel_after_query_starts():
+                task = asyncio.ensure_future(pool.run(sleep_and_record_errors))
+                await asyncio.sleep(0.5)
+                task.cancel()
+
+                # The pool's only thread must be freed for this to run
+                start = time.monotonic()
+                await pool.run(lambda: None)
+                return time.monotonic() - start
+
+            elapsed = asyncio.run(cancel_after_query_starts())
+
+            expected = (True, ['OperationalError'])
+            actual = (elapsed < 5, errors)
+            assert expected == actual
+
+        def it_never_starts_queued_job(self, pool):
+            started = []
+            release = threading.Event()
+
+            async def cancel_queued_job():
+                blocking = asyncio.ensure_future(pool.run(release.wait))
+                queued = asyncio.ensure_future(pool.run(started.append, True))
+                await asyncio.sleep(0.1)
+                queued.cancel()
+                await asyncio.wait([queued])
+                release.set()
+                await blocking
+                await pool.run(lambda: None)
+
+            asyncio.run(cancel_queued_job())
+
+            expected = []
+            actual = started
+            assert expected == actual
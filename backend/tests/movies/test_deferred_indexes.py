@@ -0,0 +1,56 @@
+import pytest
+from django.db import IntegrityError, connection
+from pytest_lambda import lambda_fixture
+
+from movies.deferred_indexes import DeferredIndexes
+from movies.models import Genre, Movie
+
+
+def get_index_names(table: str) -> list[str]:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT indexname FROM pg_indexes '
+                       'WHERE schemaname = current_schema() AND tablename = %s ORDER BY indexname',
+                       (table,))
+        return [name for name, in cursor.fetchall()]
+
+
+def get_foreign_key_names(table: str) -> list[str]:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT conname FROM pg_constraint '
+                       'WHERE conrelid = %s::regclass AND contype = %s ORDER BY conname',
+                       (table, 'f'))
+        return [name for name, in cursor.fetchall()]
+
+
+@pytest.mark.django_db
+class DescribeDeferredIndexes:
+    table = Movie.genres.through._meta.db_table
+    deferred_indexes = lambda_fixture(lambda: DeferredIndexes([Genre, Movie.genres.through]))
+    movie = lambda_fixture(lambda: Movie.objects.create(id=1, title='Toy Story'), autouse=True)
+
+    def it_drops_all_but_primary_and_unique_keys(self, deferred_indexes):
+        deferred_indexes.drop()
+
+        expected = (
+            ['movies_movie_genres_movie_id_genre_id_5ff3c723_uniq', 'movies_movie_genres_pkey'],
+            [],
+        )
+        actual = (get_index_names(self.table), get_foreign_key_names(self.table))
+        assert expected == actual
+
+    def it_rebuilds_indexes_and_foreign_keys_by_name(self, deferred_indexes):
+        expected = (get_index_names(self.table), get_foreign_key_names(self.table))
+
+        deferred_indexes.drop()
+        deferred_indexes.build_indexes()
+        deferred_indexes.add_foreign_keys()
+
+        actual = (get_index_names(self.table), get_foreign_key_names(self.table))
+        assert expected == actual
+
+    def it_revalidates_foreign_keys(self, deferred_indexes):
+        deferred_indexes.drop()
+        Movie.genres.through.objects.create(movie_id=1, genre_id=1234)
+
+        with pytest.raises(IntegrityError):
+            deferred_indexes.add_foreign_keys()
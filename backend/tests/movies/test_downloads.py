@@ -0,0 +1,57 @@
+import os
+from pathlib import Path
+
+import pytest
+from pytest_lambda import lambda_fixture, static_fixture
+
+from movies.downloads import download
+
+
+class DescribeDownload:
+    content = static_fixture(b'muffin' * 100_000)
+
+    @pytest.fixture(autouse=True)
+    def served_file(self, http_server_root, content) -> Path:
+        path = http_server_root / 'ml-test.zip'
+        path.write_bytes(content)
+        return path
+
+    url = lambda_fixture(lambda http_server: f'{http_server.url}/ml-test.zip')
+
+    def it_streams_to_temporary_file(self, url, content):
+        with download(url) as fp:
+            expected = content
+            actual = fp.read()
+            assert expected == actual
+
+
+    class DescribeCache:
+        cache_dir = lambda_fixture(lambda tmp_path: tmp_path / 'cache')
+
+        def it_downloads_to_cache(self, url, cache_dir, content):
+            path = download(url, cache_dir=cache_dir)
+
+            expected = (content, cache_dir)
+            actual = (path.read_bytes(), path.parent)
+            assert expected == actual
+
+        def it_reuses_unchanged_download(self, url, cache_dir, http_server, content):
+            download(url, cache_dir=cache_dir)
+            path = download(url, cache_dir=cache_dir)
+
+            expected = ([200, 304], content)
+            actual = (http_server.statuses, path.read_bytes())
+            assert expected == actual
+
+        def it_redownloads_changed_file(self, url, cache_dir, http_server, served_file):
+            download(url, cache_dir=cache_dir)
+
+            served_file.write_bytes(b'wuv')
+            stat = served_file.stat()
+            os.utime(served_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            path = download(url, cache_dir=cache_dir)
+
+            expected = ([200, 200], b'wuv')
+            actual = (http_server.statuses, path.read_bytes())
+            assert expected == actual
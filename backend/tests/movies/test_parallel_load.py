@@ -0,0 +1,42 @@
+import psycopg2
+import pytest
+from django.db import connection
+from psycopg2 import sql
+from pytest_lambda import lambda_fixture
+
+from movies.parallel_load import ParallelCsvStager, drop_staging_tables
+
+
+def create_table(connection_params, table: str) -> None:
+    conn = psycopg2.connect(**connection_params)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(sql.SQL('CREATE UNLOGGED TABLE {} (value text)').format(sql.Identifier(table)))
+    finally:
+        conn.close()
+
+
+# NOTE: staging tables are committed by their own connections
+@pytest.mark.django_db(transaction=True)
+class DescribeDropStagingTables:
+    connection_params = lambda_fixture(lambda: connection.get_connection_params())
+
+    def it_drops_tables_of_finished_loads(self, connection_params):
+        with ParallelCsvStager(connection_params, workers=1) as stager:
+            table = f'movies_loadstage_{stager.token}_ratings_0'
+            create_table(connection_params, table)
+
+        expected = [table]
+        actual = drop_staging_tables(connection_params)
+        assert expected == actual
+
+    def it_skips_committed_tables_of_ongoing_loads(self, connection_params):
+        with ParallelCsvStager(connection_params, workers=1) as stager:
+            table = f'movies_loadstage_{stager.token}_ratings_0'
+            create_table(connection_params, table)
+
+            expected = []
+            actual = drop_staging_tables(connection_params)
+            assert expected == actual
+
+        drop_staging_tables(connection_params)
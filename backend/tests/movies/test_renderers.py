@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from movies.renderers import FastJSONRenderer
+
+
+class DescribeFastJSONRenderer:
+    @pytest.mark.parametrize('data', [
+        {'title': 'Amélie', 'year': 2001, 'genres': ['Comedy', 'Romance'], 'avg_rating': 3.8333333333333335},
+        {'title': 'Line\u2028and paragraph\u2029separators', 'escapes': '"\\\n\t\x00'},
+        {'modified': datetime(2021, 3, 28, 12, 30, 15, 123456, tzinfo=timezone.utc)},
+        {'count': Decimal('1.50'), 'id': UUID('8c1e4d83-8d56-4d1c-a0fd-d6a4f58df3b5')},
+        {1: 'non-string key', 'nested': [{'empty': None, 'flag': True}]},
+        [],
+    ])
+    def it_renders_same_bytes_as_json_renderer(self, data):
+        expected = JSONRenderer().render(data)
+        actual = FastJSONRenderer().render(data)
+        assert expected == actual
+
+    def it_renders_indented_json_like_json_renderer(self):
+        data = {'results': [{'id': 1}]}
+
+        expected = JSONRenderer().render(data, 'application/json; indent=4')
+        actual = FastJSONRenderer().render(data, 'application/json; indent=4')
+        assert expected == actual
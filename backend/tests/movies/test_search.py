@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+
+from movies.search import parse_search_query
+
+
+class DescribeParseSearchQuery:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('query', [
+        'Star Trek: Nemesis',
+        '12:01',
+        'a & b',
+        '"a b" "c d"',
+        '"&"',
+        'or a b',
+        'a!b <a> back\\slash',
+        '-',
+        '-&',
+        '"' * 101,
+        '<->' * 100,
+    ])
+    def it_produces_valid_tsquery(self, query):
+        with connection.cursor() as cursor:
+            # NOTE: this raises a syntax error for invalid tsqueries
+            cursor.execute("SELECT to_tsquery('english', %s)", [parse_search_query(query)])
+
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('query, title', [
+        ('12:01', '12:01 (1993)'),
+        ('tom&jerry', 'Tom&Jerry Kids Show'),
+        ("o'brien", "Conan O'Brien Can't Stop"),
+        ('"12:01 pm"', '12:01 PM'),
+    ])
+    def it_matches_words_with_operators_inside(self, query, title):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_tsvector('english', %s) @@ to_tsquery('english', %s)",
+                           [title, parse_search_query(query)])
+            matches, = cursor.fetchone()
+
+        assert matches
+
+
+    class DescribeCache:
+        @pytest.fixture(autouse=True)
+        def clear_cache(self):
+            parse_search_query.cache_clear()
+            yield
+            parse_search_query.cache_clear()
+
+        def it_reuses_parsed_queries_differing_only_by_case_and_whitespace(self):
+            parse_search_query('Twue wub')
+            parse_search_query('  twue   WUB ')
+
+            expected = (1, 1)
+            info = parse_search_query.cache_info()
+            actual = (info.hits, info.misses)
+            assert expected == actual
+
+        def it_does_not_cache_long_queries(self):
+            parse_search_query('twue wub ' * 100)
+
+            expected = 0
+            actual = parse_search_query.cache_info().currsize
+            assert expected == actual
@@ -0,0 +1,63 @@
+import pytest
+from django.db import connection
+from pytest_lambda import lambda_fixture
+
+from movies.models import Genre, Movie
+from movies.shadow_tables import ShadowTables
+
+
+def get_index_names(table: str) -> list[str]:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT indexname FROM pg_indexes '
+                       'WHERE schemaname = current_schema() AND tablename = %s ORDER BY indexname',
+                       (table,))
+        return [name for name, in cursor.fetchall()]
+
+
+def get_genre_names() -> list[str]:
+    return list(Genre.objects.order_by('name').values_list('name', flat=True))
+
+
+@pytest.mark.django_db
+class DescribeShadowTables:
+    shadow_tables = lambda_fixture(lambda: ShadowTables([Genre, Movie.genres.through]))
+    existing_genre = lambda_fixture(lambda: Genre.objects.create(name='Drama'), autouse=True)
+
+    @pytest.fixture
+    def loaded(self, shadow_tables):
+        with shadow_tables.loading():
+            Genre.objects.create(name='Comedy')
+            shadow_tables.build()
+
+    def it_loads_into_shadow_tables(self, shadow_tables):
+        with shadow_tables.loading():
+            Genre.objects.create(name='Comedy')
+
+            expected = ['Comedy']
+            actual = get_genre_names()
+            assert expected == actual
+
+    def it_leaves_real_tables_untouched_until_swap(self, loaded):
+        expected = ['Drama']
+        actual = get_genre_names()
+        assert expected == actual
+
+    def it_replaces_real_tables_on_swap(self, loaded, shadow_tables):
+        shadow_tables.swap()
+
+        expected = ['Comedy']
+        actual = get_genre_names()
+        assert expected == actual
+
+    def it_retains_index_names_on_swap(self, loaded, shadow_tables):
+        expected = get_index_names(Movie.genres.through._meta.db_table)
+        shadow_tables.swap()
+        actual = get_index_names(Movie.genres.through._meta.db_table)
+        assert expected == actual
+
+    def it_refuses_to_swap_tables_referenced_by_unswapped_tables(self):
+        shadow_tables = ShadowTables([Genre])
+
+        with pytest.raises(ValueError):
+            with shadow_tables.loading():
+                pass
@@ -1,9 +1,16 @@
+from base64 import urlsafe_b64encode
+from datetime import datetime
 from typing import Any
 
 import pytest
+import pytz
+from django.db import connection
 from django.db.models import Avg
+from django.test.utils import CaptureQueriesContext
 from pytest_drf import (
     Returns200,
+    Returns404,
+    ReturnsCursorPagination,
     ReturnsPageNumberPagination,
     UsesDetailEndpoint,
     UsesGetMethod,
@@ -12,8 +19,11 @@ from pytest_drf import (
 )
 from pytest_drf.util import pluralized, url_for
 from pytest_lambda import lambda_fixture, static_fixture
+from rest_framework.renderers import JSONRenderer
 
-from movies.models import Movie
+from movies.models import Genre, Movie, Rating, User
+from movies.suggest import write_title_snapshot
+from movies.views.movie import MovieSerializer, MovieViewSet
 
 
 def express_movie(movie: Movie) -> dict[str, Any]:
@@ -21,7 +31,7 @@ def express_movie(movie: Movie) -> dict[str, Any]:
         'id': movie.id,
         'title': movie.title,
         'year': movie.year,
-        'genres': list(movie.genres.values_list('name', flat=True)),
+        'genres': list(movie.genres.order_by('name').values_list('name', flat=True)),
         'avg_rating': movie.ratings.aggregate(avg=Avg('rating'))['avg'],
         'num_ratings': movie.ratings.count(),
         'imdb_url': movie.imdb_url,
@@ -32,6 +42,16 @@ def express_movie(movie: Movie) -> dict[str, Any]:
 express_movies = pluralized(express_movie)
 
 
+def rate_movie(movie: Movie, num_ratings: int, rating: float = 3) -> list[Rating]:
+    users = User.objects.bulk_create([User(id=i) for i in range(1, num_ratings + 1)],
+                                     ignore_conflicts=True)
+    return Rating.objects.bulk_create([
+        Rating(movie=movie, user=user, rating=rating,
+               timestamp=datetime(2021, 3, 28, tzinfo=pytz.utc))
+        for user in users
+    ])
+
+
 @pytest.mark.django_db
 class DescribeMovieViewSet(ViewSetTest):
     list_url = lambda_fixture(lambda: url_for('movies-list'))
@@ -84,6 +104,468 @@ class DescribeMovieViewSet(ViewSetTest):
                 assert expected == actual
 
 
+            class CaseTypo:
+                query_params = static_fixture({
+                    'q': 'monky',
+                })
+
+                def it_returns_similar_movies(self, matching_movies, results):
+                    expected = express_movies(matching_movies)
+                    actual = results
+                    assert expected == actual
+
+                def it_checks_for_exact_matches_once_per_search(self, response, client, query_params):
+                    with CaptureQueriesContext(connection) as ctx:
+                        client.get(url_for('movies-facets'), query_params)
+
+                    assert not any('@@' in query['sql'] for query in ctx.captured_queries)
+
+
+            class CaseTypoOfSeveralTitles:
+                matching_movies = lambda_fixture(lambda: Movie.objects.bulk_create([
+                    Movie(title='Monkeys Business', year=1953),
+                    Movie(title='Monkey Business', year=1952),
+                ]))
+                query_params = static_fixture({
+                    'q': 'monky busines',
+                })
+
+                def it_returns_most_similar_movies_first(self, matching_movies, results):
+                    expected = express_movies(matching_movies[::-1])
+                    actual = results
+                    assert expected == actual
+
+
+            class ContextOrderedByRelevance(
+                Returns200,
+            ):
+                matching_movies = lambda_fixture(lambda: Movie.objects.bulk_create([
+                    Movie(title='Monkey Business', year=1952),
+                    Movie(title='Monkey See, Monkey Do', year=2038),
+                ]))
+                query_params = static_fixture({
+                    'q': 'monkey',
+                    'ordering': 'relevance',
+                })
+
+                def it_returns_most_relevant_movies_first(self, matching_movies, results):
+                    expected = express_movies(matching_movies[::-1])
+                    actual = results
+                    assert expected == actual
+
+
+                class CaseTooManyCandidates:
+                    @pytest.fixture(autouse=True)
+                    def max_candidates(self, settings, matching_movies):
+                        settings.MOVIES_RELEVANCE_MAX_CANDIDATES = 1
+                        rate_movie(matching_movies[0], num_ratings=1)
+
+                    def it_ranks_only_most_rated_movies(self, matching_movies, results):
+                        expected = express_movies(matching_movies)
+                        actual = results
+                        assert expected == actual
+
+
+                class CaseWeightedByRatings:
+                    query_params = static_fixture({
+                        'q': 'monkey',
+                        'ordering': 'weighted_relevance',
+                    })
+
+                    @pytest.fixture(autouse=True)
+                    def rating_counts(self, matching_movies):
+                        rate_movie(matching_movies[0], num_ratings=3)
+
+                    def it_boosts_movies_with_many_ratings(self, matching_movies, results):
+                        expected = express_movies(matching_movies)
+                        actual = results
+                        assert expected == actual
+
+
+        class ContextWithGenresAndRatings(
+            Returns200,
+        ):
+            genres = lambda_fixture(lambda: Genre.objects.bulk_create([
+                Genre(name='Comedy'),
+                Genre(name='Drama'),
+                Genre(name='Action'),
+            ]))
+            users = lambda_fixture(lambda: User.objects.bulk_create([
+                User(id=1),
+                User(id=2),
+            ]))
+
+            @pytest.fixture(autouse=True)
+            def movies(self, genres, users):
+                movies = Movie.objects.bulk_create([
+                    Movie(title='Forty-Two Monkeys', year=1997),
+                    Movie(title='The Muffin Man', year=2038),
+                ])
+                movies[0].genres.set(genres)
+                movies[1].genres.set(genres[:1])
+
+                Rating.objects.bulk_create([
+                    Rating(movie=movie, user=user, rating=rating,
+                           timestamp=datetime(2021, 3, 28, tzinfo=pytz.utc))
+                    for movie in movies
+                    for user, rating in zip(users, (4.5, 2))
+                ])
+                return movies
+
+            def it_does_not_multiply_ratings_by_genres(self, results):
+                expected = [
+                    {'genres': ['Action', 'Comedy', 'Drama'], 'num_ratings': 2, 'avg_rating': 3.25},
+                    {'genres': ['Comedy'], 'num_ratings': 2, 'avg_rating': 3.25},
+                ]
+                actual = [
+                    {key: result[key] for key in ('genres', 'num_ratings', 'avg_rating')}
+                    for result in results
+                ]
+                assert expected == actual
+
+            def it_returns_movies(self, movies, results):
+                expected = express_movies(movies)
+                actual = results
+                assert expected == actual
+
+
+            class CaseAnyGenre:
+                query_params = static_fixture({
+                    'genre': 'Drama,Horror',
+                })
+
+                def it_returns_movies_with_any_genre(self, movies, results):
+                    expected = express_movies(movies[:1])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseAllGenres:
+                query_params = static_fixture({
+                    'genre__all': 'Comedy,Action',
+                })
+
+                def it_returns_movies_with_all_genres(self, movies, results):
+                    expected = express_movies(movies[:1])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseUnknownGenre:
+                query_params = static_fixture({
+                    'genre__all': 'Nope,Comedy',
+                })
+
+                @pytest.fixture(autouse=True)
+                def estimate_threshold(self, settings):
+                    settings.MOVIES_COUNT_ESTIMATE_THRESHOLD = 1
+
+                def it_returns_no_movies(self, json):
+                    expected = {'count': 0, 'results': []}
+                    actual = {'count': json['count'], 'results': json['results']}
+                    assert expected == actual
+
+
+        class ContextRangesAndScores(
+            Returns200,
+        ):
+            @pytest.fixture(autouse=True)
+            def movies(self):
+                movies = Movie.objects.bulk_create([
+                    Movie(title='Forty-Two Monkeys', year=1995),
+                    Movie(title='The Muffin Man', year=2038),
+                    Movie(title='Monkey Business', year=1952),
+                    Movie(title='The Muffin Man II', year=2039),
+                ])
+                rate_movie(movies[0], num_ratings=10, rating=4.5)
+                rate_movie(movies[1], num_ratings=1, rating=5)
+                rate_movie(movies[2], num_ratings=20, rating=2)
+                return movies
+
+
+            class CaseYearRange:
+                query_params = static_fixture({
+                    'year__gte': '1990',
+                    'year__lte': '2038',
+                })
+
+                def it_returns_movies_within_years(self, movies, results):
+                    expected = express_movies(movies[:2])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseMinRatings:
+                query_params = static_fixture({
+                    'min_ratings': '10',
+                })
+
+                def it_returns_movies_with_enough_ratings(self, movies, results):
+                    expected = express_movies([movies[0], movies[2]])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseMinAvgRating:
+                query_params = static_fixture({
+                    'avg_rating__gte': '4.5',
+                })
+
+                def it_returns_movies_rated_highly_enough(self, movies, results):
+                    expected = express_movies(movies[:2])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseOrderedByAvgRating:
+                query_params = static_fixture({
+                    'avg_rating__gte': '0',
+                    'ordering': '-avg_rating',
+                })
+
+                def it_returns_highest_average_first(self, movies, results):
+                    expected = express_movies([movies[1], movies[0], movies[2]])
+                    actual = results
+                    assert expected == actual
+
+
+            class CaseOrderedByWeightedRating:
+                query_params = static_fixture({
+                    'ordering': '-weighted_rating',
+                })
+
+                def it_returns_highly_rated_movies_with_many_ratings_first(self, movies, results):
+                    expected = express_movies([movies[0], movies[1], movies[3], movies[2]])
+                    actual = results
+                    assert expected == actual
+
+
+        class ContextSerializerParity(
+            Returns200,
+        ):
+            genres = lambda_fixture(lambda: Genre.objects.bulk_create([
+                Genre(name='Comedy'),
+                Genre(name='Drama'),
+            ]))
+
+            @pytest.fixture(autouse=True)
+            def movies(self, genres):
+                movies = Movie.objects.bulk_create([
+                    Movie(title='Forty-Two Monkeys', year=1997, imdb_id='0114746', tmdb_id='63'),
+                    Movie(title="Amélie (Fabuleux destin d'Amélie Poulain, Le)", year=2001,
+                          imdb_id='0211915'),
+                    Movie(title='The Muffin Man "Unabridged"', year=None, tmdb_id='194'),
+                ])
+                movies[0].genres.set(genres)
+                rate_movie(movies[0], num_ratings=3, rating=3.5)
+                rate_movie(movies[1], num_ratings=1, rating=4.5)
+                Rating.objects.filter(movie=movies[0], user_id=1).update(rating=5)
+                return movies
+
+            def it_renders_same_bytes_as_movie_serializer(self, response, json):
+                expected = JSONRenderer().render({
+                    **json,
+                    'results': MovieSerializer(MovieViewSet.queryset, many=True).data,
+                })
+                actual = response.content
+                assert expected == actual
+
+
+        class ContextCaching:
+            def it_returns_not_modified_for_current_etag(self, response, client, full_url):
+                expected = 304
+                actual = client.get(full_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+                assert expected == actual
+
+            def it_returns_changes_once_dataset_changes(self, movies, response, client, full_url):
+                new_movie = Movie.objects.create(title='The Muffin Man', year=2038)
+
+                expected = express_movies([*movies, new_movie])
+                actual = client.get(full_url, HTTP_IF_NONE_MATCH=response['ETag']).json()['results']
+                assert expected == actual
+
+            def it_serves_cached_response_from_one_query(self, response, client, full_url):
+                with CaptureQueriesContext(connection) as ctx:
+                    cached_response = client.get(full_url)
+
+                # NOTE: the one query retrieves the dataset version
+                expected = (response.content, 1)
+                actual = (cached_response.content, len(ctx.captured_queries))
+                assert expected == actual
+
+
+        class ContextCounts:
+            def it_reports_exact_count(self, movies, response, json):
+                expected = {'count': len(movies), 'estimated': 'false'}
+                actual = {'count': json['count'], 'estimated': response['X-Count-Estimated']}
+                assert expected == actual
+
+            def it_caches_count(self, movies, response, client, full_url):
+                with CaptureQueriesContext(connection) as ctx:
+                    client.get(full_url, {'ordering': '-id'})
+
+                assert not any('COUNT(' in query['sql'] for query in ctx.captured_queries)
+
+            def it_recounts_once_dataset_changes(self, movies, response, client, full_url):
+                Movie.objects.create(title='The Muffin Man', year=2038)
+
+                expected = len(movies) + 1
+                actual = client.get(full_url).json()['count']
+                assert expected == actual
+
+
+            class ContextAboveEstimateThreshold:
+                @pytest.fixture(autouse=True)
+                def estimate_threshold(self, settings):
+                    settings.MOVIES_COUNT_ESTIMATE_THRESHOLD = 1
+
+                def it_reports_estimated_count(self, response):
+                    expected = 'true'
+                    actual = response['X-Count-Estimated']
+                    assert expected == actual
+
+                def it_returns_all_movies(self, movies, results):
+                    expected = express_movies(movies)
+                    actual = results
+                    assert expected == actual
+
+
+                class CasePageBeyondEstimate(
+                    Returns404,
+                ):
+                    query_params = static_fixture({
+                        'page': 1_000_000,
+                    })
+
+
+                class CaseOverestimated:
+                    @pytest.fixture(autouse=True)
+                    def estimate_threshold(self, settings, monkeypatch, movies):
+                        settings.MOVIES_COUNT_ESTIMATE_THRESHOLD = len(movies) + 1
+                        monkeypatch.setattr('movies.pagination.estimate_count', lambda queryset: 1_000_000)
+
+                    def it_reports_exact_count(self, movies, response, json):
+                        expected = {'count': len(movies), 'estimated': 'false'}
+                        actual = {'count': json['count'], 'estimated': response['X-Count-Estimated']}
+                        assert expected == actual
+
+
+                class CaseGenreFilter:
+                    query_params = static_fixture({
+                        'genre': 'Comedy',
+                    })
+
+                    @pytest.fixture(autouse=True)
+                    def genres(self, movies):
+                        comedy = Genre.objects.create(name='Comedy')
+                        movies[0].genres.add(comedy)
+
+                    def it_reports_exact_count(self, response, json):
+                        expected = {'count': 1, 'estimated': 'false'}
+                        actual = {'count': json['count'], 'estimated': response['X-Count-Estimated']}
+                        assert expected == actual
+
+
+                class CaseFuzzySearch:
+                    query_params = static_fixture({
+                        'q': 'monky',
+                    })
+
+                    def it_reports_exact_count(self, response, json):
+                        expected = {'count': 1, 'estimated': 'false'}
+                        actual = {'count': json['count'], 'estimated': response['X-Count-Estimated']}
+                        assert expected == actual
+
+
+        class ContextKeysetPagination(
+            Returns200,
+            ReturnsCursorPagination,
+        ):
+            movies = lambda_fixture(
+                lambda: Movie.objects.bulk_create([
+                    Movie(title='Forty-Two Monkeys', year=1997),
+                    Movie(title='The Muffin Man', year=None),
+                    Movie(title='The Muffin Man II', year=1997),
+                    Movie(title="Alfred Hitchcock's The Byrds: A Biopic", year=1975),
+                    Movie(title='The Muffin Man III', year=None),
+                    Movie(title='Forty-Three Monkeys', year=2001),
+                ]),
+                autouse=True,
+            )
+
+            ordering = static_fixture('id')
+            query_params = lambda_fixture(lambda ordering: {
+                'cursor': '',
+                'page_size': 2,
+                'ordering': ordering,
+            })
+
+            @pytest.fixture
+            def paged_results(self, client, json) -> list[list[dict[str, Any]]]:
+                pages = [json['results']]
+                next_url = json['next']
+                while next_url:
+                    page_json = client.get(next_url).json()
+                    pages.append(page_json['results'])
+                    next_url = page_json['next']
+                return pages
+
+            def it_returns_all_movies_across_pages(self, movies, paged_results):
+                expected = [express_movies(movies[i:i + 2]) for i in range(0, len(movies), 2)]
+                actual = paged_results
+                assert expected == actual
+
+
+            class CaseOrderedByNullableField:
+                ordering = static_fixture('-year')
+
+                def it_returns_all_movies_in_order(self, movies, paged_results):
+                    # NOTE: Postgres sorts NULLs first when descending
+                    expected = express_movies([movies[i] for i in (1, 4, 5, 0, 2, 3)])
+                    actual = [result for page in paged_results for result in page]
+                    assert expected == actual
+
+
+            class CaseOrderedByAnnotation:
+                ordering = static_fixture('num_ratings')
+
+                def it_returns_all_movies_in_order(self, movies, paged_results):
+                    expected = express_movies(movies)
+                    actual = [result for page in paged_results for result in page]
+                    assert expected == actual
+
+
+            class CaseInvalidCursor(
+                Returns404,
+            ):
+                query_params = static_fixture({
+                    'cursor': 'garbage',
+                })
+
+
+            class CaseCursorNotAnObject(
+                Returns404,
+            ):
+                query_params = static_fixture({
+                    'cursor': urlsafe_b64encode(b'["id"]').decode('ascii'),
+                    'ordering': 'id',
+                })
+
+
+            class CaseCursorWithBadValueType(
+                Returns404,
+            ):
+                ordering = static_fixture('id')
+
+                @pytest.fixture(params=['"abc"', '{"a":1}'], ids=['string', 'object'])
+                def query_params(self, request):
+                    payload = f'{{"o":["id"],"p":[{request.param}]}}'
+                    return {
+                        'cursor': urlsafe_b64encode(payload.encode('utf-8')).decode('ascii'),
+                        'ordering': 'id',
+                    }
+
+
     class DescribeRetrieve(
         UsesGetMethod,
         UsesDetailEndpoint,
@@ -98,3 +580,134 @@ class DescribeMovieViewSet(ViewSetTest):
             expected = express_movie(movie)
             actual = json
             assert expected == actual
+
+        def it_returns_not_modified_for_current_etag(self, response, client, full_url):
+            expected = 304
+            actual = client.get(full_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+            assert expected == actual
+
+
+        class CaseNonExistent(
+            Returns404,
+        ):
+            detail_url = lambda_fixture(lambda: url_for('movies-detail', pk=12345))
+
+
+    class DescribeFacets(
+        UsesGetMethod,
+        Returns200,
+    ):
+        url = lambda_fixture(lambda: url_for('movies-facets'))
+
+        genres = lambda_fixture(lambda: Genre.objects.bulk_create([
+            Genre(name='Comedy'),
+            Genre(name='Drama'),
+            Genre(name='Action'),
+        ]))
+
+        @pytest.fixture(autouse=True)
+        def movies(self, genres):
+            movies = Movie.objects.bulk_create([
+                Movie(title='Forty-Two Monkeys', year=1997),
+                Movie(title='Monkey Business', year=1952),
+                Movie(title='The Muffin Man', year=2038),
+            ])
+            movies[0].genres.set(genres[:2])
+            movies[1].genres.set(genres[:1])
+            movies[2].genres.set(genres)
+            return movies
+
+        def it_counts_movies_of_each_genre(self, json):
+            expected = {'genres': {'Action': 1, 'Comedy': 3, 'Drama': 2}}
+            actual = json
+            assert expected == actual
+
+
+        class CaseSearch:
+            query_params = static_fixture({
+                'q': 'monkey',
+            })
+
+            def it_counts_only_matching_movies(self, json):
+                expected = {'genres': {'Action': 0, 'Comedy': 2, 'Drama': 1}}
+                actual = json
+                assert expected == actual
+
+
+        class CaseGenreFilter:
+            query_params = static_fixture({
+                'q': 'monkey',
+                'genre__all': 'Drama',
+            })
+
+            def it_counts_only_movies_with_genres(self, json):
+                expected = {'genres': {'Action': 0, 'Comedy': 1, 'Drama': 1}}
+                actual = json
+                assert expected == actual
+
+
+        class CaseUnknownGenre:
+            query_params = static_fixture({
+                'genre__all': 'Nope',
+            })
+
+            def it_counts_no_movies(self, json):
+                expected = {'genres': {'Action': 0, 'Comedy': 0, 'Drama': 0}}
+                actual = json
+                assert expected == actual
+
+
+    class DescribeSuggest(
+        UsesGetMethod,
+        Returns200,
+    ):
+        url = lambda_fixture(lambda: url_for('movies-suggest'))
+
+        movies = lambda_fixture(
+            lambda: Movie.objects.bulk_create([
+                Movie(title='Monkey Business', year=1952),
+                Movie(title='Forty-Two Monkeys', year=1997),
+                Movie(title="Alfred Hitchcock's The Byrds: A Biopic", year=1975),
+            ]),
+            autouse=True,
+        )
+
+        @pytest.fixture(autouse=True)
+        def ratings(self, movies):
+            rate_movie(movies[1], num_ratings=2)
+
+        query_params = static_fixture({
+            'q': 'Mon',
+        })
+
+        def it_returns_most_rated_matches_first(self, movies, json):
+            expected = [
+                {'id': movie.id, 'title': movie.title, 'year': movie.year}
+                for movie in (movies[1], movies[0])
+            ]
+            actual = json
+            assert expected == actual
+
+
+        class CaseLimit:
+            query_params = static_fixture({
+                'q': 'Mon',
+                'limit': '1',
+            })
+
+            def it_returns_only_limited_matches(self, movies, json):
+                expected = [movies[1].id]
+                actual = [suggestion['id'] for suggestion in json]
+                assert expected == actual
+
+
+        class CaseSnapshotRefreshed:
+            def it_returns_movies_added_since(self, movies, client, full_url):
+                client.get(full_url)
+
+                new_movie = Movie.objects.create(title='Monkey Shines', year=1988)
+                write_title_snapshot()
+
+                expected = [movies[1].id, movies[0].id, new_movie.id]
+                actual = [suggestion['id'] for suggestion in client.get(full_url).json()]
+                assert expected == actual
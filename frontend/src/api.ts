@@ -7,6 +7,12 @@ export interface PaginatedResponse<T> {
   results: T[],
 }
 
+export interface CursorPaginatedResponse<T> {
+  next: string | null,
+  previous: null,
+  results: T[],
+}
+
 interface getMoviesOptions {
   query?: string,
   page?: number,
@@ -30,3 +36,64 @@ export const getMovies = async ({
   let res = await fetch(url, { signal });
   return await res.json();
 };
+
+interface getMoviesByCursorOptions {
+  query?: string,
+  ordering?: string,
+  pageSize?: number,
+  signal?: AbortSignal,
+}
+
+/**
+ * Retrieve the first page of movies using keyset (cursor) pagination.
+ *
+ * Subsequent pages are retrieved by passing the response's `next` URL to
+ * getNextMovies(). Unlike page numbers, each page costs the same to retrieve,
+ * no matter how far the user has scrolled. No total count is returned.
+ */
+export const getMoviesByCursor = async ({
+  query = '',
+  ordering = 'id',
+  pageSize = 100,
+  signal
+}: getMoviesByCursorOptions): Promise<CursorPaginatedResponse<MovieType>> => {
+  const params = new URLSearchParams(Object.entries({
+    q: query,
+    ordering,
+    cursor: '',
+    page_size: pageSize.toString(),
+  }));
+  const url = `/api/movies?${params}`;
+
+  let res = await fetch(url, { signal });
+  return await res.json();
+};
+
+export const getNextMovies = async (
+  next: string,
+  signal?: AbortSignal,
+): Promise<CursorPaginatedResponse<MovieType>> => {
+  let res = await fetch(next, { signal });
+  return await res.json();
+};
+
+export interface SuggestionType {
+  id: number,
+  title: string,
+  year: number | null,
+}
+
+/**
+ * Retrieve the most-rated movies whose title words start with each word typed.
+ *
+ * Suggestions are cheap enough to request on every keystroke.
+ */
+export const getSuggestions = async (
+  query: string,
+  limit: number = 10,
+  signal?: AbortSignal,
+): Promise<SuggestionType[]> => {
+  const params = new URLSearchParams({ q: query, limit: limit.toString() });
+  let res = await fetch(`/api/movies/suggest?${params}`, { signal });
+  return await res.json();
+};